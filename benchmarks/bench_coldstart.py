@@ -0,0 +1,117 @@
+"""
+Холодний старт сервісів: час від запуску інтерпретатора до імпорту модуля
+сервісу (усе, що виконується до підключення до брокера) і, з --nltk-data,
+час завантаження моделей NLTK (blogcommon.nlp.warmup), який тепер
+іде у фоновому потоці паралельно з підключенням.
+
+Кожен вимір - новий процес; зовнішні сервіси не потрібні (клієнт Mongo
+не підключається при створенні). Для порівняння окремо вимірюється імпорт
+nltk.sentiment, який раніше виконувався при імпорті модулів модерації.
+
+Воркер Django вимірюється до готовності обслуговувати запит (settings,
+застосунки, WSGI-застосунок, urlconf) у двох профілях: без застосунків
+розробки і з ними (DEV_APPS, PROFILING_MODE=silk). Що саме імпортується,
+показує `python manage.py importtime`.
+
+    python benchmarks/bench_coldstart.py --runs 5
+    python -m blogcommon.nlp bundle /tmp/nltk_data vader_lexicon punkt_tab stopwords
+    python benchmarks/bench_coldstart.py --nltk-data /tmp/nltk_data
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (назва, каталог сервісу, модуль, моделі NLTK для warmup)
+SERVICES = [
+    ('moderation worker', 'blogrecommendation', 'moderation', ['sentiment_analyzer']),
+    ('store worker', 'blogrecommendation', 'store', []),
+    ('event store worker', 'blogrecommendation', 'rabbitmq', []),
+    ('recommendation worker', 'blogrecommendation', 'recomendation', []),
+    ('recommendation API', 'recommendation', 'main', ['sentiment_analyzer', 'stop_words', 'tokenizer']),
+]
+
+# (назва, змінні оточення профілю)
+DJANGO_PROFILES = [
+    ('django worker', {'DEV_APPS': 'false', 'PROFILING_MODE': 'off'}),
+    ('django worker, dev apps', {'DEV_APPS': 'true', 'PROFILING_MODE': 'silk'}),
+]
+
+SCRIPT = """
+import time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+if {loaders!r}:
+    from blogcommon import nlp
+    nlp.warmup(*[getattr(nlp, name) for name in {loaders!r}])
+print(imported - started, time.perf_counter() - imported)
+"""
+
+DJANGO_SCRIPT = """
+import time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+print(time.perf_counter() - started, 0)
+"""
+
+
+def service_env(tmp, nltk_data):
+    env = dict(os.environ, PYTHONPATH=ROOT, VECTOR_STORE_PATH=os.path.join(tmp, 'vectors'))
+    for name in ('EVENT_STORE_DB_URL', 'RECOMMENDATION_DB_URL'):
+        env.setdefault(name, '127.0.0.1:27017')
+    for name in ('MONGO_USER', 'MONGO_PASS', 'MONGO_RECOMM_USER', 'MONGO_RECOMM_PASS'):
+        env.setdefault(name, 'bench')
+    for name in ('EVENT_STORE_DB', 'RECOMMENDATION_DB', 'STORE_QUEUE'):
+        env.setdefault(name, 'bench')
+    if nltk_data:
+        env['NLTK_DATA'] = nltk_data
+    return env
+
+
+def run(directory, code, env):
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.join(ROOT, directory), env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return [float(value) for value in result.stdout.split()[-2:]]
+
+
+def main(args):
+    print(f"{'service':<24} {'import, ms':>11} {'nltk warmup, ms':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = service_env(tmp, args.nltk_data)
+        for label, directory, module, loaders in SERVICES:
+            loaders = loaders if args.nltk_data else []
+            try:
+                runs = [run(directory, SCRIPT.format(module=module, loaders=loaders), env) for _ in range(args.runs)]
+            except RuntimeError as e:
+                print(f"{label:<24} failed: {e}")
+                continue
+            imported = statistics.median(r[0] for r in runs) * 1000
+            warmup = f"{statistics.median(r[1] for r in runs) * 1000:16.0f}" if loaders else f"{'-':>16}"
+            print(f"{label:<24} {imported:11.0f} {warmup}")
+        for label, profile in DJANGO_PROFILES:
+            django_env = dict(env, DJANGO_SETTINGS_MODULE='wapp.settings', **profile)
+            try:
+                runs = [run('wapp', DJANGO_SCRIPT, django_env) for _ in range(args.runs)]
+            except RuntimeError as e:
+                print(f"{label:<24} failed: {e}")
+                continue
+            print(f"{label:<24} {statistics.median(r[0] for r in runs) * 1000:11.0f} {'-':>16}")
+        reference = [run('.', SCRIPT.format(module='nltk.sentiment', loaders=[]), env) for _ in range(args.runs)]
+        print(f"{'(import nltk.sentiment)':<24} {statistics.median(r[0] for r in reference) * 1000:11.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--nltk-data', help="bundle from `python -m blogcommon.nlp bundle` to also time model loading")
+    main(parser.parse_args())
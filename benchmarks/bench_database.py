@@ -0,0 +1,118 @@
+"""
+Читання списку постів паралельно з інкрементом views_count (як у retrieve/display_post).
+
+Кожен профіль бази запускається в окремому процесі з тим самим навантаженням:
+потоки виконують читання першої сторінки списку, а частка write_ratio запитів -
+UPDATE лічильника переглядів випадкового поста.
+
+    python benchmarks/bench_database.py --profiles sqlite,sqlite-wal
+    POSTGRES_HOST=... POSTGRES_DB=bench python benchmarks/bench_database.py --profiles sqlite-wal,postgres
+
+Для postgres потрібна окрема порожня база: бенчмарк мігрує її і додає пости.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+WAPP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'wapp')
+
+
+def setup_django(profile, db_name):
+    os.environ['DB_ENGINE'] = profile
+    os.environ['DB_NAME'] = db_name
+    # Не змішувати дані бенчмарку зі спільним кешем розробки
+    os.environ.setdefault('CACHE_BACKEND', 'locmem')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wapp.settings')
+    sys.path.insert(0, WAPP_DIR)
+    import django
+    django.setup()
+
+
+def seed(posts):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from webap.models import BlogPost
+
+    call_command('migrate', verbosity=0)
+    author, _ = get_user_model().objects.get_or_create(username='bench')
+    BlogPost.objects.bulk_create(
+        BlogPost(title=f'Post {i}', text='lorem ipsum ' * 100, author=author) for i in range(posts)
+    )
+    return list(BlogPost.objects.values_list('id', flat=True))
+
+
+def worker(ids, requests, write_ratio, latencies, errors):
+    from django.db import OperationalError, connection
+    from django.db.models import F
+    from webap.models import BlogPost
+
+    rng = random.Random()
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                BlogPost.objects.filter(id=rng.choice(ids)).update(views_count=F('views_count') + 1)
+            else:
+                list(BlogPost.objects.select_related('author', 'category')
+                     .values('id', 'title', 'author__username', 'views_count')[:20])
+        except OperationalError:
+            errors.append(1)
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def run_profile(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(args.run, os.path.join(tmp, 'bench.sqlite3'))
+        ids = seed(args.posts)
+        latencies, errors = [], []
+        threads = [threading.Thread(target=worker, args=(ids, args.requests, args.write_ratio, latencies, errors))
+                   for _ in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        print(json.dumps({
+            'profile': args.run,
+            'rps': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+            'errors': len(errors),
+        }))
+
+
+def main(args):
+    for profile in args.profiles.split(','):
+        output = subprocess.run(
+            [sys.executable, __file__, '--run', profile, '--threads', str(args.threads),
+             '--requests', str(args.requests), '--write-ratio', str(args.write_ratio), '--posts', str(args.posts)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['profile']:<12} {result['rps']:8.0f} req/s  p50 {result['p50_ms']:6.2f}ms  "
+              f"p95 {result['p95_ms']:7.2f}ms  lock errors {result['errors']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', default='sqlite,sqlite-wal')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=300, help='запитів на потік')
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_profile(args)
+    else:
+        main(args)
@@ -0,0 +1,131 @@
+"""
+Стрічка підписок: fan-out-on-write (webap.feed) проти JOIN при читанні.
+
+Підписки розподілені за степеневим законом (Zipf): більшість авторів мають
+кілька підписників, одиниці - тисячі, як у реальних соцмережах. Вимірюються:
+  - створення поста (BlogPost.save + fan-out) для авторів з різною кількістю
+    підписників, включно з тими, що вищі за FEED_FANOUT_LIMIT;
+  - читання першої сторінки стрічки: feed_post_ids проти JOIN постів з
+    таблицею підписок (ORDER BY id DESC LIMIT 20).
+
+    python benchmarks/bench_feed.py --users 3000 --posts 30000 --follows 40
+    python benchmarks/bench_feed.py --users 1000 --posts 100000 --follows 300 --exponent 0.8
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from bench_database import setup_django
+
+
+def zipf_weights(count, exponent):
+    return [1.0 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def seed(args):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from webap import feed
+    from webap.models import BlogPost, UserProfile
+
+    call_command('migrate', verbosity=0)
+    User = get_user_model()
+    User.objects.bulk_create(User(username=f'user{i}') for i in range(args.users))
+    users = list(User.objects.order_by('id').values_list('id', flat=True))
+    UserProfile.objects.bulk_create(UserProfile(user_id=user_id) for user_id in users)
+    profiles = dict(UserProfile.objects.values_list('user_id', 'id'))
+
+    rng = random.Random(1)
+    weights = zipf_weights(len(users), args.exponent)
+    follows = {}
+    for user_id in users:
+        count = max(1, int(rng.expovariate(1 / args.follows)))
+        follows[user_id] = set(rng.choices(users, weights, k=count)) - {user_id}
+    UserProfile.follows.through.objects.bulk_create(
+        UserProfile.follows.through(userprofile_id=profiles[user_id], user_id=author_id)
+        for user_id, authors in follows.items() for author_id in authors
+    )
+
+    BlogPost.objects.bulk_create(
+        (BlogPost(title=f'Post {i}', text='lorem ipsum', author_id=rng.choices(users, weights)[0])
+         for i in range(args.posts)), batch_size=1000
+    )
+    started = time.perf_counter()
+    for user_id, authors in follows.items():
+        feed.follow(user_id, authors)
+    print(f"timelines built in {time.perf_counter() - started:.1f}s")
+    return users, follows
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (statistics.median(timings) * 1000, timings[int(len(timings) * 0.99) - 1] * 1000)
+
+
+def bench_writes(users, rng, samples):
+    from webap.feed import celebrity_ids, follower_ids
+    from webap.models import BlogPost
+
+    celebrities = celebrity_ids()
+    buckets = {}
+    # users відсортовані за популярністю: перші - найбільше підписників
+    for author_id in users[:20] + rng.sample(users, samples):
+        followers = follower_ids(author_id).count()
+        started = time.perf_counter()
+        BlogPost.objects.create(title='new', text='lorem ipsum', author_id=author_id)
+        elapsed = time.perf_counter() - started
+        bucket = 'on-read' if author_id in celebrities else f'<={10 ** len(str(followers))}'
+        buckets.setdefault(bucket, []).append(elapsed)
+    print(f"{'create post, followers':<24} {'n':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    for bucket, timings in sorted(buckets.items()):
+        p50, p99 = percentiles(timings)
+        print(f"{bucket:<24} {len(timings):>5} {p50:8.2f} {p99:8.2f}")
+
+
+def bench_reads(follows, rng, samples):
+    from webap.feed import feed_post_ids
+    from webap.models import BlogPost
+
+    readers = rng.sample([user_id for user_id, authors in follows.items() if authors], samples)
+
+    def timeline(user_id):
+        return feed_post_ids(user_id)
+
+    def join(user_id):
+        # Пости всіх авторів, на яких підписаний користувач: JOIN через таблицю підписок
+        return list(BlogPost.objects.filter(author__followers__user_id=user_id).order_by('-id')
+                    .values_list('id', flat=True)[:20])
+
+    print(f"{'read first page':<24} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, read in (('fan-out timeline', timeline), ('join on read', join)):
+        timings = []
+        for user_id in readers:
+            started = time.perf_counter()
+            read(user_id)
+            timings.append(time.perf_counter() - started)
+        p50, p99 = percentiles(timings)
+        print(f"{label:<24} {p50:8.2f} {p99:8.2f}")
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['FEED_FANOUT_LIMIT'] = str(args.fanout_limit)
+        setup_django('sqlite-wal', os.path.join(tmp, 'bench.sqlite3'))
+        users, follows = seed(args)
+        rng = random.Random(2)
+        bench_writes(users, rng, args.samples)
+        bench_reads(follows, rng, args.samples)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--posts', type=int, default=30000)
+    parser.add_argument('--follows', type=int, default=40, help="середня кількість підписок користувача")
+    parser.add_argument('--exponent', type=float, default=1.1, help="показник розподілу Zipf")
+    parser.add_argument('--fanout-limit', type=int, default=1000)
+    parser.add_argument('--samples', type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,79 @@
+"""
+Запис взаємодій: по одній на POST /api/interactions/ (DELETE + INSERT і
+сигнали) проти пакетів POST /api/interactions/batch/ (bulk INSERT і один
+UPDATE лічильників, webap/interactions.py).
+
+View викликаються напряму через APIRequestFactory, без мережі й middleware;
+90% подій - перегляди при прокручуванні, решта - лайки і збереження.
+
+    python benchmarks/bench_interactions.py --interactions 5000 --batch-sizes 50,200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bench_database import seed, setup_django
+
+
+def events(ids, count, rng):
+    kinds = ['view'] * 18 + ['like', 'save']
+    return [{'post': rng.choice(ids), 'interaction_type': rng.choice(kinds)} for _ in range(count)]
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(args.profile, os.path.join(tmp, 'bench.sqlite3'))
+        ids = seed(args.posts)
+
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from webap.models import UserInteraction
+        from webap.views import UserInteractionViewSet
+
+        factory = APIRequestFactory()
+        single = UserInteractionViewSet.as_view({'post': 'create'})
+        batch = UserInteractionViewSet.as_view({'post': 'batch'})
+        rng = random.Random(1)
+        users = [get_user_model().objects.create_user(username=f'reader{i}') for i in range(args.users)]
+
+        def post(view, url, data, user):
+            request = factory.post(url, data, format='json')
+            force_authenticate(request, user)
+            response = view(request)
+            assert response.status_code == 201, response.data
+
+        def run_single(items):
+            for i, item in enumerate(items):
+                post(single, '/api/interactions/', item, users[i % len(users)])
+
+        def run_batch(items, size):
+            for i in range(0, len(items), size):
+                post(batch, '/api/interactions/batch/', items[i:i + size], users[i // size % len(users)])
+
+        cases = [('one per request', run_single)]
+        cases += [(f'batch of {size}', lambda items, size=size: run_batch(items, size)) for size in args.batch_sizes]
+        results = []
+        for label, run in cases:
+            UserInteraction.objects.all().delete()
+            items = events(ids, args.interactions, rng)
+            started = time.perf_counter()
+            run(items)
+            elapsed = time.perf_counter() - started
+            results.append((label, elapsed))
+
+    print(f"{'mode':<18} {'seconds':>8} {'interactions/s':>15}")
+    for label, elapsed in results:
+        print(f"{label:<18} {elapsed:8.2f} {args.interactions / elapsed:15.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interactions', type=int, default=5000)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--batch-sizes', type=lambda value: [int(size) for size in value.split(',')],
+                        default=[50, 200])
+    parser.add_argument('--profile', default='sqlite-wal')
+    main(parser.parse_args())
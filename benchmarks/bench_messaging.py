@@ -0,0 +1,97 @@
+"""
+Бенчмарк пропускної здатності публікації/споживання через blogcommon.messaging.
+
+Брокер замінено InMemoryBroker з імітацією мережевої затримки, тому цифри
+показують вплив пакетних підтверджень, prefetch та конкурентності, а не
+продуктивність самого RabbitMQ.
+
+    PYTHONPATH=. python benchmarks/bench_messaging.py --messages 5000 --latency 0.0005
+"""
+import argparse
+import asyncio
+import time
+
+from blogcommon.messaging import AmqpSettings, ConnectionPool, Consumer, OutgoingMessage, Publisher
+from blogcommon.testing import InMemoryBroker
+
+QUEUE = 'bench_queue'
+EXCHANGE = 'bench.events'
+
+
+async def declare(channel):
+    await channel.exchange_declare(exchange=EXCHANGE, exchange_type='topic', durable=True)
+    await channel.queue_declare(queue=QUEUE, durable=True)
+    await channel.queue_bind(queue=QUEUE, exchange=EXCHANGE, routing_key='bench.#')
+
+
+def make_pool(broker, **settings):
+    pool = ConnectionPool(AmqpSettings(url='amqp://bench/', **settings), connect=broker.connect)
+    pool.on_connect(declare)
+    return pool
+
+
+def messages(count):
+    return [
+        OutgoingMessage(EXCHANGE, 'bench.event', {'correlationId': str(i), 'body': {'post': {'id': i}}})
+        for i in range(count)
+    ]
+
+
+async def bench_publish(count, latency, confirm_batch):
+    broker = InMemoryBroker(latency=latency)
+    pool = make_pool(broker, confirm_batch=confirm_batch)
+    publisher = Publisher(pool)
+    batch = messages(count)
+    started = time.perf_counter()
+    if confirm_batch == 1:
+        # Поведінка "як раніше": кожне повідомлення чекає окремо
+        for message in batch:
+            await publisher.publish(message)
+    else:
+        await publisher.publish_many(batch)
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return count / elapsed
+
+
+async def bench_consume(count, latency, prefetch, concurrency, work):
+    broker = InMemoryBroker(latency=latency)
+    pool = make_pool(broker, prefetch=prefetch, concurrency=concurrency)
+    await Publisher(pool).publish_many(messages(count))
+    done = asyncio.Event()
+    processed = 0
+
+    async def handler(delivery):
+        nonlocal processed
+        if work:
+            await asyncio.sleep(work)
+        processed += 1
+        if processed == count:
+            done.set()
+
+    consumer = Consumer(pool, QUEUE, handler)
+    started = time.perf_counter()
+    consumer.start()
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    await consumer.stop()
+    await pool.close()
+    return count / elapsed
+
+
+async def main(args):
+    print(f"messages={args.messages} latency={args.latency * 1000:.2f}ms")
+    for batch in (1, 10, 100):
+        rate = await bench_publish(args.messages, args.latency, batch)
+        print(f"publish  confirm_batch={batch:<4} {rate:>10.0f} msg/s")
+    for prefetch, concurrency in ((1, 1), (10, 4), (50, 16)):
+        rate = await bench_consume(args.messages, args.latency, prefetch, concurrency, args.work)
+        print(f"consume  prefetch={prefetch:<3} concurrency={concurrency:<3} {rate:>10.0f} msg/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.0005, help='імітована затримка брокера, с')
+    parser.add_argument('--work', type=float, default=0.001, help='час обробки повідомлення, с')
+    asyncio.run(main(parser.parse_args()))
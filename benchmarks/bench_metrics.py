@@ -0,0 +1,102 @@
+"""
+Ціна інструментування на гарячому шляху (blogcommon.metrics).
+
+Вимірюється час однієї операції (нс) порівняно з порожнім викликом функції:
+inc()/observe() з пошуком дочірньої метрики за мітками, таймер .time(),
+ASGI MetricsMiddleware навколо порожнього застосунку та Django
+MetricsMiddleware (час + лічильник SQL) навколо порожнього view.
+
+    PYTHONPATH=. python benchmarks/bench_metrics.py --number 200000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import timeit
+
+from bench_database import setup_django
+from blogcommon.metrics import Counter, Histogram, MetricsMiddleware, Registry
+
+
+def per_call_ns(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e9
+
+
+def bench_primitives(number):
+    registry = Registry()
+    counter = Counter('bench_total', "bench", ['queue', 'outcome'], registry=registry)
+    histogram = Histogram('bench_seconds', "bench", ['route'], registry=registry)
+
+    def noop():
+        pass
+
+    def timed():
+        with histogram.labels('posts-list').time():
+            pass
+
+    return [
+        ('empty call', per_call_ns(noop, number)),
+        ('counter.labels().inc()', per_call_ns(lambda: counter.labels('in', 'ack').inc(), number)),
+        ('histogram.labels().observe()', per_call_ns(lambda: histogram.labels('posts-list').observe(0.003), number)),
+        ('histogram.labels().time()', per_call_ns(timed, number)),
+    ]
+
+
+def bench_asgi(number):
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200})
+
+    async def send(message):
+        pass
+
+    middleware = MetricsMiddleware(app)
+    scope = {'type': 'http', 'method': 'GET'}
+
+    async def run(handler):
+        started = time.perf_counter()
+        for _ in range(number):
+            await handler(scope, None, send)
+        return (time.perf_counter() - started) / number * 1e9
+
+    loop = asyncio.new_event_loop()
+    try:
+        bare, wrapped = loop.run_until_complete(run(app)), loop.run_until_complete(run(middleware))
+    finally:
+        loop.close()
+    return [('asgi app', bare), ('asgi app + MetricsMiddleware', wrapped)]
+
+
+def bench_django(number):
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+    from wapp.metrics import MetricsMiddleware as DjangoMetricsMiddleware
+
+    request = RequestFactory().get('/api/posts/')
+    request.resolver_match = resolve('/api/posts/')
+    response = HttpResponse()
+
+    def view(request):
+        return response
+
+    middleware = DjangoMetricsMiddleware(view)
+    return [
+        ('django view', per_call_ns(lambda: view(request), number)),
+        ('django view + MetricsMiddleware', per_call_ns(lambda: middleware(request), number)),
+    ]
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django('sqlite', os.path.join(tmp, 'bench.sqlite3'))
+        results = bench_primitives(args.number) + bench_asgi(args.number) + bench_django(args.number // 10)
+    print(f"{'operation':<36} {'ns/op':>10}")
+    for label, ns in results:
+        print(f"{label:<36} {ns:10.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200000)
+    main(parser.parse_args())
@@ -0,0 +1,90 @@
+"""
+Накладні витрати профілювання на запит: Silk на кожен запит проти
+SamplingProfilerMiddleware (wapp/profiling.py) з різною часткою вибірки.
+
+View виконує два SQL-запити до SQLite (сторінка постів і лічильник), як
+типовий list. Silk вимірюється останнім: після першого запиту він назавжди
+підміняє SQLCompiler.execute_sql.
+
+    python benchmarks/bench_profiling.py --requests 2000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from bench_database import seed, setup_django
+
+
+def measure(handler, requests, factory):
+    latencies = []
+    for i in range(requests):
+        request = factory.get('/api/posts/', {'page': i % 5})
+        started = time.perf_counter()
+        handler(request)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.mean(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Silk встановлюється лише в режимі silk (INSTALLED_APPS і його таблиці)
+        os.environ['PROFILING_MODE'] = 'silk'
+        setup_django('sqlite', os.path.join(tmp, 'bench.sqlite3'))
+        seed(args.posts)
+
+        from django.http import JsonResponse
+        from django.test import RequestFactory
+        from silk.middleware import SilkyMiddleware
+        from silk.models import Request as SilkRequest
+        from wapp.profiling import SamplingProfilerMiddleware
+        from webap.models import BlogPost
+
+        def view(request):
+            page = int(request.GET.get('page', 0))
+            posts = list(BlogPost.objects.values('id', 'title', 'views_count')[page * 20:page * 20 + 20])
+            return JsonResponse({'count': BlogPost.objects.count(), 'results': posts})
+
+        def sampler(rate, slow_ms=0):
+            return SamplingProfilerMiddleware(view, config={
+                'SAMPLE_RATE': rate, 'SLOW_MS': slow_ms, 'INTERVAL_MS': 5, 'DIR': os.path.join(tmp, 'profiles'),
+            })
+
+        factory = RequestFactory()
+        measure(view, args.requests, factory)  # прогрів
+        cases = [
+            ('no profiling', view),
+            ('sample rate 0', sampler(0)),
+            ('sample rate 0.01', sampler(0.01)),
+            ('sample rate 0.1', sampler(0.1)),
+            ('sample rate 1.0', sampler(1.0)),
+            ('slow only (SLOW_MS=1000)', sampler(0, slow_ms=1000)),
+        ]
+        # Раунди по черзі зменшують вплив шуму; для кожного режиму - найкращий раунд
+        best = {}
+        for _ in range(args.rounds):
+            for label, handler in cases:
+                mean, p99 = measure(handler, args.requests, factory)
+                if isinstance(handler, SamplingProfilerMiddleware):
+                    handler.writer.join()
+                if label not in best or mean < best[label][0]:
+                    best[label] = (mean, p99)
+        results = [(label, *best[label]) for label, _ in cases]
+        results.append(('silk, every request', *measure(SilkyMiddleware(view), args.requests, factory)))
+        silk_rows = SilkRequest.objects.count()
+
+    baseline = results[0][1]
+    print(f"{'mode':<28} {'mean, us':>9} {'p99, us':>9} {'overhead':>9}")
+    for label, mean, p99 in results:
+        print(f"{label:<28} {mean * 1e6:9.0f} {p99 * 1e6:9.0f} {(mean / baseline - 1) * 100:8.1f}%")
+    print(f"silk rows written: {silk_rows}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=3)
+    main(parser.parse_args())
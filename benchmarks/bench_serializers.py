@@ -0,0 +1,85 @@
+"""
+Серіалізація сторінки постів: BlogPostSerializer + JSONRenderer проти
+webap.fast_serializers + FastJSONRenderer на тих самих даних (SQLite у
+тимчасовому файлі, теги, категорії, коментарі, позначки користувача).
+
+    python benchmarks/bench_serializers.py --posts 500 --comments 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bench_database import setup_django
+
+
+def seed(posts, comments):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from webap.models import BlogPost, Category, PostComment, Tag, UserInteraction
+
+    call_command('migrate', verbosity=0)
+    users = [get_user_model().objects.create(username=f'user{i}', first_name=f'User {i}') for i in range(20)]
+    categories = [Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(8)]
+    tags = [Tag.objects.create(name=f'tag{i}', slug=f'tag{i}') for i in range(30)]
+    rng = random.Random(1)
+    for i in range(posts):
+        post = BlogPost.objects.create(title=f'Post {i}', text='lorem ipsum ' * 150, author=rng.choice(users),
+                                       category=rng.choice(categories))
+        post.tags.set(rng.sample(tags, 3))
+        PostComment.objects.bulk_create(
+            PostComment(author=rng.choice(users), post=post, text='comment text ' * 10) for _ in range(comments)
+        )
+        if i % 3 == 0:
+            UserInteraction.objects.create(user=users[0], post=post, interaction_type='like')
+    return users[0]
+
+
+def measure(label, render, objects, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"{label:<34} {best * 1000:8.1f}ms  {objects / best:9.0f} objects/s")
+    return best
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django('sqlite-wal', os.path.join(tmp, 'bench.sqlite3'))
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from webap.fast_serializers import serialize_posts
+        from webap.models import BlogPost
+        from webap.renderers import FastJSONRenderer
+        from webap.serializers import BlogPostSerializer, latest_comments_prefetch
+
+        user = seed(args.posts, args.comments)
+        request = APIRequestFactory().get('/api/posts/')
+        request.user = user
+
+        def drf():
+            queryset = BlogPost.objects.select_related('author', 'category').prefetch_related(
+                'tags', latest_comments_prefetch())
+            data = BlogPostSerializer(queryset, many=True, context={'request': request}).data
+            return JSONRenderer().render(data)
+
+        def fast():
+            data = serialize_posts(BlogPost.objects.values_list('id', flat=True), user)
+            return FastJSONRenderer().render(data)
+
+        assert len(drf()) > 0 and len(fast()) > 0
+        slow = measure('BlogPostSerializer + JSONRenderer', drf, args.posts, args.runs)
+        quick = measure('fast_serializers + FastJSONRenderer', fast, args.posts, args.runs)
+        print(f"speedup x{slow / quick:.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--comments', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=5)
+    main(parser.parse_args())
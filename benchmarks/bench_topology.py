@@ -0,0 +1,53 @@
+"""
+Холодний старт воркера: від створення пулу до готовності споживати чергу.
+
+Порівнюються декларації топології при кожному старті (як було раніше в
+store.py/rabbitmq.py) та одноразовий bootstrap з blogcommon.topology.
+
+    PYTHONPATH=. python benchmarks/bench_topology.py --latency 0.002
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from blogcommon.messaging import AmqpSettings, ConnectionPool, Consumer
+from blogcommon.testing import InMemoryBroker
+from blogcommon.topology import apply_topology, bootstrap, default_topology
+
+SPEC = default_topology({})
+QUEUE = 'blog_event_store'
+
+
+async def cold_start(broker, declare_inline):
+    pool = ConnectionPool(AmqpSettings(url='amqp://bench/'), connect=broker.connect)
+    if declare_inline:
+        pool.on_connect(lambda channel: apply_topology(channel, SPEC))
+    consumer = Consumer(pool, QUEUE, lambda delivery: None)
+    round_trips = broker.round_trips
+    started = time.perf_counter()
+    consumer.start()
+    while not broker.queues.get(QUEUE) or not broker.queues[QUEUE].consumers:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    await consumer.stop()
+    await pool.close()
+    return elapsed, broker.round_trips - round_trips
+
+
+async def main(args):
+    broker = InMemoryBroker(latency=args.latency)
+    elapsed = await bootstrap(SPEC, AmqpSettings(url='amqp://bench/'), connect=broker.connect)
+    print(f"latency={args.latency * 1000:.1f}ms bootstrap (once): {elapsed * 1000:.1f}ms")
+    for declare_inline in (True, False):
+        results = [await cold_start(broker, declare_inline) for _ in range(args.runs)]
+        label = 'inline declarations' if declare_inline else 'bootstrapped topology'
+        print(f"{label:<22} cold start median {statistics.median(r[0] for r in results) * 1000:7.1f}ms, "
+              f"{results[0][1]} broker round trips")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.002, help='імітована затримка брокера, с')
+    parser.add_argument('--runs', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
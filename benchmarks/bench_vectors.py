@@ -0,0 +1,89 @@
+"""
+Сховище векторів постів (recommendation/vectors.py): IVF проти повного перебору.
+
+Вектори - суміш гаусових кластерів на одиничній сфері (схожі пости
+групуються за темами). Вимірюються:
+  - побудова індексу (k-means + впорядкування рядків за списками);
+  - інкрементальне додавання по одному вектору (хвіст з найближчим центроїдом);
+  - k-NN запит для різних nprobe: p50/p99 і recall@k відносно brute_force.
+
+    PYTHONPATH=recommendation python benchmarks/bench_vectors.py --posts 1000000
+    PYTHONPATH=recommendation python benchmarks/bench_vectors.py --posts 200000 --dim 64 --nprobe 1,4,16
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from vectors import VectorStore, normalize
+
+
+def clustered(rng, count, centers, noise):
+    labels = rng.integers(len(centers), size=count)
+    return normalize(centers[labels] + noise * rng.standard_normal((count, centers.shape[1]), dtype=np.float32))
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (statistics.median(timings) * 1000, timings[int(len(timings) * 0.99) - 1] * 1000)
+
+
+def main(args):
+    rng = np.random.default_rng(1)
+    centers = normalize(rng.standard_normal((args.clusters, args.dim), dtype=np.float32))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(tmp, dim=args.dim, rebuild_ratio=None)
+        started = time.perf_counter()
+        for start in range(0, args.posts, 100000):
+            count = min(100000, args.posts - start)
+            store.add_many(np.arange(start, start + count), clustered(rng, count, centers, args.noise))
+        print(f"loaded {args.posts} vectors in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        store.rebuild(args.nlist)
+        print(f"index built in {time.perf_counter() - started:.1f}s: {store.meta['nlist']} lists")
+
+        inserts = clustered(rng, args.samples, centers, args.noise)
+        timings = []
+        for offset, vector in enumerate(inserts):
+            started = time.perf_counter()
+            store.add(args.posts + offset, vector)
+            timings.append(time.perf_counter() - started)
+        p50, p99 = percentiles(timings)
+        print(f"{'insert one':<16} {p50:8.3f} {p99:8.3f} ms")
+
+        queries = clustered(rng, args.samples, centers, args.noise)
+        exact = []
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            exact.append({post_id for post_id, _ in store.brute_force(query, args.k)})
+            timings.append(time.perf_counter() - started)
+        p50, p99 = percentiles(timings)
+        print(f"{'query':<16} {'p50 ms':>8} {'p99 ms':>8} {'recall@' + str(args.k):>10}")
+        print(f"{'brute force':<16} {p50:8.3f} {p99:8.3f} {1.0:10.3f}")
+
+        for nprobe in map(int, args.nprobe.split(',')):
+            timings, recall = [], []
+            for query, expected in zip(queries, exact):
+                started = time.perf_counter()
+                found = store.nearest(query, args.k, nprobe=nprobe)
+                timings.append(time.perf_counter() - started)
+                recall.append(len(expected.intersection(post_id for post_id, _ in found)) / args.k)
+            p50, p99 = percentiles(timings)
+            print(f"{'ivf nprobe=' + str(nprobe):<16} {p50:8.3f} {p99:8.3f} {statistics.mean(recall):10.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--clusters', type=int, default=2000, help="кількість тем у синтетичних даних")
+    parser.add_argument('--noise', type=float, default=0.08, help="розкид векторів навколо теми")
+    parser.add_argument('--nlist', type=int, help="кількість списків IVF (за замовчуванням sqrt(posts))")
+    parser.add_argument('--nprobe', default='1,4,8,16,32')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--samples', type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,74 @@
+"""
+Журнал переглядів (webap/viewlog.py): швидкість стиснення сирих подій у
+підсумки користувач/пост і час читання переглянутих постів користувача
+(поле seen контексту рекомендацій) до і після стиснення.
+
+Перегляди розподілені за Ціпфом: кілька популярних постів переглядають
+багато разів, тож подій у рази більше, ніж пар користувач/пост.
+
+    python benchmarks/bench_viewlog.py --users 200 --views 200000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from bench_database import seed, setup_django
+
+
+def seen_latency(user_ids, repeat):
+    from webap.viewlog import viewed_post_ids
+
+    started = time.perf_counter()
+    for i in range(repeat):
+        set(viewed_post_ids(user_ids[i % len(user_ids)]))
+    return (time.perf_counter() - started) / repeat
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(args.profile, os.path.join(tmp, 'bench.sqlite3'))
+        ids = seed(args.posts)
+
+        from django.contrib.auth import get_user_model
+        from django.utils import timezone
+        from webap.models import ViewAggregate, ViewEvent
+        from webap.viewlog import compact
+
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f'viewer{i}') for i in range(args.users)
+        )
+        user_ids = [user.id for user in users]
+        rng = random.Random(1)
+        weights = [1 / (rank + 1) for rank in range(len(ids))]
+        now = timezone.now()
+        events = [
+            ViewEvent(user_id=rng.choice(user_ids), post_id=post_id,
+                      viewed_at=now - timedelta(seconds=rng.uniform(0, args.days * 86400)))
+            for post_id in rng.choices(ids, weights, k=args.views)
+        ]
+        ViewEvent.objects.bulk_create(events, batch_size=5000)
+
+        raw = seen_latency(user_ids, args.repeat)
+        started = time.perf_counter()
+        compacted, pairs = compact(now)
+        elapsed = time.perf_counter() - started
+        after = seen_latency(user_ids, args.repeat)
+        aggregates = ViewAggregate.objects.count()
+
+    print(f"events: {args.views}, compacted: {compacted} into {pairs} user/post pairs, {aggregates} aggregates")
+    print(f"compaction: {elapsed:.2f} s, {compacted / elapsed:.0f} events/s")
+    print(f"seen per user: raw log {raw * 1e3:.2f} ms, compacted {after * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--views', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--profile', default='sqlite-wal')
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+"""
+Клієнт внутрішнього API блогу (Django) для воркерів.
+
+Тексти постів читаються пакетами через /api/internal/posts/?ids=...:
+PostBatcher збирає запити з паралельних обробників споживача протягом
+короткого вікна і робить один HTTP-запит на пакет. Контекст користувача для
+рекомендацій - /api/internal/users/<id>/context/.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterable, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class BlogApiClient:
+    def __init__(self, base_url: str = None, service_token: str = None, timeout: float = 10.0):
+        self.base_url = (base_url or os.environ.get('BLOG_API_URL', 'http://127.0.0.1:8000')).rstrip('/')
+        self.timeout = timeout
+        # Keep-alive з'єднання замість нового TCP-конекту на кожне повідомлення
+        self.session = requests.Session()
+        self.session.headers['X-Service-Token'] = service_token or os.environ.get('INTERNAL_SERVICE_TOKEN', '')
+
+    def fetch_posts(self, post_ids: Iterable[int]) -> Dict[int, dict]:
+        """{id: {'id', 'text', 'author'}} для існуючих постів; відсутні пропускаються"""
+        ids = ','.join(str(post_id) for post_id in post_ids)
+        response = self.session.get(f'{self.base_url}/api/internal/posts/', params={'ids': ids},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return {post['id']: post for post in response.json()['posts']}
+
+    def user_context(self, user_id: int, timeout: Optional[float] = None) -> dict:
+        """Інтереси, підписки, лайки, бітмапа переглянутих постів і тренди користувача"""
+        response = self.session.get(f'{self.base_url}/api/internal/users/{user_id}/context/',
+                                    timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class PostBatcher:
+    """
+    Потокобезпечний мікро-батчер: get() блокується, доки пакет не буде
+    відправлено - після max_wait секунд або при наборі max_batch id.
+    """
+
+    def __init__(self, client: BlogApiClient, max_batch: int = 50, max_wait: float = 0.02):
+        self.client = client
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._timer: Optional[threading.Timer] = None
+        self.requests = 0
+
+    def get(self, post_id: int, timeout: float = 30.0) -> Optional[dict]:
+        # fetch_posts повертає ключі-числа з JSON; id з повідомлення може бути рядком ("42")
+        post_id = int(post_id)
+        batch = None
+        with self._lock:
+            future = self._pending.get(post_id)
+            if future is None:
+                future = self._pending[post_id] = Future()
+                if len(self._pending) >= self.max_batch:
+                    batch = self._take()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.max_wait, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self._fetch(batch)
+        return future.result(timeout)
+
+    def _take(self) -> Dict[int, Future]:
+        batch, self._pending = self._pending, {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._fetch(batch)
+
+    def _fetch(self, batch: Dict[int, Future]):
+        self.requests += 1
+        try:
+            posts = self.client.fetch_posts(batch.keys())
+        except Exception as e:
+            logger.error("Failed to fetch %s posts from blog API: %s", len(batch), e)
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for post_id, future in batch.items():
+            future.set_result(posts.get(post_id))
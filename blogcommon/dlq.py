@@ -0,0 +1,281 @@
+"""
+Повторна обробка повідомлень з dead-letter черг.
+
+Обробник DLQ відправляє кожне відхилене повідомлення в чергу-затримку
+наступного рівня (TTL-черга, після якої повідомлення повертається у
+вихідну чергу). Після вичерпання рівнів або для пошкоджених повідомлень
+воно паркується в <queue>.parking. CLI дозволяє переглянути глибину черг
+і повторно відправити діапазон повідомлень з обмеженням швидкості:
+
+    python -m blogcommon.dlq process
+    python -m blogcommon.dlq stats
+    python -m blogcommon.dlq peek --queue parking --limit 20
+    python -m blogcommon.dlq replay --queue parking --start 100 --count 500 --rate 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import List, Optional
+
+from aiormq import spec
+
+from blogcommon.messaging import AmqpSettings, ConnectionPool, OutgoingMessage, Publisher, run_worker
+
+logger = logging.getLogger(__name__)
+
+RETRY_COUNT_HEADER = 'x-retry-count'
+ORIGINAL_QUEUE_HEADER = 'x-original-queue'
+POISON_REASON_HEADER = 'x-poison-reason'
+
+
+def retry_delays(env=None) -> List[int]:
+    """Затримки рівнів повтору в секундах, MODERATION_RETRY_DELAYS="5,30,300" """
+    env = os.environ if env is None else env
+    return [int(delay) for delay in env.get('MODERATION_RETRY_DELAYS', '5,30,300').split(',') if delay.strip()]
+
+
+def retry_queue_name(queue: str, tier: int) -> str:
+    return f'{queue}.retry.{tier}'
+
+
+def parking_queue_name(queue: str) -> str:
+    return f'{queue}.parking'
+
+
+def retry_queues(queue: str, retry_exchange: str, delays: List[int]) -> List[dict]:
+    """Специфікації TTL-черг для topology: прострочене повідомлення повертається в queue"""
+    specs = [
+        {
+            'name': retry_queue_name(queue, tier),
+            'arguments': {
+                'x-message-ttl': delay * 1000,
+                'x-dead-letter-exchange': '',
+                'x-dead-letter-routing-key': queue,
+            },
+            'bindings': [{'exchange': retry_exchange, 'routing_key': retry_queue_name(queue, tier)}],
+        }
+        for tier, delay in enumerate(delays, start=1)
+    ]
+    specs.append({
+        'name': parking_queue_name(queue),
+        'bindings': [{'exchange': retry_exchange, 'routing_key': parking_queue_name(queue)}],
+    })
+    return specs
+
+
+def original_queue(headers: dict) -> Optional[str]:
+    """Черга, з якої повідомлення потрапило в DLQ (з x-death або нашого заголовка)"""
+    if headers.get(ORIGINAL_QUEUE_HEADER):
+        return headers[ORIGINAL_QUEUE_HEADER]
+    for death in headers.get('x-death') or []:
+        if death.get('reason') == 'rejected':
+            return death.get('queue')
+    return None
+
+
+def is_empty(message) -> bool:
+    return message is None or isinstance(message.delivery, spec.Basic.GetEmpty)
+
+
+def clean_headers(headers: dict, **updates) -> dict:
+    """x-death та інші службові заголовки RabbitMQ не переносяться в повторну публікацію"""
+    cleaned = {key: value for key, value in headers.items()
+               if key != 'x-death' and not key.startswith('x-first-death')
+               and not key.startswith('x-last-death')}
+    cleaned.update(updates)
+    return cleaned
+
+
+class DeadLetterProcessor:
+    """Обробник DLQ-черги для споживача blogcommon.messaging"""
+
+    def __init__(self, source_queue: str, retry_exchange: str, delays: List[int]):
+        self.source_queue = source_queue
+        self.retry_exchange = retry_exchange
+        self.delays = delays
+
+    def poison_reason(self, delivery, attempt: int) -> Optional[str]:
+        try:
+            body = delivery.body
+        except ValueError:
+            return 'undecodable body'
+        if not isinstance(body, dict) or 'correlationId' not in body:
+            return 'malformed message'
+        if attempt >= len(self.delays):
+            return f'retries exhausted after {attempt} attempts'
+        return None
+
+    def __call__(self, delivery) -> List[OutgoingMessage]:
+        attempt = int(delivery.headers.get(RETRY_COUNT_HEADER, 0))
+        headers = clean_headers(
+            delivery.headers,
+            **{ORIGINAL_QUEUE_HEADER: original_queue(delivery.headers) or self.source_queue}
+        )
+        reason = self.poison_reason(delivery, attempt)
+        if reason:
+            logger.warning("Parking poison message from %s: %s", self.source_queue, reason)
+            headers[POISON_REASON_HEADER] = reason
+            target = parking_queue_name(self.source_queue)
+        else:
+            headers[RETRY_COUNT_HEADER] = attempt + 1
+            target = retry_queue_name(self.source_queue, attempt + 1)
+            logger.info("Retrying message in %ss (attempt %s/%s)",
+                        self.delays[attempt], attempt + 1, len(self.delays))
+        return [OutgoingMessage(self.retry_exchange, target, delivery.raw, headers)]
+
+
+class RateLimiter:
+    """Рівномірне обмеження швидкості: не більше rate подій на секунду"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(self._next, now) + self.interval
+
+
+async def queue_depths(pool: ConnectionPool, queues: List[str]) -> dict:
+    connection = await pool.connection()
+    depths = {}
+    for name in queues:
+        channel = await connection.channel()
+        try:
+            result = await channel.queue_declare(queue=name, passive=True)
+            depths[name] = result.message_count
+        except Exception:
+            depths[name] = None
+        finally:
+            if not channel.is_closed:
+                await channel.close()
+    return depths
+
+
+async def peek(pool: ConnectionPool, queue: str, limit: int) -> List[dict]:
+    """Перші limit повідомлень черги; всі вони повертаються в чергу"""
+    connection = await pool.connection()
+    channel = await connection.channel()
+    messages, last_tag = [], None
+    try:
+        for position in range(limit):
+            message = await channel.basic_get(queue)
+            if is_empty(message):
+                break
+            last_tag = message.delivery.delivery_tag
+            headers = message.header.properties.headers or {}
+            try:
+                correlation_id = json.loads(message.body).get('correlationId')
+            except (ValueError, AttributeError):
+                correlation_id = None
+            messages.append({
+                'position': position,
+                'correlationId': correlation_id,
+                'attempts': headers.get(RETRY_COUNT_HEADER, 0),
+                'queue': original_queue(headers),
+                'poison': headers.get(POISON_REASON_HEADER),
+            })
+    finally:
+        if last_tag is not None:
+            await channel.basic_nack(last_tag, multiple=True, requeue=True)
+        await channel.close()
+    return messages
+
+
+async def replay(pool: ConnectionPool, queue: str, start: int, count: int, rate: float,
+                 default_target: Optional[str] = None) -> int:
+    """
+    Повторно відправляє повідомлення з позицій [start, start + count) у їхні
+    вихідні черги (напряму, без повторного fan-out через exchange).
+    Повідомлення до start тримаються непідтвердженими і повертаються в кінці
+    (nack multiple зачіпає лише їх - решта вже підтверджена).
+    """
+    connection = await pool.connection()
+    channel = await connection.channel()
+    publisher = Publisher(pool)
+    limiter = RateLimiter(rate)
+    replayed, held_tag = 0, None
+    try:
+        for position in range(start + count):
+            message = await channel.basic_get(queue)
+            if is_empty(message):
+                break
+            tag = message.delivery.delivery_tag
+            headers = message.header.properties.headers or {}
+            target = original_queue(headers) or default_target
+            if position < start or target is None:
+                if position >= start:
+                    logger.warning("Message at position %s has no original queue, skipped", position)
+                held_tag = tag
+                continue
+            await limiter.wait()
+            await publisher.publish(OutgoingMessage(
+                '', target, message.body,
+                clean_headers(headers, **{RETRY_COUNT_HEADER: 0}),
+            ))
+            await channel.basic_ack(tag)
+            replayed += 1
+    finally:
+        if held_tag is not None and not channel.is_closed:
+            await channel.basic_nack(held_tag, multiple=True, requeue=True)
+        if not channel.is_closed:
+            await channel.close()
+    return replayed
+
+
+def main():
+    queue = os.environ.get('MODERATION_QUEUE', 'blog_event_moderation')
+    dlq = os.environ.get('DLQ_MODERATION', 'blog_event_moderation_dlq')
+    retry_exchange = os.environ.get('RETRY_EVENT_EXCHANGE', 'blog.events.retry')
+    delays = retry_delays()
+    queues = {'dlq': dlq, 'parking': parking_queue_name(queue)}
+
+    parser = argparse.ArgumentParser(description="Dead-letter queue tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('process', help="run the DLQ processor (tiered retries)")
+    commands.add_parser('stats', help="show DLQ, retry tier and parking queue depths")
+    peek_parser = commands.add_parser('peek', help="show messages without removing them")
+    peek_parser.add_argument('--queue', default='dlq', help="dlq, parking or a queue name")
+    peek_parser.add_argument('--limit', type=int, default=20)
+    replay_parser = commands.add_parser('replay', help="re-drive a range of messages to their source queue")
+    replay_parser.add_argument('--queue', default='parking', help="dlq, parking or a queue name")
+    replay_parser.add_argument('--start', type=int, default=0)
+    replay_parser.add_argument('--count', type=int, default=100)
+    replay_parser.add_argument('--rate', type=float, default=50, help="messages per second, 0 - unlimited")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'process':
+        run_worker(dlq, DeadLetterProcessor(queue, retry_exchange, delays))
+        return
+
+    async def run():
+        pool = ConnectionPool(AmqpSettings.from_env(reconnect_attempts=3))
+        try:
+            if args.command == 'stats':
+                names = [dlq, *(retry_queue_name(queue, tier) for tier in range(1, len(delays) + 1)),
+                         parking_queue_name(queue)]
+                for name, depth in (await queue_depths(pool, names)).items():
+                    print(f"{name:<45} {'missing' if depth is None else depth}")
+            elif args.command == 'peek':
+                for message in await peek(pool, queues.get(args.queue, args.queue), args.limit):
+                    print(json.dumps(message, ensure_ascii=False))
+            elif args.command == 'replay':
+                replayed = await replay(pool, queues.get(args.queue, args.queue), args.start, args.count,
+                                        args.rate, default_target=queue)
+                print(f"Replayed {replayed} messages")
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Захист від повторної обробки повідомлень (at-least-once доставка, replay з DLQ).
+
+SeenSet - обмежена LRU-множина вже оброблених ключів (correlationId) у
+пам'яті процесу з необов'язковим постійним сховищем, яке переживає
+перезапуски і спільне для всіх реплік сервісу.
+"""
+import datetime
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MongoSeenStore:
+    """Оброблені ключі в Mongo-колекції; TTL-індекс обмежує її розмір"""
+
+    def __init__(self, collection, ttl_seconds: int = 7 * 24 * 3600):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._indexed = False
+
+    def _ensure_index(self):
+        if not self._indexed:
+            self.collection.create_index('processed_at', expireAfterSeconds=self.ttl_seconds)
+            self._indexed = True
+
+    def contains(self, key: str) -> bool:
+        return self.collection.count_documents({'_id': key}, limit=1) > 0
+
+    def add(self, key: str):
+        self._ensure_index()
+        self.collection.update_one(
+            {'_id': key},
+            {'$setOnInsert': {'processed_at': datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True,
+        )
+
+
+class SeenSet:
+    """
+    Потокобезпечна: споживач викликає її з пулу потоків.
+    Перевірка спершу йде в пам'ять і лише при промаху - в сховище.
+    """
+
+    def __init__(self, capacity: int = 100_000, store: Optional[MongoSeenStore] = None):
+        self.capacity = capacity
+        self.store = store
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _remember(self, key: str):
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self.hits += 1
+                return True
+        if self.store is not None and self.store.contains(key):
+            self._remember(key)
+            self.hits += 1
+            return True
+        return False
+
+    def add(self, key: str):
+        self._remember(key)
+        if self.store is not None:
+            self.store.add(key)
+
+    def __len__(self):
+        return len(self._keys)
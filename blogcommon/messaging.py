@@ -0,0 +1,463 @@
+"""
+Спільна бібліотека роботи з RabbitMQ для всіх сервісів.
+
+Один довготривалий конект на процес, пул каналів для публікації,
+пакетні підтвердження брокера (publisher confirms), автоматичне
+перепідключення з експоненційною затримкою та споживач черги
+з обмеженням конкурентності. Споживач рахує отримані й підтверджені
+повідомлення, час обробки та глибину черги (lag) у blogcommon.metrics,
+а також продовжує трасування з заголовків (blogcommon.tracing).
+"""
+import asyncio
+import contextvars
+import inspect
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+import aiormq
+from aiormq import spec
+
+from blogcommon import tracing
+from blogcommon.metrics import Counter, Gauge, Histogram, export_textfile
+
+logger = logging.getLogger(__name__)
+
+PERSISTENT_DELIVERY_MODE = 2
+TRANSIENT_DELIVERY_MODE = 1
+
+# Помилки, після яких має сенс перепідключитися до брокера
+CONNECTION_ERRORS = (
+    ConnectionError,
+    OSError,
+    aiormq.exceptions.AMQPConnectionError,
+    aiormq.exceptions.ChannelInvalidStateError,
+)
+
+
+MESSAGES_CONSUMED = Counter('amqp_messages_consumed_total', "Отримані повідомлення", ['queue'])
+# outcome: ack, nack (помилка обробника), reject (RejectMessage), duplicate (ack без обробки)
+MESSAGES_SETTLED = Counter('amqp_messages_settled_total', "Підтверджені/відхилені повідомлення",
+                           ['queue', 'outcome'])
+HANDLER_DURATION = Histogram('amqp_handler_duration_seconds', "Час обробки повідомлення", ['queue'])
+QUEUE_DEPTH = Gauge('amqp_queue_depth', "Готові до доставки повідомлення в черзі (відставання споживача)",
+                    ['queue'])
+
+
+class PublishError(Exception):
+    """Брокер не підтвердив (nack/reject) опубліковане повідомлення"""
+
+
+class RejectMessage(Exception):
+    """
+    Обробник відмовляється від повідомлення: воно відправляється
+    в dead-letter чергу без трасування помилки в логах
+    """
+
+
+@dataclass
+class AmqpSettings:
+    url: str
+    prefetch: int = 10
+    concurrency: int = 4
+    channel_pool_size: int = 4
+    confirm_batch: int = 100
+    reconnect_attempts: int = 0  # 0 - перепідключатися нескінченно
+    reconnect_delay: float = 1.0
+    reconnect_max_delay: float = 30.0
+    lag_interval: float = 15.0  # період опитування глибини черги споживачем, 0 - вимкнено
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """
+        Налаштування з оточення. AMQP_URL має пріоритет над
+        AMQP_USER/AMQP_PASS/AMQP_HOST (значення вже url-екрановані)
+        """
+        url = os.environ.get('AMQP_URL') or (
+            f"amqp://{os.environ['AMQP_USER']}:{os.environ['AMQP_PASS']}@{os.environ['AMQP_HOST']}/"
+        )
+        settings = cls(
+            url=url,
+            prefetch=int(os.environ.get('AMQP_PREFETCH', cls.prefetch)),
+            concurrency=int(os.environ.get('AMQP_CONCURRENCY', cls.concurrency)),
+            channel_pool_size=int(os.environ.get('AMQP_CHANNEL_POOL_SIZE', cls.channel_pool_size)),
+            confirm_batch=int(os.environ.get('AMQP_CONFIRM_BATCH', cls.confirm_batch)),
+            reconnect_attempts=int(os.environ.get('AMQP_RECONNECT_ATTEMPTS', cls.reconnect_attempts)),
+            reconnect_delay=float(os.environ.get('AMQP_RECONNECT_DELAY', cls.reconnect_delay)),
+            reconnect_max_delay=float(os.environ.get('AMQP_RECONNECT_MAX_DELAY', cls.reconnect_max_delay)),
+            lag_interval=float(os.environ.get('AMQP_LAG_INTERVAL', cls.lag_interval)),
+        )
+        for key, value in overrides.items():
+            setattr(settings, key, value)
+        return settings
+
+
+@dataclass
+class OutgoingMessage:
+    exchange: str
+    routing_key: str
+    body: Any
+    headers: dict = field(default_factory=dict)
+    persistent: bool = True
+
+    def encode(self) -> bytes:
+        if isinstance(self.body, bytes):
+            return self.body
+        return json.dumps(self.body).encode('utf-8')
+
+    def properties(self) -> spec.Basic.Properties:
+        return spec.Basic.Properties(
+            content_type='application/json',
+            delivery_mode=PERSISTENT_DELIVERY_MODE if self.persistent else TRANSIENT_DELIVERY_MODE,
+            # Під час обробки повідомлення - заголовки трасування поточного span'а
+            headers=tracing.inject(self.headers) or None,
+        )
+
+
+@dataclass
+class Delivery:
+    """Отримане повідомлення в зручному для обробника вигляді"""
+    raw: bytes
+    headers: dict
+    routing_key: str
+    redelivered: bool
+
+    @cached_property
+    def body(self) -> Any:
+        # JSON розбирається ліниво: обробник DLQ працює і з пошкодженими повідомленнями
+        return json.loads(self.raw.decode())
+
+    @classmethod
+    def from_message(cls, message) -> 'Delivery':
+        headers = message.header.properties.headers or {}
+        return cls(
+            raw=message.body,
+            headers=dict(headers),
+            routing_key=message.delivery.routing_key,
+            redelivered=bool(message.delivery.redelivered),
+        )
+
+
+def correlation_id(delivery: Delivery) -> Optional[str]:
+    """Ключ ідемпотентності за замовчуванням"""
+    try:
+        body = delivery.body
+    except ValueError:
+        return None
+    return body.get('correlationId') if isinstance(body, dict) else None
+
+
+# Обробник отримує Delivery і повертає повідомлення для публікації (або None).
+# Може бути як звичайною функцією (виконується в пулі потоків), так і корутиною.
+Handler = Callable[[Delivery], Optional[Iterable[OutgoingMessage]]]
+
+
+def backoff_delays(settings: AmqpSettings):
+    """Експоненційні затримки між спробами підключення з невеликим джитером"""
+    delay = settings.reconnect_delay
+    attempt = 0
+    while not settings.reconnect_attempts or attempt < settings.reconnect_attempts:
+        attempt += 1
+        yield attempt, delay + random.uniform(0, delay / 10)
+        delay = min(delay * 2, settings.reconnect_max_delay)
+
+
+class ConnectionPool:
+    """
+    Довготривалий конект до брокера та пул каналів з підтвердженнями.
+    Конект відкривається при першому зверненні, а не при імпорті модуля.
+    """
+
+    def __init__(self, settings: AmqpSettings, connect: Optional[Callable[[str], Awaitable]] = None):
+        self.settings = settings
+        self._connect = connect or aiormq.connect
+        self._connection = None
+        self._channels: Optional[asyncio.LifoQueue] = None
+        self._lock = asyncio.Lock()
+        self._on_connect: List[Callable[[Any], Awaitable]] = []
+
+    def on_connect(self, callback: Callable[[Any], Awaitable]):
+        """Корутина, що викликається з каналом після кожного (пере)підключення"""
+        self._on_connect.append(callback)
+
+    async def connection(self):
+        async with self._lock:
+            if self._connection is None or self._connection.is_closed:
+                self._connection = await self._connect_with_backoff()
+                self._channels = asyncio.LifoQueue()
+                if self._on_connect:
+                    channel = await self._connection.channel()
+                    for callback in self._on_connect:
+                        await callback(channel)
+                    await channel.close()
+            return self._connection
+
+    async def _connect_with_backoff(self):
+        last_error = None
+        for attempt, delay in backoff_delays(self.settings):
+            try:
+                connection = await self._connect(self.settings.url)
+                logger.info("Connected to RabbitMQ")
+                return connection
+            except CONNECTION_ERRORS as e:
+                last_error = e
+                logger.info("Failed to connect to RabbitMQ, attempt %s: %s", attempt, e)
+                await asyncio.sleep(delay)
+        raise ConnectionError("Failed to connect to RabbitMQ") from last_error
+
+    @asynccontextmanager
+    async def channel(self):
+        """Канал з увімкненими publisher confirms, що повертається в пул після використання"""
+        connection = await self.connection()
+        channels = self._channels
+        channel = None
+        while not channels.empty():
+            candidate = channels.get_nowait()
+            if not candidate.is_closed:
+                channel = candidate
+                break
+        if channel is None:
+            channel = await connection.channel(publisher_confirms=True)
+        try:
+            yield channel
+        finally:
+            if not channel.is_closed and channels is self._channels \
+                    and channels.qsize() < self.settings.channel_pool_size:
+                channels.put_nowait(channel)
+
+    async def close(self):
+        if self._connection is not None and not self._connection.is_closed:
+            await self._connection.close()
+        self._connection = None
+
+
+class Publisher:
+    """Публікація з підтвердженнями брокера; пакет підтверджень очікується разом"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    async def publish(self, message: OutgoingMessage):
+        await self.publish_many([message])
+
+    async def publish_many(self, messages: Iterable[OutgoingMessage]):
+        messages = list(messages)
+        if not messages:
+            return
+        try:
+            await self._publish_batches(messages)
+        except CONNECTION_ERRORS as e:
+            # Одна повторна спроба на свіжому конекті
+            logger.warning("Publish failed (%s), reconnecting", e)
+            await self._publish_batches(messages)
+
+    async def _publish_batches(self, messages: List[OutgoingMessage]):
+        batch = max(1, self.pool.settings.confirm_batch)
+        async with self.pool.channel() as channel:
+            for start in range(0, len(messages), batch):
+                chunk = messages[start:start + batch]
+                confirmations = await asyncio.gather(*(
+                    channel.basic_publish(
+                        message.encode(),
+                        exchange=message.exchange,
+                        routing_key=message.routing_key,
+                        properties=message.properties(),
+                    )
+                    for message in chunk
+                ))
+                for message, confirmation in zip(chunk, confirmations):
+                    if not isinstance(confirmation, spec.Basic.Ack):
+                        raise PublishError(
+                            f"Message to {message.exchange}/{message.routing_key} was not confirmed"
+                        )
+
+
+class Consumer:
+    """
+    Споживач черги: prefetch обмежує кількість непідтверджених повідомлень,
+    concurrency - кількість одночасно виконуваних обробників.
+    Повідомлення підтверджується (ack) лише після публікації результатів
+    обробника; при помилці - nack без повернення в чергу (у DLQ).
+
+    Якщо передано dedupe (blogcommon.idempotency.SeenSet), повідомлення з
+    уже обробленим ключем (за замовчуванням correlationId) лише ack'аються.
+    Ключ запам'ятовується після публікації результатів, тож невдала спроба
+    не блокує повторну.
+    """
+
+    def __init__(self, pool: ConnectionPool, queue: str, handler: Handler,
+                 publisher: Optional[Publisher] = None,
+                 prefetch: Optional[int] = None, concurrency: Optional[int] = None,
+                 dedupe=None, dedupe_key: Callable[[Delivery], Optional[str]] = None):
+        self.pool = pool
+        self.queue = queue
+        self.handler = handler
+        self.publisher = publisher or Publisher(pool)
+        self.dedupe = dedupe
+        self.dedupe_key = dedupe_key or correlation_id
+        self.prefetch = prefetch or pool.settings.prefetch
+        self.concurrency = concurrency or pool.settings.concurrency
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._executor = None
+        if not inspect.iscoroutinefunction(handler):
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                                thread_name_prefix=f'consumer-{queue}')
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        """Споживання з автоматичним перепідключенням після розриву конекту"""
+        while True:
+            try:
+                connection = await self.pool.connection()
+                channel = await connection.channel()
+                await channel.basic_qos(prefetch_count=self.prefetch)
+                await channel.basic_consume(self.queue, self._on_message)
+                logger.info("[*] Waiting for messages from %s", self.queue)
+                lag = None
+                if self.pool.settings.lag_interval:
+                    lag = asyncio.get_running_loop().create_task(self._watch_depth(connection))
+                try:
+                    await self._closed(connection, channel)
+                finally:
+                    if lag is not None:
+                        lag.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Consumer of %s lost connection: %s", self.queue, e)
+                await asyncio.sleep(self.pool.settings.reconnect_delay)
+
+    @staticmethod
+    async def _closed(connection, channel):
+        """
+        Чекає на закриття каналу споживання або конекту. Брокер може закрити
+        лише канал (помилка каналу), і тоді споживання теж треба відновити:
+        run відкриває новий канал на тому ж конекті.
+        """
+        done, _ = await asyncio.wait({connection.closing, channel.closing}, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            if not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    async def _watch_depth(self, connection):
+        """
+        Глибина черги з пасивної декларації - скільки повідомлень чекає на споживача.
+        Декларація йде окремим короткоживучим каналом: помилка (NOT_FOUND) закриває
+        його, а не канал споживання.
+        """
+        depth = QUEUE_DEPTH.labels(self.queue)
+        while not connection.is_closed:
+            try:
+                channel = await connection.channel()
+                try:
+                    declared = await channel.queue_declare(self.queue, passive=True)
+                finally:
+                    if not channel.is_closed:
+                        await channel.close()
+            except CONNECTION_ERRORS + (aiormq.exceptions.AMQPChannelError,) as e:
+                logger.debug("Queue depth of %s is unavailable: %s", self.queue, e)
+            else:
+                depth.set(declared.message_count)
+            await asyncio.sleep(self.pool.settings.lag_interval)
+
+    async def _call_handler(self, delivery: Delivery):
+        if self._executor is None:
+            return await self.handler(delivery)
+        return await self._run_blocking(self.handler, delivery)
+
+    async def _run_blocking(self, func, *args):
+        # run_in_executor не переносить contextvars: span'и обробника мають батьком span повідомлення
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, func, *args)
+
+    async def _on_message(self, message):
+        delivery_tag = message.delivery.delivery_tag
+        received = time.time()
+        MESSAGES_CONSUMED.labels(self.queue).inc()
+        async with self._semaphore:
+            try:
+                delivery = Delivery.from_message(message)
+                trace_id = correlation_id(delivery) if tracing.tracer.enabled else None
+                with tracing.consume_span(f'consume.{self.queue}', delivery.headers, trace_id,
+                                          received, queue=self.queue):
+                    await self._process(message, delivery)
+            except RejectMessage as e:
+                logger.error("Message rejected: %s", e)
+                await message.channel.basic_nack(delivery_tag, requeue=False)
+                MESSAGES_SETTLED.labels(self.queue, 'reject').inc()
+            except Exception as e:
+                logger.exception(e)
+                if not message.channel.is_closed:
+                    await message.channel.basic_nack(delivery_tag, requeue=False)
+                    MESSAGES_SETTLED.labels(self.queue, 'nack').inc()
+
+    async def _process(self, message, delivery: Delivery):
+        delivery_tag = message.delivery.delivery_tag
+        key = self.dedupe_key(delivery) if self.dedupe is not None else None
+        if key is not None and await self._run_blocking(self.dedupe.seen, key):
+            logger.info("Duplicate message %s from %s skipped", key, self.queue)
+            tracing.annotate(duplicate=True)
+            await message.channel.basic_ack(delivery_tag)
+            MESSAGES_SETTLED.labels(self.queue, 'duplicate').inc()
+            return
+        with HANDLER_DURATION.labels(self.queue).time():
+            outgoing = await self._call_handler(delivery)
+        if outgoing:
+            with tracing.span('publish', messages=len(outgoing)):
+                await self.publisher.publish_many(outgoing)
+        if key is not None:
+            await self._run_blocking(self.dedupe.add, key)
+        await message.channel.basic_ack(delivery_tag)
+        MESSAGES_SETTLED.labels(self.queue, 'ack').inc()
+
+
+def run_worker(queue: str, handler: Handler, on_connect: Optional[Callable[[Any], Awaitable]] = None,
+               settings: Optional[AmqpSettings] = None, dedupe=None):
+    """
+    Точка входу для окремих воркерів: споживає чергу до Ctrl+C.
+    Якщо задано METRICS_FILE, метрики процесу періодично пишуться в цей файл.
+    """
+
+    async def main():
+        pool = ConnectionPool(settings or AmqpSettings.from_env())
+        if on_connect is not None:
+            pool.on_connect(on_connect)
+        consumer = Consumer(pool, queue, handler, dedupe=dedupe)
+        exporter = None
+        if os.environ.get('METRICS_FILE'):
+            exporter = asyncio.get_running_loop().create_task(
+                export_textfile(os.environ['METRICS_FILE'], float(os.environ.get('METRICS_INTERVAL', 15)))
+            )
+        try:
+            await consumer.run()
+        finally:
+            if exporter is not None:
+                exporter.cancel()
+            await consumer.stop()
+            await pool.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Worker for %s stopped", queue)
@@ -0,0 +1,277 @@
+"""
+Метрики у текстовому форматі Prometheus без зовнішніх залежностей.
+
+Counter, Gauge і Histogram з мітками реєструються в REGISTRY процесу;
+render() повертає текст для ендпоінта /metrics, а синхронні воркери без
+HTTP-сервера періодично пишуть його у файл (METRICS_FILE) для textfile
+collector'а node_exporter:
+
+    REQUESTS = Histogram('http_request_duration_seconds', "Час обробки запиту", ['route'])
+    with REQUESTS.labels('/api/posts/').time():
+        ...
+
+Гаряча частина - labels() (пошук у словнику) і observe()/inc() (bisect і
+додавання під блокуванням); bench_metrics.py вимірює їхню ціну.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, '_Metric'] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: '_Metric'):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional['_Metric']:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, names, values, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{_format_labels(names, values)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Дочірня метрика для значень міток (у порядку labelnames)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def _items(self):
+        for values, child in list(self._children.items()):
+            yield tuple(str(value) for value in values), child
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Лічильник; ім'я за конвенцією Prometheus закінчується на _total"""
+    kind = 'counter'
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def samples(self):
+        for values, child in self._items():
+            yield '', self.labelnames, values, child.value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def samples(self):
+        for values, child in self._items():
+            yield '', self.labelnames, values, child.value
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # Останній кошик - понад найбільшу межу (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Контекстний менеджер: записує тривалість блоку в секундах"""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def samples(self):
+        names = self.labelnames + ('le',)
+        for values, child in self._items():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', names, values + (_format_value(bound),), cumulative
+            yield '_count', self.labelnames, values, cumulative
+            yield '_sum', self.labelnames, values, total
+
+
+# Спільна для HTTP-сервісів (Django, FastAPI): route - шаблон маршруту, не сирий шлях
+HTTP_REQUEST_DURATION = Histogram('http_request_duration_seconds', "Час обробки HTTP-запиту",
+                                  ['method', 'route', 'status'])
+
+
+class MetricsMiddleware:
+    """ASGI middleware: час запиту за шаблоном маршруту Starlette/FastAPI (scope['route'])"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            HTTP_REQUEST_DURATION.labels(scope['method'], route, status).observe(time.perf_counter() - started)
+
+
+def render(registry: Registry = REGISTRY) -> str:
+    return registry.render()
+
+
+def write_textfile(path: str, registry: Registry = REGISTRY):
+    """Атомарний запис метрик у файл (textfile collector читає лише цілі файли)"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+async def export_textfile(path: str, interval: float = 15.0, registry: Registry = REGISTRY):
+    """Періодичний запис метрик у файл для воркерів без HTTP-сервера"""
+    while True:
+        try:
+            await asyncio.to_thread(write_textfile, path, registry)
+        except OSError as e:
+            logger.warning("Failed to write metrics to %s: %s", path, e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,239 @@
+"""
+Ресурси NLTK без мережі на старті процесу і лінива ініціалізація моделей.
+
+Ресурси збираються в каталог один раз, під час збірки образу:
+
+    python -m blogcommon.nlp bundle /app/nltk_data vader_lexicon punkt_tab stopwords
+
+nltk.download звіряє архіви з контрольними сумами індексу NLTK. У каталозі
+лишаються лише zip-архіви (NLTK читає ресурси прямо з них) і manifest.json
+з їхніми sha256. Під час роботи мережа не потрібна: перед першим
+використанням архів ресурсу з каталогу NLTK_DATA звіряється з маніфестом,
+і пошкоджений чи неповний бандл дає ResourceError замість завантаження.
+Без маніфесту (локальна розробка) ресурси шукаються у звичайних шляхах NLTK,
+а NLTK_AUTO_DOWNLOAD=1 дозволяє докачати відсутні.
+
+Сам nltk (~0.35 s імпорту) і моделі завантажуються при першому виклику
+sentiment_analyzer() / stop_words() / word_tokenize(). warmup_in_background()
+робить це заздалегідь, поки сервіс підключається до брокера; повідомлення,
+що прийшло раніше, чекає на ту саму ініціалізацію.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Назва пакета NLTK -> архів відносно каталогу даних
+RESOURCES = {
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+    'punkt_tab': 'tokenizers/punkt_tab.zip',
+    'stopwords': 'corpora/stopwords.zip',
+}
+MANIFEST = 'manifest.json'
+
+
+class ResourceError(RuntimeError):
+    """Ресурсу NLTK немає в бандлі або архів не збігається з маніфестом"""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(directory: str, names) -> dict:
+    """Додає sha256 архівів names до маніфесту каталогу"""
+    path = os.path.join(directory, MANIFEST)
+    manifest = read_manifest(directory) if os.path.exists(path) else {}
+    for name in names:
+        manifest[name] = {'path': RESOURCES[name], 'sha256': file_sha256(os.path.join(directory, RESOURCES[name]))}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def bundle(directory: str, names) -> dict:
+    """Завантажує ресурси names у directory і записує маніфест (збірка образу)"""
+    import nltk
+
+    os.makedirs(directory, exist_ok=True)
+    for name in names:
+        if name not in RESOURCES:
+            raise ResourceError(f"Unknown NLTK resource {name}; known: {', '.join(RESOURCES)}")
+        if not nltk.download(name, download_dir=directory, quiet=True, raise_on_error=True):
+            raise ResourceError(f"Failed to download NLTK resource {name}")
+        # Розпакована копія не потрібна: NLTK читає з архіву, а маніфест покриває лише його
+        unpacked = os.path.join(directory, RESOURCES[name][:-len('.zip')])
+        if os.path.isdir(unpacked):
+            shutil.rmtree(unpacked)
+    return write_manifest(directory, names)
+
+
+class Resources:
+    """Перевірка ресурсів перед першим використанням, один раз на процес"""
+
+    def __init__(self, directory=None, auto_download: bool = False):
+        self.directory = directory
+        self.auto_download = auto_download
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, env=None) -> 'Resources':
+        env = os.environ if env is None else env
+        # NLTK_DATA може містити кілька шляхів; бандл - перший
+        directory = env.get('NLTK_DATA', '').split(os.pathsep)[0] or None
+        return cls(directory, auto_download=env.get('NLTK_AUTO_DOWNLOAD') == '1')
+
+    def require(self, name: str):
+        if name in self._ready:
+            return
+        with self._lock:
+            if name in self._ready:
+                return
+            if self.directory and os.path.exists(os.path.join(self.directory, MANIFEST)):
+                self._verify(name)
+            else:
+                self._find(name)
+            self._ready.add(name)
+
+    def _verify(self, name):
+        import nltk
+
+        entry = read_manifest(self.directory).get(name)
+        if entry is None:
+            raise ResourceError(f"NLTK resource {name} is not in the bundle {self.directory}")
+        path = os.path.join(self.directory, entry['path'])
+        if not os.path.exists(path):
+            raise ResourceError(f"NLTK resource {name} is missing: {path}")
+        if file_sha256(path) != entry['sha256']:
+            raise ResourceError(f"NLTK resource {name} does not match the manifest checksum: {path}")
+        if self.directory not in nltk.data.path:
+            nltk.data.path.insert(0, self.directory)
+
+    def _find(self, name):
+        import nltk
+
+        try:
+            nltk.data.find(RESOURCES[name][:-len('.zip')])
+        except LookupError:
+            if not self.auto_download:
+                raise ResourceError(
+                    f"NLTK resource {name} not found; run `python -m blogcommon.nlp bundle DIR {name}` "
+                    f"and set NLTK_DATA=DIR (or NLTK_AUTO_DOWNLOAD=1 in development)"
+                ) from None
+            logger.warning("Downloading NLTK resource %s", name)
+            nltk.download(name, quiet=True, raise_on_error=True)
+
+
+resources = Resources.from_env()
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def _load(key, factory):
+    value = _loaded.get(key)
+    if value is None:
+        with _load_lock:
+            value = _loaded.get(key)
+            if value is None:
+                value = _loaded[key] = factory()
+    return value
+
+
+def sentiment_analyzer():
+    """VADER SentimentIntensityAnalyzer, створений при першому виклику"""
+    def create():
+        resources.require('vader_lexicon')
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        return SentimentIntensityAnalyzer()
+    return _load('sentiment', create)
+
+
+def stop_words(language: str = 'english') -> frozenset:
+    def create():
+        resources.require('stopwords')
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words(language))
+    return _load(f'stopwords:{language}', create)
+
+
+def tokenizer():
+    """nltk.word_tokenize з уже завантаженою моделлю Punkt"""
+    def create():
+        resources.require('punkt_tab')
+        from nltk.tokenize import word_tokenize
+        word_tokenize('warm up.')
+        return word_tokenize
+    return _load('tokenizer', create)
+
+
+def word_tokenize(text: str) -> list:
+    return tokenizer()(text)
+
+
+def warmup(*loaders) -> float:
+    """Викликає loaders (sentiment_analyzer, stop_words, tokenizer); повертає тривалість у секундах"""
+    started = time.perf_counter()
+    for loader in loaders:
+        loader()
+    elapsed = time.perf_counter() - started
+    logger.info("NLTK models loaded in %.3fs", elapsed)
+    return elapsed
+
+
+def warmup_in_background(*loaders) -> threading.Thread:
+    def run():
+        try:
+            warmup(*loaders)
+        except ResourceError as e:
+            # Обробка повідомлень упаде з тією ж помилкою; сервіс при цьому стартує
+            logger.error("NLTK warmup failed: %s", e)
+
+    thread = threading.Thread(target=run, name='nltk-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline NLTK resource bundle")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('bundle', help="download resources into DIR and write the manifest")
+    build.add_argument('directory')
+    build.add_argument('names', nargs='+', choices=sorted(RESOURCES))
+    check = commands.add_parser('verify', help="check bundled archives against the manifest")
+    check.add_argument('directory')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'bundle':
+        manifest = bundle(args.directory, args.names)
+        logger.info("Bundled %s into %s", ', '.join(sorted(manifest)), args.directory)
+        return
+    checker = Resources(args.directory)
+    try:
+        for name in read_manifest(args.directory):
+            checker.require(name)
+    except (OSError, ResourceError) as e:
+        logger.error("%s", e)
+        raise SystemExit(1)
+    logger.info("Bundle %s is intact", args.directory)
+
+
+if __name__ == '__main__':
+    main()
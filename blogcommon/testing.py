@@ -0,0 +1,284 @@
+"""
+Замінник RabbitMQ в пам'яті для тестів та бенчмарків.
+
+Реалізує ту частину інтерфейсу aiormq, якою користується blogcommon:
+exchange'і типу topic/direct, черги з prefetch, ack/nack, dead-lettering
+та publisher confirms. Затримка мережі імітується параметром latency.
+"""
+import asyncio
+from collections import deque
+from types import SimpleNamespace
+
+from aiormq import spec
+
+
+def topic_matches(pattern: str, routing_key: str) -> bool:
+    """Перевірка routing key на відповідність шаблону topic exchange (* та #)"""
+    def match(p, k):
+        if not p:
+            return not k
+        if p[0] == '#':
+            return any(match(p[1:], k[i:]) for i in range(len(k) + 1))
+        if not k:
+            return False
+        return (p[0] == '*' or p[0] == k[0]) and match(p[1:], k[1:])
+    return match(pattern.split('.'), routing_key.split('.'))
+
+
+class _Queue:
+    def __init__(self, name, arguments=None):
+        self.name = name
+        self.arguments = dict(arguments or {})
+        self.messages = deque()
+        self.consumers = []
+        self.declare_count = 0
+
+
+class InMemoryBroker:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.exchanges = {'': 'direct'}
+        self.queues = {}
+        self.bindings = []  # (exchange, queue, routing_key)
+        self.published = 0
+        self.round_trips = 0
+        self.connections = []
+
+    async def connect(self, url=None):
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def queue_depth(self, name: str) -> int:
+        return len(self.queues[name].messages) if name in self.queues else 0
+
+    def route(self, exchange, routing_key, body, properties):
+        if exchange == '':
+            targets = [routing_key] if routing_key in self.queues else []
+        else:
+            kind = self.exchanges.get(exchange)
+            targets = [
+                queue for ex, queue, key in self.bindings
+                if ex == exchange and (
+                    topic_matches(key, routing_key) if kind == 'topic'
+                    else key in (routing_key, '')
+                )
+            ]
+        for name in dict.fromkeys(targets):
+            queue = self.queues[name]
+            item = (exchange, routing_key, body, properties, False)
+            queue.messages.append(item)
+            ttl = queue.arguments.get('x-message-ttl')
+            if ttl is not None:
+                asyncio.get_running_loop().call_later(ttl / 1000, self._expire, queue, item)
+            self._dispatch(queue)
+        self.published += 1
+
+    def _expire(self, queue, item):
+        if item in queue.messages:
+            queue.messages.remove(item)
+            self.dead_letter(queue, item[0], item[1], item[2], item[3], reason='expired')
+
+    def dead_letter(self, queue, exchange, routing_key, body, properties, reason='rejected'):
+        target = queue.arguments.get('x-dead-letter-exchange')
+        if target is None:
+            return
+        headers = dict(properties.headers or {}) if properties else {}
+        headers['x-death'] = [{
+            'count': 1, 'reason': reason, 'queue': queue.name,
+            'exchange': exchange, 'routing-keys': [routing_key],
+        }] + list(headers.get('x-death') or [])
+        properties = spec.Basic.Properties(
+            content_type=getattr(properties, 'content_type', None),
+            delivery_mode=getattr(properties, 'delivery_mode', None),
+            headers=headers,
+        )
+        key = queue.arguments.get('x-dead-letter-routing-key', routing_key)
+        self.route(target, key, body, properties)
+
+    def _dispatch(self, queue):
+        for consumer in queue.consumers:
+            consumer.channel._pump(consumer)
+
+
+class FakeConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.closing = asyncio.get_running_loop().create_future()
+        self.channels = []
+
+    @property
+    def is_closed(self):
+        return self.closing.done()
+
+    async def channel(self, publisher_confirms=True):
+        await self.broker._round_trip()
+        channel = FakeChannel(self, publisher_confirms)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self, exc=None):
+        for channel in self.channels:
+            channel._detach()
+        if not self.closing.done():
+            self.closing.set_result(None)
+
+    def drop(self, exc=None):
+        """Імітація обриву мережі"""
+        for channel in self.channels:
+            channel._detach(exc or ConnectionError("connection dropped"))
+        if not self.closing.done():
+            self.closing.set_exception(exc or ConnectionError("connection dropped"))
+            self.closing.exception()
+
+
+class FakeChannel:
+    def __init__(self, connection, publisher_confirms):
+        self.connection = connection
+        self.broker = connection.broker
+        self.publisher_confirms = publisher_confirms
+        self.closing = asyncio.get_running_loop().create_future()
+        self.prefetch = 0
+        self.delivery_tag = 0
+        self.unacked = {}
+
+    @property
+    def is_closed(self):
+        return self.closing.done()
+
+    def _detach(self, exc=None):
+        # Непідтверджені повідомлення повертаються в черги, споживачі каналу знімаються, як у RabbitMQ
+        for queue, item in self.unacked.values():
+            queue.messages.appendleft(item[:4] + (True,))
+        self.unacked.clear()
+        for queue in self.broker.queues.values():
+            queue.consumers = [c for c in queue.consumers if c.channel is not self]
+        if self.closing.done():
+            return
+        if exc is None:
+            self.closing.set_result(None)
+        else:
+            self.closing.set_exception(exc)
+            self.closing.exception()
+
+    async def close(self):
+        self._detach()
+
+    def fail(self, exc=None):
+        """Імітація закриття каналу брокером (помилка каналу); конект лишається відкритим"""
+        self._detach(exc or ConnectionError("channel closed by broker"))
+
+    def _check(self):
+        if self.is_closed:
+            raise ConnectionError("channel is closed")
+
+    async def exchange_declare(self, exchange, exchange_type='direct', durable=False, **kwargs):
+        self._check()
+        await self.broker._round_trip()
+        self.broker.exchanges[exchange] = exchange_type
+
+    async def queue_declare(self, queue, durable=False, arguments=None, passive=False, **kwargs):
+        self._check()
+        await self.broker._round_trip()
+        existing = self.broker.queues.get(queue)
+        if passive:
+            if existing is None:
+                error = ConnectionError(f"NOT_FOUND - no queue '{queue}'")
+                self.fail(error)
+                raise error
+            return spec.Queue.DeclareOk(queue=queue, message_count=len(existing.messages),
+                                        consumer_count=len(existing.consumers))
+        if existing is None:
+            existing = self.broker.queues[queue] = _Queue(queue, arguments)
+        elif dict(arguments or {}) != existing.arguments:
+            error = ConnectionError(f"PRECONDITION_FAILED - inequivalent arg for queue '{queue}'")
+            self.fail(error)
+            raise error
+        existing.declare_count += 1
+        return spec.Queue.DeclareOk(queue=queue, message_count=len(existing.messages),
+                                    consumer_count=len(existing.consumers))
+
+    async def queue_bind(self, queue, exchange, routing_key='', **kwargs):
+        self._check()
+        await self.broker._round_trip()
+        binding = (exchange, queue, routing_key)
+        if binding not in self.broker.bindings:
+            self.broker.bindings.append(binding)
+
+    async def basic_qos(self, prefetch_count=0, **kwargs):
+        self._check()
+        self.prefetch = prefetch_count
+
+    async def basic_publish(self, body, exchange='', routing_key='', properties=None, **kwargs):
+        self._check()
+        self.broker.route(exchange, routing_key, body, properties or spec.Basic.Properties())
+        await self.broker._round_trip()
+        if self.publisher_confirms:
+            return spec.Basic.Ack(delivery_tag=self.broker.published)
+        return None
+
+    async def basic_get(self, queue, no_ack=False, **kwargs):
+        self._check()
+        await self.broker._round_trip()
+        q = self.broker.queues[queue]
+        if not q.messages:
+            return None
+        return self._deliver(q, q.messages.popleft(), no_ack=no_ack)
+
+    async def basic_consume(self, queue, consumer_callback, no_ack=False, **kwargs):
+        self._check()
+        await self.broker._round_trip()
+        consumer = SimpleNamespace(queue=self.broker.queues[queue], callback=consumer_callback,
+                                   channel=self, no_ack=no_ack)
+        consumer.queue.consumers.append(consumer)
+        self._pump(consumer)
+
+    def _deliver(self, queue, item, no_ack=False):
+        exchange, routing_key, body, properties, redelivered = item
+        self.delivery_tag += 1
+        if not no_ack:
+            self.unacked[self.delivery_tag] = (queue, item)
+        return SimpleNamespace(
+            body=body,
+            header=SimpleNamespace(properties=properties),
+            delivery=SimpleNamespace(delivery_tag=self.delivery_tag, routing_key=routing_key,
+                                     exchange=exchange, redelivered=redelivered),
+            channel=self,
+        )
+
+    def _pump(self, consumer):
+        queue = consumer.queue
+        loop = asyncio.get_running_loop()
+        while queue.messages and not self.is_closed and (
+                not self.prefetch or len(self.unacked) < self.prefetch):
+            message = self._deliver(queue, queue.messages.popleft(), no_ack=consumer.no_ack)
+            loop.create_task(consumer.callback(message))
+
+    async def basic_ack(self, delivery_tag, multiple=False):
+        self._check()
+        self._redispatch(self._settle(delivery_tag, multiple))
+
+    async def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self._check()
+        settled = self._settle(delivery_tag, multiple)
+        # У зворотному порядку, щоб повернені повідомлення зберегли початкову черговість
+        for queue, item in reversed(settled):
+            exchange, routing_key, body, properties, _ = item
+            if requeue:
+                queue.messages.appendleft((exchange, routing_key, body, properties, True))
+            else:
+                self.broker.dead_letter(queue, exchange, routing_key, body, properties)
+        self._redispatch(settled)
+
+    def _settle(self, delivery_tag, multiple):
+        tags = [t for t in self.unacked if t <= delivery_tag] if multiple else [delivery_tag]
+        return [self.unacked.pop(tag) for tag in tags if tag in self.unacked]
+
+    def _redispatch(self, settled):
+        for queue in {id(q): q for q, _ in settled}.values():
+            self.broker._dispatch(queue)
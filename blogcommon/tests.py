@@ -0,0 +1,343 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from blogcommon import nlp, tracing
+from blogcommon.blogapi import PostBatcher
+from blogcommon.dlq import DeadLetterProcessor, parking_queue_name, replay
+from blogcommon.idempotency import SeenSet
+from blogcommon.messaging import (
+    MESSAGES_SETTLED, AmqpSettings, ConnectionPool, Consumer, OutgoingMessage, Publisher, RejectMessage,
+)
+from blogcommon.metrics import Counter, Histogram, Registry, render
+from blogcommon.testing import InMemoryBroker
+from blogcommon.topology import bootstrap, default_topology
+
+EXCHANGE = 'blog.events'
+DLQ_EXCHANGE = 'blog.dlq'
+
+
+async def declare(channel):
+    await channel.exchange_declare(exchange=EXCHANGE, exchange_type='topic', durable=True)
+    await channel.exchange_declare(exchange=DLQ_EXCHANGE, exchange_type='direct', durable=True)
+    await channel.queue_declare(queue='dlq', durable=True)
+    await channel.queue_declare(queue='in', durable=True, arguments={
+        'x-dead-letter-exchange': DLQ_EXCHANGE, 'x-dead-letter-routing-key': 'dlq',
+    })
+    await channel.queue_declare(queue='out', durable=True)
+    await channel.queue_bind(queue='in', exchange=EXCHANGE, routing_key='blog.event.in')
+    await channel.queue_bind(queue='out', exchange=EXCHANGE, routing_key='blog.event.out')
+    await channel.queue_bind(queue='dlq', exchange=DLQ_EXCHANGE, routing_key='dlq')
+
+
+def make_pool(broker):
+    pool = ConnectionPool(AmqpSettings(url='amqp://test/', reconnect_delay=0.001), connect=broker.connect)
+    pool.on_connect(declare)
+    return pool
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition was not met in time")
+        await asyncio.sleep(0.001)
+
+
+class MessagingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_consumer_publishes_result_then_acks(self):
+        broker = InMemoryBroker()
+        pool = make_pool(broker)
+        await Publisher(pool).publish_many(
+            OutgoingMessage(EXCHANGE, 'blog.event.in', {'id': i}) for i in range(5)
+        )
+
+        def handler(delivery):
+            return [OutgoingMessage(EXCHANGE, 'blog.event.out', {'id': delivery.body['id']})]
+
+        consumer = Consumer(pool, 'in', handler, prefetch=2, concurrency=2)
+        consumer.start()
+        await wait_for(lambda: broker.queue_depth('out') == 5)
+        await wait_for(lambda: all(not ch.unacked for c in broker.connections for ch in c.channels))
+        await consumer.stop()
+        await pool.close()
+        self.assertEqual(broker.queue_depth('in'), 0)
+
+    async def test_duplicate_correlation_id_is_processed_once(self):
+        broker = InMemoryBroker()
+        pool = make_pool(broker)
+        await Publisher(pool).publish_many(
+            OutgoingMessage(EXCHANGE, 'blog.event.in', {'correlationId': cid}) for cid in ('a', 'b', 'a')
+        )
+        processed = []
+
+        def handler(delivery):
+            processed.append(delivery.body['correlationId'])
+            return [OutgoingMessage(EXCHANGE, 'blog.event.out', delivery.body)]
+
+        consumer = Consumer(pool, 'in', handler, prefetch=1, dedupe=SeenSet(capacity=10))
+        consumer.start()
+        await wait_for(lambda: broker.queue_depth('in') == 0
+                       and all(not ch.unacked for c in broker.connections for ch in c.channels))
+        await consumer.stop()
+        await pool.close()
+        self.assertEqual(processed, ['a', 'b'])
+        self.assertEqual(broker.queue_depth('out'), 2)
+
+    async def test_rejected_message_goes_to_dead_letter_queue(self):
+        broker = InMemoryBroker()
+        pool = make_pool(broker)
+        await Publisher(pool).publish(OutgoingMessage(EXCHANGE, 'blog.event.in', {'id': 1}))
+
+        def handler(delivery):
+            raise RejectMessage("post is unavailable")
+
+        consumer = Consumer(pool, 'in', handler)
+        consumer.start()
+        await wait_for(lambda: broker.queue_depth('dlq') == 1)
+        await consumer.stop()
+        await pool.close()
+
+    async def test_consumer_reconnects_after_connection_loss(self):
+        broker = InMemoryBroker()
+        pool = make_pool(broker)
+        received = []
+        consumer = Consumer(pool, 'in', lambda delivery: received.append(delivery.body['id']))
+        consumer.start()
+        await wait_for(lambda: broker.connections and broker.queues['in'].consumers)
+
+        broker.connections[0].drop()
+        await wait_for(lambda: len(broker.connections) == 2 and broker.queues['in'].consumers)
+
+        await Publisher(pool).publish(OutgoingMessage(EXCHANGE, 'blog.event.in', {'id': 7}))
+        await wait_for(lambda: received == [7])
+        await consumer.stop()
+        await pool.close()
+
+    async def test_consumer_resumes_after_channel_is_closed(self):
+        broker = InMemoryBroker()
+        pool = make_pool(broker)
+        received = []
+        consumer = Consumer(pool, 'in', lambda delivery: received.append(delivery.body['id']))
+        consumer.start()
+        await wait_for(lambda: broker.connections and broker.queues['in'].consumers)
+
+        # Брокер закриває лише канал споживання; конект лишається
+        channel = broker.queues['in'].consumers[0].channel
+        channel.fail()
+        await wait_for(lambda: broker.queues['in'].consumers
+                       and broker.queues['in'].consumers[0].channel is not channel)
+
+        await Publisher(pool).publish(OutgoingMessage(EXCHANGE, 'blog.event.in', {'id': 7}))
+        await wait_for(lambda: received == [7])
+        self.assertEqual(len(broker.connections), 1)
+        await consumer.stop()
+        await pool.close()
+
+
+class TopologyTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_bootstrap_is_idempotent(self):
+        broker = InMemoryBroker()
+        spec = default_topology({})
+        settings = AmqpSettings(url='amqp://test/')
+        await bootstrap(spec, settings, connect=broker.connect)
+        await bootstrap(spec, settings, connect=broker.connect)
+        self.assertEqual(broker.queues['blog_event_moderation'].declare_count, 2)
+        self.assertEqual(len(broker.bindings), sum(len(q.get('bindings', [])) for q in spec['queues']))
+
+        # Повідомлення, відхилене з черги модерації, потрапляє в DLQ
+        broker.route('blog.events', 'blog.event.moderation', b'{}', None)
+        queue = broker.queues['blog_event_moderation']
+        broker.dead_letter(queue, *queue.messages.popleft()[:4])
+        self.assertEqual(broker.queue_depth('blog_event_moderation_dlq'), 1)
+
+    async def test_bootstrap_reports_conflicting_queue_arguments(self):
+        broker = InMemoryBroker()
+        connection = await broker.connect()
+        channel = await connection.channel()
+        await channel.queue_declare(queue='blog_event_moderation', durable=True)
+        with self.assertRaises(ConnectionError):
+            await bootstrap(default_topology({}), AmqpSettings(url='amqp://test/'), connect=broker.connect)
+
+
+class DeadLetterTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_message_is_retried_through_tiers_then_parked_and_replayed(self):
+        broker = InMemoryBroker()
+        settings = AmqpSettings(url='amqp://test/')
+        await bootstrap(default_topology({'MODERATION_RETRY_DELAYS': '0,0'}), settings, connect=broker.connect)
+        pool = ConnectionPool(settings, connect=broker.connect)
+        attempts, healthy = [], False
+
+        def moderate(delivery):
+            attempts.append(delivery.headers.get('x-retry-count', 0))
+            if not healthy:
+                raise RejectMessage("blog API is unavailable")
+
+        consumers = [
+            Consumer(pool, 'blog_event_moderation', moderate),
+            Consumer(pool, 'blog_event_moderation_dlq',
+                     DeadLetterProcessor('blog_event_moderation', 'blog.events.retry', [0, 0])),
+        ]
+        for consumer in consumers:
+            consumer.start()
+        await Publisher(pool).publish(
+            OutgoingMessage(EXCHANGE, 'blog.event.moderation', {'correlationId': 'c1', 'body': {}})
+        )
+        parking = parking_queue_name('blog_event_moderation')
+        await wait_for(lambda: broker.queue_depth(parking) == 1)
+        self.assertEqual(attempts, [0, 1, 2])
+
+        healthy = True
+        self.assertEqual(await replay(pool, parking, start=0, count=10, rate=0), 1)
+        await wait_for(lambda: len(attempts) == 4)
+        self.assertEqual(broker.queue_depth(parking), 0)
+        for consumer in consumers:
+            await consumer.stop()
+        await pool.close()
+
+
+class PostBatcherTestCase(unittest.TestCase):
+    def test_concurrent_lookups_share_one_request(self):
+        class Client:
+            calls = []
+
+            def fetch_posts(self, post_ids):
+                self.calls.append(sorted(post_ids))
+                return {post_id: {'id': post_id, 'text': f'text {post_id}', 'author': 1}
+                        for post_id in post_ids if post_id != 404}
+
+        batcher = PostBatcher(Client(), max_batch=50, max_wait=0.05)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(batcher.get, [1, 2, 3, 404, 2]))
+        self.assertEqual([r and r['text'] for r in results], ['text 1', 'text 2', 'text 3', None, 'text 2'])
+        self.assertEqual(Client.calls, [[1, 2, 3, 404]])
+
+    def test_string_id_resolves_to_the_same_post(self):
+        class Client:
+            def fetch_posts(self, post_ids):
+                # Як BlogApiClient: ключі - числа з JSON, незалежно від типу запитаних id
+                return {int(post_id): {'id': int(post_id), 'text': 'text'} for post_id in post_ids}
+
+        batcher = PostBatcher(Client(), max_wait=0.001)
+        self.assertEqual(batcher.get('42'), {'id': 42, 'text': 'text'})
+
+
+class MetricsTestCase(unittest.IsolatedAsyncioTestCase):
+    def test_render_prometheus_text_format(self):
+        registry = Registry()
+        latency = Histogram('latency_seconds', "Latency", ['route'], buckets=(0.1, 1), registry=registry)
+        errors = Counter('errors_total', 'Errors "total"', registry=registry)
+        latency.labels('/a').observe(0.05)
+        latency.labels('/a').observe(5)
+        errors.inc(2)
+        lines = registry.render().splitlines()
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 2', lines)
+        self.assertIn('latency_seconds_count{route="/a"} 2', lines)
+        self.assertIn('# HELP errors_total Errors \\"total\\"', lines)
+        self.assertIn('errors_total 2', lines)
+
+    async def test_consumer_counts_outcomes_and_queue_depth(self):
+        broker = InMemoryBroker()
+        pool = ConnectionPool(AmqpSettings(url='amqp://test/', lag_interval=0.001), connect=broker.connect)
+        pool.on_connect(declare)
+        acked = MESSAGES_SETTLED.labels('in', 'ack').value
+        rejected = MESSAGES_SETTLED.labels('in', 'reject').value
+        await Publisher(pool).publish_many(
+            OutgoingMessage(EXCHANGE, 'blog.event.in', {'id': i}) for i in range(3)
+        )
+
+        def handler(delivery):
+            if delivery.body['id'] == 0:
+                raise RejectMessage("rejected")
+
+        consumer = Consumer(pool, 'in', handler)
+        consumer.start()
+        await wait_for(lambda: MESSAGES_SETTLED.labels('in', 'ack').value - acked == 2)
+        # Глибину черги опитує сам споживач (пасивна декларація)
+        await wait_for(lambda: 'amqp_queue_depth{queue="in"} 0' in render())
+        await consumer.stop()
+        await pool.close()
+        self.assertEqual(MESSAGES_SETTLED.labels('in', 'reject').value - rejected, 1)
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+class TracingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_trace_follows_message_through_two_consumers(self):
+        exporter = ListExporter()
+        exporters = tracing.tracer.exporters
+        tracing.configure(exporters=[exporter])
+        self.addCleanup(tracing.configure, exporters=exporters)
+
+        broker = InMemoryBroker()
+        pool = make_pool(broker)
+        with tracing.span('post.create', post_id=1):
+            await Publisher(pool).publish(OutgoingMessage(EXCHANGE, 'blog.event.in', {'correlationId': 'c1'}))
+
+        def moderate(delivery):
+            with tracing.span('moderation.sentiment'):
+                tracing.annotate(post_id=1)
+            return [OutgoingMessage(EXCHANGE, 'blog.event.out', delivery.body)]
+
+        done = []
+        consumers = [Consumer(pool, 'in', moderate), Consumer(pool, 'out', lambda delivery: done.append(1))]
+        for consumer in consumers:
+            consumer.start()
+        await wait_for(lambda: done)
+        for consumer in consumers:
+            await consumer.stop()
+        await pool.close()
+        tracing.tracer.flush()
+
+        spans = tracing.spans_by_post(exporter.spans)['1']
+        # Заголовки, опубліковані всередині span'а, продовжують його трасування
+        self.assertEqual(len({span.trace_id for span in spans}), 1)
+        self.assertEqual([span.name for span in tracing.critical_path(spans)], [
+            'post.create', 'queue.in', 'consume.in', 'publish', 'queue.out', 'consume.out',
+        ])
+
+
+class NlpResourcesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'sentiment'))
+        self.archive = os.path.join(self.directory, nlp.RESOURCES['vader_lexicon'])
+        with zipfile.ZipFile(self.archive, 'w') as archive:
+            archive.writestr('vader_lexicon/vader_lexicon.txt', 'good\t1.9\t0.9\t[2, 2]\nbad\t-2.5\t0.5\t[-3, -2]')
+        nlp.write_manifest(self.directory, ['vader_lexicon'])
+
+        import nltk
+        self.addCleanup(setattr, nltk.data, 'path', list(nltk.data.path))
+        self.addCleanup(setattr, nlp, 'resources', nlp.resources)
+        self.addCleanup(nlp._loaded.clear)
+        nlp._loaded.clear()
+
+    def test_analyzer_loads_lazily_from_verified_bundle(self):
+        nlp.resources = nlp.Resources(self.directory)
+        self.assertNotIn('sentiment', nlp._loaded)
+        self.assertGreater(nlp.sentiment_analyzer().polarity_scores('good')['pos'], 0)
+        self.assertIs(nlp.sentiment_analyzer(), nlp.sentiment_analyzer())
+
+    def test_corrupted_or_missing_resource_is_an_error_not_a_download(self):
+        with open(self.archive, 'ab') as f:
+            f.write(b'\0')
+        nlp.resources = nlp.Resources(self.directory)
+        with self.assertRaises(nlp.ResourceError):
+            nlp.sentiment_analyzer()
+        with self.assertRaises(nlp.ResourceError):
+            nlp.stop_words()
+
+
+if __name__ == '__main__':
+    unittest.main()
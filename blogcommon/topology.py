@@ -0,0 +1,152 @@
+"""
+Декларативна топологія RabbitMQ (exchange'і, черги, DLQ, прив'язки).
+
+Топологія застосовується один раз командою
+
+    python -m blogcommon.topology
+
+(у docker-compose - сервіс topology_bootstrap), а воркери при старті
+нічого не декларують. Повторний запуск безпечний: декларації ідемпотентні.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from blogcommon.dlq import retry_delays, retry_queues
+from blogcommon.messaging import AmqpSettings, ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def default_topology(env=None) -> dict:
+    """Топологія системи; імена беруться з тих самих змінних оточення, що й у воркерів"""
+    env = os.environ if env is None else env
+    event_exchange = env.get('EVENT_EXCHANGE', 'blog.events')
+    dlq_exchange = env.get('DLQ_EVENT_EXCHANGE', 'blog.events.dlq')
+    dlq_moderation = env.get('DLQ_MODERATION', 'blog_event_moderation_dlq')
+    retry_exchange = env.get('RETRY_EVENT_EXCHANGE', 'blog.events.retry')
+    moderation_queue = env.get('MODERATION_QUEUE', 'blog_event_moderation')
+    return {
+        'exchanges': [
+            {'name': event_exchange, 'type': 'topic'},
+            {'name': dlq_exchange, 'type': 'direct'},
+            {'name': retry_exchange, 'type': 'direct'},
+        ],
+        'queues': [
+            {
+                'name': env.get('STORE_QUEUE', 'blog_event_store'),
+                'bindings': [
+                    {'exchange': event_exchange, 'routing_key': env.get('ROUTING_KEY_STORE', 'blog.event.#')},
+                ],
+            },
+            {
+                'name': moderation_queue,
+                'arguments': {
+                    'x-dead-letter-exchange': dlq_exchange,
+                    'x-dead-letter-routing-key': dlq_moderation,
+                },
+                'bindings': [
+                    {'exchange': event_exchange,
+                     'routing_key': env.get('ROUTING_KEY_MODERATION', 'blog.event.moderation')},
+                ],
+            },
+            {
+                'name': dlq_moderation,
+                'bindings': [
+                    {'exchange': dlq_exchange, 'routing_key': dlq_moderation},
+                ],
+            },
+            {
+                'name': env.get('RECOMMENDATION_QUEUE', 'blog_event_recommendation'),
+                'bindings': [
+                    {'exchange': event_exchange,
+                     'routing_key': env.get('ROUTING_KEY_RECOMMENDATION', 'blog.event.recommendation')},
+                ],
+            },
+            {
+                # Події взаємодій користувачів: інвалідація кешу рекомендацій
+                'name': env.get('INTERACTION_QUEUE', 'blog_event_interaction'),
+                'bindings': [
+                    {'exchange': event_exchange,
+                     'routing_key': env.get('ROUTING_KEY_INTERACTION', 'blog.event.interaction')},
+                ],
+            },
+            # Рівні затримки повторів і паркування для повідомлень з DLQ модерації
+            *retry_queues(moderation_queue, retry_exchange, retry_delays(env)),
+        ],
+    }
+
+
+def load_spec(path: str) -> dict:
+    """Топологія з файлу: .json або .yaml/.yml (потрібен PyYAML)"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        import yaml
+        return yaml.safe_load(f)
+
+
+async def apply_topology(channel, spec: dict):
+    """Декларує все зі специфікації на переданому каналі"""
+    for exchange in spec.get('exchanges', []):
+        await channel.exchange_declare(
+            exchange=exchange['name'],
+            exchange_type=exchange.get('type', 'topic'),
+            durable=exchange.get('durable', True),
+        )
+    for queue in spec.get('queues', []):
+        await channel.queue_declare(
+            queue=queue['name'],
+            durable=queue.get('durable', True),
+            arguments=queue.get('arguments') or None,
+        )
+        for binding in queue.get('bindings', []):
+            await channel.queue_bind(
+                queue=queue['name'],
+                exchange=binding['exchange'],
+                routing_key=binding.get('routing_key', ''),
+            )
+
+
+async def bootstrap(spec: dict, settings: AmqpSettings = None, connect=None) -> float:
+    """Застосовує топологію на окремому конекті; повертає тривалість у секундах"""
+    settings = settings or AmqpSettings.from_env()
+    pool = ConnectionPool(settings, connect=connect)
+    started = time.perf_counter()
+    try:
+        connection = await pool.connection()
+        channel = await connection.channel()
+        await apply_topology(channel, spec)
+        await channel.close()
+    finally:
+        await pool.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply RabbitMQ topology")
+    parser.add_argument('--spec', help="JSON/YAML file; default topology is built from the environment")
+    parser.add_argument('--print', action='store_true', dest='print_only', help="print the spec and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    spec = load_spec(args.spec) if args.spec else default_topology()
+    if args.print_only:
+        print(json.dumps(spec, indent=2))
+        return
+    try:
+        elapsed = asyncio.run(bootstrap(spec))
+    except Exception as e:
+        # PRECONDITION_FAILED означає, що черга вже існує з іншими аргументами
+        # (наприклад, без x-dead-letter-exchange) - її треба видалити вручну
+        logger.error("Failed to apply topology: %s", e)
+        raise SystemExit(1)
+    logger.info("Topology applied: %s exchanges, %s queues in %.3fs",
+                len(spec.get('exchanges', [])), len(spec.get('queues', [])), elapsed)
+
+
+if __name__ == '__main__':
+    main()
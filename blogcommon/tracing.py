@@ -0,0 +1,354 @@
+"""
+Трасування обробки постів між Django, брокером і воркерами.
+
+Ідентифікатор трасування - correlationId повідомлення. Споживач
+(blogcommon.messaging.Consumer) відкриває span обробки з батьком із
+заголовків AMQP і окремо записує час очікування в черзі; Publisher додає
+заголовки поточного span'а до кожного опублікованого повідомлення, тож
+наступний воркер продовжує той самий ланцюжок. Етапи обробників
+позначаються span(...):
+
+    with span('moderation.fetch', post_id=post_id):
+        post = blog_api.get(post_id)
+
+Span'и буферизуються і пакетами пишуться у TRACE_FILE (JSON lines) та/або
+відправляються POST'ом на TRACE_ENDPOINT локального збирача. Без жодного з
+них трасування вимкнене і span() нічого не записує. CLI показує
+критичний шлях обробки поста - ланцюжок етапів, що визначив її тривалість:
+
+    python -m blogcommon.tracing path traces.jsonl --slowest 10
+    python -m blogcommon.tracing path traces.jsonl --post 42
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_HEADER = 'x-trace-id'
+PARENT_SPAN_HEADER = 'x-parent-span-id'
+PUBLISHED_AT_HEADER = 'x-published-at'
+
+
+def new_id() -> str:
+    return f'{random.getrandbits(64):016x}'
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    service: str
+    start: float  # unix-час, спільний для всіх процесів
+    duration: float = 0.0
+    attributes: Dict = field(default_factory=dict)
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+class FileExporter:
+    """Дописує span'и у файл по одному JSON на рядок"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        lines = ''.join(json.dumps(asdict(span), default=str) + '\n' for span in spans)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+
+class HttpExporter:
+    """Відправляє пакет span'ів POST'ом ({"spans": [...]}) на локальний збирач"""
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]):
+        data = json.dumps({'spans': [asdict(span) for span in spans]}, default=str).encode('utf-8')
+        request = urllib.request.Request(self.url, data=data, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """
+    Буфер завершених span'ів процесу. Пакет відправляється фоновим потоком
+    кожні interval секунд або щойно набереться batch_size span'ів; понад
+    max_queue неекспортованих span'ів нові відкидаються (dropped).
+    """
+
+    def __init__(self, service: str, exporters: Iterable = (), batch_size: int = 512,
+                 interval: float = 5.0, max_queue: int = 10000):
+        self.service = service
+        self.exporters = list(exporters)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls):
+        exporters = []
+        if os.environ.get('TRACE_FILE'):
+            exporters.append(FileExporter(os.environ['TRACE_FILE']))
+        if os.environ.get('TRACE_ENDPOINT'):
+            exporters.append(HttpExporter(os.environ['TRACE_ENDPOINT']))
+        service = os.environ.get('TRACE_SERVICE') or os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+        return cls(service, exporters,
+                   batch_size=int(os.environ.get('TRACE_BATCH_SIZE', 512)),
+                   interval=float(os.environ.get('TRACE_INTERVAL', 5)))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def record(self, span: Span):
+        with self._lock:
+            if len(self._buffer) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._buffer.append(span)
+            full = len(self._buffer) >= self.batch_size
+            if self._thread is None:
+                # Потік стартує з першим span'ом, тобто вже після fork воркерів gunicorn
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                # Трасування не повинне ламати обробку: пакет втрачається
+                logger.warning("Failed to export %d spans with %s: %s", len(spans), type(exporter).__name__, e)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
+tracer = Tracer.from_env()
+
+_current: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+def configure(service: Optional[str] = None, exporters: Optional[Iterable] = None):
+    """Перевизначає ім'я сервісу та/або експортери глобального tracer'а"""
+    if service is not None:
+        tracer.service = service
+    if exporters is not None:
+        tracer.exporters = list(exporters)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attributes):
+    """Додає атрибути (наприклад post_id) до поточного span'а"""
+    span = _current.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+         start: Optional[float] = None, **attributes):
+    """
+    Span етапу обробки. Без trace_id продовжує трасування поточного span'а
+    (або починає нове); start - unix-час початку, якщо етап почався раніше
+    (наприклад, з отримання повідомлення).
+    """
+    if not tracer.enabled:
+        yield None
+        return
+    parent = _current.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent is not None else new_id()
+    if parent_id is None and parent is not None and parent.trace_id == trace_id:
+        parent_id = parent.span_id
+    current = Span(trace_id, new_id(), parent_id, name, tracer.service,
+                   time.time() if start is None else start, attributes=attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes['error'] = f'{type(e).__name__}: {e}'[:200]
+        raise
+    finally:
+        current.duration = time.time() - current.start
+        _current.reset(token)
+        tracer.record(current)
+
+
+def record_span(name: str, trace_id: str, parent_id: Optional[str], start: float, end: float,
+                **attributes) -> Optional[Span]:
+    """Записує вже завершений етап (наприклад, очікування в черзі)"""
+    if not tracer.enabled:
+        return None
+    recorded = Span(trace_id, new_id(), parent_id, name, tracer.service, start, max(0.0, end - start), attributes)
+    tracer.record(recorded)
+    return recorded
+
+
+def inject(headers: Optional[dict]) -> Optional[dict]:
+    """Заголовки AMQP з поточним span'ом як батьком; без span'а - без змін"""
+    span = _current.get()
+    if span is None:
+        return headers
+    return {
+        **(headers or {}),
+        TRACE_ID_HEADER: span.trace_id,
+        PARENT_SPAN_HEADER: span.span_id,
+        PUBLISHED_AT_HEADER: time.time(),
+    }
+
+
+@contextmanager
+def consume_span(name: str, headers: dict, trace_id: Optional[str], received: float, **attributes):
+    """
+    Span обробки отриманого повідомлення. Трасування з заголовків має
+    пріоритет над trace_id (correlationId); якщо відомий час публікації,
+    очікування в черзі записується окремим span'ом між публікацією й отриманням.
+    """
+    if not tracer.enabled:
+        yield None
+        return
+    trace_id = headers.get(TRACE_ID_HEADER) or trace_id or new_id()
+    if isinstance(trace_id, bytes):
+        trace_id = trace_id.decode()
+    parent_id = headers.get(PARENT_SPAN_HEADER)
+    if isinstance(parent_id, bytes):
+        parent_id = parent_id.decode()
+    published_at = headers.get(PUBLISHED_AT_HEADER)
+    if isinstance(published_at, (int, float)) and published_at <= received:
+        waited = record_span(f'queue.{attributes.get("queue", name)}', trace_id, parent_id,
+                             published_at, received, **attributes)
+        parent_id = waited.span_id
+    # Поточний span іншого трасування (напр. з попереднього повідомлення) не є батьком
+    token = _current.set(None)
+    try:
+        with span(name, trace_id=trace_id, parent_id=parent_id, start=received, **attributes) as current:
+            yield current
+    finally:
+        _current.reset(token)
+
+
+# --- Аналіз записаних span'ів ---
+
+def load_spans(paths: Iterable[str]) -> List[Span]:
+    spans = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    spans.append(Span(**json.loads(line)))
+    return spans
+
+
+def spans_by_post(spans: Iterable[Span]) -> Dict[str, List[Span]]:
+    """
+    Групує span'и за постом: post_id будь-якого span'а трасування
+    поширюється на всі span'и цього трасування. Так кореневий span Django
+    (власне трасування) поєднується з обробкою поста воркерами.
+    """
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span.trace_id].append(span)
+    posts = defaultdict(list)
+    for trace in traces.values():
+        post_id = next((s.attributes['post_id'] for s in trace if s.attributes.get('post_id') is not None), None)
+        if post_id is not None:
+            posts[str(post_id)].extend(trace)
+    return posts
+
+
+def critical_path(spans: List[Span]) -> List[Span]:
+    """
+    Ланцюжок від найранішого кореня, де на кожному кроці обирається
+    дочірній span, що завершився останнім, - саме він визначає кінець
+    обробки. Корені інших трасувань того ж поста вважаються дочірніми
+    найранішого (зв'язок через пост, а не через заголовки).
+    """
+    ids = {span.span_id for span in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in spans:
+        if span.parent_id in ids:
+            children[span.parent_id].append(span)
+        else:
+            roots.append(span)
+    roots.sort(key=lambda span: span.start)
+    root = roots[0]
+    children[root.span_id].extend(roots[1:])
+
+    path = [root]
+    while children[path[-1].span_id]:
+        path.append(max(children[path[-1].span_id], key=lambda span: span.end))
+    return path
+
+
+def format_path(post_id: str, path: List[Span]) -> str:
+    origin = path[0].start
+    total = max(span.end for span in path) - origin
+    lines = [f"post {post_id}: {total * 1000:.1f} ms, trace {path[-1].trace_id}",
+             f"  {'start, ms':>12} {'duration, ms':>12}  {'service':<16} span"]
+    for span in path:
+        lines.append(f"  {(span.start - origin) * 1000:12.1f} {span.duration * 1000:12.1f}"
+                     f"  {span.service:<16} {span.name}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trace analysis")
+    commands = parser.add_subparsers(dest='command', required=True)
+    path_parser = commands.add_parser('path', help="print the critical path of post processing")
+    path_parser.add_argument('files', nargs='+', help="TRACE_FILE span logs")
+    path_parser.add_argument('--post', help="only this post id")
+    path_parser.add_argument('--slowest', type=int, default=10, help="number of slowest posts to show")
+    args = parser.parse_args(argv)
+
+    posts = spans_by_post(load_spans(args.files))
+    if args.post is not None:
+        posts = {args.post: posts.get(args.post, [])}
+    paths = [(post_id, critical_path(spans)) for post_id, spans in posts.items() if spans]
+    paths.sort(key=lambda item: max(span.end for span in item[1]) - item[1][0].start, reverse=True)
+    if not paths:
+        print("No spans found")
+    for post_id, path in paths[:args.slowest]:
+        print(format_path(post_id, path))
+
+
+if __name__ == '__main__':
+    main()
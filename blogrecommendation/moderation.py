@@ -1,17 +1,15 @@
-import json
 import logging
 import os
 
-import nltk
-import pika
-import requests
 from dotenv import load_dotenv
-from nltk.sentiment import SentimentIntensityAnalyzer
-from pika.compat import url_unquote
 
-nltk.download("vader_lexicon")
+from blogcommon import nlp
+from blogcommon.blogapi import BlogApiClient, PostBatcher
+from blogcommon.idempotency import MongoSeenStore, SeenSet
+from blogcommon.messaging import OutgoingMessage, RejectMessage, run_worker
+from blogcommon.metrics import Histogram
+from blogcommon.tracing import annotate, span
 
-analyzer = SentimentIntensityAnalyzer()
 load_dotenv()
 
 AMQP_HOST = os.getenv("AMQP_HOST")
@@ -21,79 +19,81 @@ DLQ_NAME = os.getenv("DLQ_MODERATION")
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Тексти постів читаються пакетами з внутрішнього API блогу
+blog_api = PostBatcher(BlogApiClient())
+
+MODERATION_STAGE = Histogram('moderation_stage_duration_seconds', "Час етапів модерації поста", ['stage'])
+
+def seen_set():
+    """
+    Оброблені correlationId у Mongo сховища подій: спільні для реплік і
+    переживають перезапуск. pymongo імпортується тут, а не при імпорті модуля
+    """
+    import pymongo
+
+    client = pymongo.MongoClient(f"mongodb://{os.environ['EVENT_STORE_DB_URL']}/",
+                                 username=os.environ['MONGO_USER'],
+                                 password=os.environ['MONGO_PASS'])
+    collection = client[os.environ['EVENT_STORE_DB']]['moderation_processed_messages']
+    return SeenSet(store=MongoSeenStore(collection))
+
 def text_has_positive_sentiment(text):
-    scores = analyzer.polarity_scores(text)
+    scores = nlp.sentiment_analyzer().polarity_scores(text)
     return scores["pos"] > 0
 
-def moderate_blog_post(ch, method, properties, body):
-    try:
-        message = json.loads(body.decode())
-        blog_post_id = message["body"]["post"]["id"]
-        author_id = message["body"]["post"]["author"]["id"]
-        author_email = message["body"]["post"]["author"]["email"]
-        correlation_id = message["correlationId"]
-
-        response = requests.get(
-            os.environ["BLOG_API_URL"] + "/api/posts/" + str(blog_post_id)
-        )
-        if response.status_code != 200:
-            logger.error("Failed to get post information from API: %s (status code: %s)",
-                         response.text, response.status_code)
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-        else:
-            blog_text = response.json()["text"]
-            positive_sentiment = text_has_positive_sentiment(blog_text)
-            logger.info("Text has positive statement [bool]: %s", positive_sentiment)
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-
-            if positive_sentiment:
-                recommendation_event = {
-                    'correlationId': correlation_id,
-                    'body': {
-                        'event': 'BLOG_POST_MODERATED',
-                        'post': {
-                            'id': blog_post_id,
-                            'author': {
-                                'id': author_id,
-                                'email': author_email
-                            }
-                        },
-                        'moderation': {
-                            'sentiment': {
-                                'positive': positive_sentiment
-                            },
-                            'recommend': True
-                        }
-                    }
+def moderate_blog_post(delivery):
+    message = delivery.body
+    blog_post_id = message["body"]["post"]["id"]
+    author_id = message["body"]["post"]["author"]["id"]
+    author_email = message["body"]["post"]["author"]["email"]
+    correlation_id = message["correlationId"]
+    annotate(post_id=blog_post_id)
+
+    with MODERATION_STAGE.labels('fetch').time(), span('moderation.fetch'):
+        post = blog_api.get(blog_post_id)
+    if post is None:
+        logger.error("Post %s not found in blog API", blog_post_id)
+        raise RejectMessage(f"Post {blog_post_id} is unavailable")
+
+    blog_text = post["text"]
+    with MODERATION_STAGE.labels('sentiment').time(), span('moderation.sentiment'):
+        positive_sentiment = text_has_positive_sentiment(blog_text)
+    logger.info("Text has positive statement [bool]: %s", positive_sentiment)
+
+    if not positive_sentiment:
+        logger.info("Blog post %s not recommended", blog_post_id)
+        return None
+
+    recommendation_event = {
+        'correlationId': correlation_id,
+        'body': {
+            'event': 'BLOG_POST_MODERATED',
+            'post': {
+                'id': blog_post_id,
+                'author': {
+                    'id': author_id,
+                    'email': author_email
                 }
-                channel = ch  
-                channel.basic_publish(
-                    exchange=os.environ["EVENT_EXCHANGE"],
-                    routing_key=os.environ["ROUTING_KEY_RECOMMENDATION"],
-                    body=json.dumps(recommendation_event),
-                    properties=pika.BasicProperties(
-                        delivery_mode=pika.spec.PERSISTENT_DELIVERY_MODE
-                    ),
-                )
-                logger.info("Recommendation event sent for post %s", blog_post_id)
-            else:
-                logger.info("Blog post %s not recommended", blog_post_id)
-    except Exception as e:
-        logger.exception(e)
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            },
+            'moderation': {
+                'sentiment': {
+                    'positive': positive_sentiment
+                },
+                'recommend': True
+            }
+        }
+    }
+    logger.info("Recommendation event prepared for post %s", blog_post_id)
+    # Публікується окремим каналом з підтвердженням, повідомлення ack'ається після нього
+    return [OutgoingMessage(
+        exchange=os.environ["EVENT_EXCHANGE"],
+        routing_key=os.environ["ROUTING_KEY_RECOMMENDATION"],
+        body=recommendation_event,
+    )]
 
 if __name__ == "__main__":
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(
-            host=os.environ["AMQP_HOST"],
-            credentials=pika.credentials.PlainCredentials(
-                url_unquote(os.environ["AMQP_USER"]),
-                url_unquote(os.environ["AMQP_PASS"]),
-            ),
-        )
-    )
-    channel = connection.channel()
-    channel.basic_consume(queue=QUEUE, on_message_callback=moderate_blog_post)
-
     print("[*] Waiting for blog post creation events. To exit press CTRL+C")
-    channel.start_consuming()
+    # VADER завантажується, поки воркер підключається до RabbitMQ
+    nlp.warmup_in_background(nlp.sentiment_analyzer)
+    # Повторно доставлені повідомлення (той самий correlationId) пропускаються
+    run_worker(QUEUE, moderate_blog_post, dedupe=seen_set())
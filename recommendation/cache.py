@@ -0,0 +1,134 @@
+"""
+Кеш відповідей GET / для кожного користувача (у пам'яті процесу).
+
+Записи живуть RECOMMENDATION_CACHE_TTL секунд; понад RECOMMENDATION_CACHE_SIZE
+користувачів витісняються найдавніше використані (LRU). Для теплого
+користувача запит - це пошук у словнику без звернень до Mongo і блогу.
+
+Інвалідація:
+  - новий рекомендований пост (споживач модерації) скидає записи
+    користувачів, яких він стосується: підписаних на автора, з інтересами
+    серед його ключових слів і тих, чия видача будувалася без персоналізації
+    (холодний старт - туди потрапляють нові пости). Решту оновить TTL;
+  - подія взаємодії користувача (лайк, перегляд...) з черги
+    INTERACTION_QUEUE скидає його записи: змінилися вподобання й переглянуті.
+
+Кеш локальний для процесу, тому сервіс запускається одним воркером uvicorn.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from blogcommon.metrics import Gauge
+
+logger = logging.getLogger("RECOMMENDATION SERVICE.CACHE")
+
+
+class CacheEntry(NamedTuple):
+    expires: float
+    results: dict
+    following: frozenset
+    interests: frozenset
+
+
+class RecommendationCache:
+    def __init__(self, maxsize=10000, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(maxsize=int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 10000)),
+                   ttl=float(os.environ.get('RECOMMENDATION_CACHE_TTL', 60)))
+
+    def get(self, user_id, limit):
+        """Збережена видача або None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or limit not in entry.results or entry.expires <= self.clock():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry.results[limit]
+
+    def set(self, user_id, limit, results, context):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.expires <= self.clock():
+                entry = CacheEntry(
+                    self.clock() + self.ttl, {},
+                    frozenset(context.get('following', ())), frozenset(context.get('interests', ())),
+                )
+                self._entries[user_id] = entry
+            entry.results[limit] = results
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_post(self, author_id, tags):
+        """Скидає записи користувачів, до чиєї видачі може потрапити новий пост"""
+        tags = set(tags)
+        with self._lock:
+            stale = [
+                user_id for user_id, entry in self._entries.items()
+                if author_id in entry.following or entry.interests & tags
+                or not (entry.following or entry.interests)
+            ]
+            for user_id in stale:
+                del self._entries[user_id]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / requests, 4) if requests else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+recommendation_cache = RecommendationCache.from_env()
+
+CACHE_STATS = Gauge('recommendation_cache', "Стан кешу рекомендацій (RecommendationCache.stats)", ['stat'])
+
+
+def export_metrics(cache=recommendation_cache):
+    """Оновлює CACHE_STATS перед віддачею /metrics"""
+    for name, value in cache.stats().items():
+        CACHE_STATS.labels(name).set(value)
+
+
+async def invalidate_interaction(delivery):
+    """
+    Обробник подій взаємодії з Django (webap/events.py): окремий лайк чи
+    збереження ({'body': {'user': {'id': ...}, 'post': {...}, ...}}) або пакет
+    ({'body': {'user': {'id': ...}, 'interactions': [...]}}) - скидається видача користувача
+    """
+    user = delivery.body.get('body', {}).get('user') or {}
+    if 'id' in user:
+        recommendation_cache.invalidate_user(user['id'])
+    return None
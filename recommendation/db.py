@@ -13,6 +13,24 @@ mongo_client = pymongo.MongoClient(f"mongodb://{mongo_server}/",
 recommendation_db = mongo_client[os.environ['RECOMMENDATION_DB']]
 
 
+def ensure_indexes():
+    """
+    Унікальний індекс по post_id. Дублікати, що могли накопичитися до його
+    появи (повторні доставки), видаляються - залишається найстаріший запис.
+    Індекси tags і author - для джерел кандидатів ранжувальника (ranker.py).
+    """
+    col = recommendation_db['recommendations']
+    duplicates = col.aggregate([
+        {"$group": {"_id": "$post_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+    for duplicate in duplicates:
+        col.delete_many({"_id": {"$in": sorted(duplicate["ids"])[1:]}})
+    col.create_index("post_id", unique=True)
+    col.create_index("tags")
+    col.create_index("author")
+
+
 def get_recommendations(author_id):
     col = recommendation_db['recommendations']
     result = col.find({
@@ -23,5 +41,11 @@ def get_recommendations(author_id):
 
 
 def create_recommendation(recommendation):
+    """Upsert по post_id: повторна обробка того ж поста не створює дубліката"""
     col = recommendation_db['recommendations']
-    return col.insert_one(recommendation).inserted_id
+    result = col.update_one(
+        {"post_id": recommendation["post_id"]},
+        {"$set": recommendation},
+        upsert=True
+    )
+    return result.upserted_id
@@ -1,11 +1,18 @@
 import os
 from dotenv import load_dotenv
 import logging
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Query, Response
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from moderation import moderate_blog_post
-from db import get_recommendations
-import aiormq
+from moderation import moderate_blog_post, vector_store
+from db import ensure_indexes, recommendation_db
+from ranker import HybridRanker
+from cache import export_metrics, invalidate_interaction, recommendation_cache
+from blogcommon import nlp
+from blogcommon.blogapi import BlogApiClient
+from blogcommon.idempotency import MongoSeenStore, SeenSet
+from blogcommon.messaging import AmqpSettings, ConnectionPool, Consumer
+from blogcommon.metrics import CONTENT_TYPE, MetricsMiddleware, render
 import asyncio
 from auth import get_current_user
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,47 +20,36 @@ from fastapi.middleware.cors import CORSMiddleware
 logger = logging.getLogger('uvicorn.error')
 logger.setLevel(logging.DEBUG)
 
+ranker = HybridRanker.from_env(recommendation_db['recommendations'], BlogApiClient(), vectors=vector_store)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     load_dotenv()
 
-    rabbit = f"amqp://{os.environ['AMQP_USER']}:{os.environ['AMQP_PASS']}@{os.environ['AMQP_HOST']}/"
+    # Один довготривалий конект з перепідключенням; споживач обробляє
+    # повідомлення паралельно в межах AMQP_PREFETCH/AMQP_CONCURRENCY.
+    # Черги декларує python -m blogcommon.topology, тут лише споживання
+    pool = ConnectionPool(AmqpSettings.from_env())
+    # Моделі NLTK завантажуються паралельно з підключенням; перше повідомлення чекає на них
+    nlp.warmup_in_background(nlp.sentiment_analyzer, nlp.stop_words, nlp.tokenizer)
+    await pool.connection()
 
-    for i in range(10):
-        try:
-            connection = await aiormq.connect(rabbit)
-            logger.info("Connected to RabbitMQ")
-            break
-        except (ConnectionRefusedError, aiormq.exceptions.AMQPConnectionError) as e:
-            logger.info(f"Failed to connect to RabbitMQ, attempt {i + 1}/10")
-            await asyncio.sleep(3)
-    else:
-        raise Exception("Failed to connect to RabbitMQ")
-
-    channel = await connection.channel()
-    await channel.basic_qos(prefetch_count=1)
-    
-    # Создаем очередь и обмен, если они не существуют
-    moderation_queue = os.environ['MODERATION_QUEUE']
-    event_exchange = os.environ.get('EVENT_EXCHANGE', 'blog.events')
-    routing_key = os.environ.get('ROUTING_KEY_MODERATION', 'blog.event.moderation')
-    
-    # Создаем обмен
-    await channel.exchange_declare(exchange=event_exchange, exchange_type='topic', durable=True)
-    
-    # Создаем очередь
-    await channel.queue_declare(queue=moderation_queue, durable=True)
-    
-    # Привязываем очередь к обмену
-    await channel.queue_bind(queue=moderation_queue, exchange=event_exchange, routing_key=routing_key)
-    
-    # Подписываемся на очередь
-    await channel.basic_consume(moderation_queue, moderate_blog_post)
+    await asyncio.to_thread(ensure_indexes)
+
+    # Повторні доставки та replay з DLQ з тим самим correlationId не обробляються вдруге
+    seen = SeenSet(store=MongoSeenStore(recommendation_db['processed_messages']))
+    consumer = Consumer(pool, os.environ['MODERATION_QUEUE'], moderate_blog_post, dedupe=seen)
+    consumer.start()
+    # Взаємодії користувачів скидають їхні закешовані рекомендації
+    interactions = Consumer(pool, os.environ.get('INTERACTION_QUEUE', 'blog_event_interaction'),
+                            invalidate_interaction)
+    interactions.start()
 
     yield
 
-    await channel.close()
-    await connection.close()
+    await interactions.stop()
+    await consumer.stop()
+    await pool.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -64,17 +60,37 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
-async def api_get_recommendations(user=Depends(get_current_user)):
+async def api_get_recommendations(response: Response, user=Depends(get_current_user),
+                                  limit: int = Query(20, ge=1, le=100)):
     # Use user ID from the JWT token
-    recommendations = get_recommendations(user)
+    recommendations = recommendation_cache.get(user, limit)
+    if recommendations is not None:
+        response.headers['Server-Timing'] = 'cache;desc="hit"'
+    else:
+        # Синхронні запити до Mongo і блогу не блокують event loop
+        recommendations, timer, context = await asyncio.to_thread(ranker.recommend, user, limit)
+        recommendation_cache.set(user, limit, recommendations, context)
+        response.headers['Server-Timing'] = timer.server_timing()
     return {
         "recommendations": recommendations,
         "user_id": user
     }
 
 
+@app.get("/stats/cache")
+async def api_cache_stats():
+    return recommendation_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_metrics():
+    export_metrics()
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
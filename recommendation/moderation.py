@@ -1,107 +1,108 @@
 import logging
-import json
-import requests
 import os
-from nltk import download
-from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 from collections import Counter
 
 from db import create_recommendation
-import aiormq
+from cache import recommendation_cache
+from vectors import VectorStore, text_vector
+from blogcommon import nlp
+from blogcommon.blogapi import BlogApiClient, PostBatcher
+from blogcommon.messaging import OutgoingMessage, RejectMessage
+from blogcommon.metrics import Histogram
+from blogcommon.tracing import annotate, span
 
 
-download('vader_lexicon')
-download('punkt')
-download('stopwords')
-
 logger = logging.getLogger("RECOMMENDATION SERVICE.MODERATION")
 logging.basicConfig(level=logging.INFO)
 
-analyzer = SentimentIntensityAnalyzer()
+# Тексти постів читаються пакетами з внутрішнього API блогу
+blog_api = PostBatcher(BlogApiClient())
+
+# fetch - текст з API блогу, sentiment, tagging - ключові слова, write - Mongo, вектори, кеш
+MODERATION_STAGE = Histogram('moderation_stage_duration_seconds', "Час етапів модерації поста", ['stage'])
+
+# Вектори рекомендованих постів для пошуку схожих (спільний mmap-файл)
+vector_store = VectorStore.from_env()
 
 
 def text_has_positive_sentiment(text):
-    scores = analyzer.polarity_scores(text)
+    scores = nlp.sentiment_analyzer().polarity_scores(text)
     sentiment = 1 if scores['pos'] > 0 else 0  # 1 якщо текст позитивно налаштований, 0 - негативно
     return sentiment == 1
 
 
 def text_top_5_tags(text):
-    stop_words = set(stopwords.words('english'))
-    tokens = word_tokenize(str.lower(text))
+    stop_words = nlp.stop_words()
+    tokens = nlp.word_tokenize(str.lower(text))
     filtered_tokens = [word for word in tokens if word not in stop_words and word.isalpha()]
     word_freq = Counter(filtered_tokens)
 
     return [word for word, freq in word_freq.most_common(5)]
 
 
-async def moderate_blog_post(message: aiormq.abc.DeliveredMessage):
-    try:
-        body = json.loads(message.body.decode())
-        blog_post_id = body['body']['post']['id']
-        correlation_id = body['correlationId']
-        author_id = body['body']['post']['author']['id']
-        blog_post_uri = body['body']['post']['uri']
-
-        response = requests.get(os.environ['BLOG_API_URL'] + '/api/posts/' + str(blog_post_id))
-        if response.status_code != 200:
-            logger.error("Failed to get post information from API", response.text, "status code:", response.status_code)
-
-            await message.channel.basic_nack(
-                message.delivery.delivery_tag,
-                requeue=False
-            )
-        else:
-            blog_text = response.json()['text']
-
-            logger.info("Processing new message: %s" % correlation_id)
-
-            positive_sentiment = text_has_positive_sentiment(blog_text)
-            logger.info("Message processed: %s" % correlation_id)
-            logger.info("Text has positive statement [bool]: %s" % positive_sentiment)
-
-            await message.channel.basic_ack(
-                message.delivery.delivery_tag
-            )
-
-            if positive_sentiment:
-                create_recommendation({
-                    "author": author_id,
-                    "post_id": blog_post_id,
-                    "tags": text_top_5_tags(blog_text)
-                })
-
-                await message.channel.basic_publish(
-                    exchange=os.environ['EVENT_EXCHANGE'],
-                    routing_key=os.environ['ROUTING_KEY_NOTIFICATION'],
-                    body=json.dumps({
-                        'correlationId': correlation_id,
-                        'body': {
-                            'event': 'BLOG_POST_MODERATED',
-                            'post': {
-                                'id': blog_post_id,
-                                'author': {
-                                    'id': author_id
-                                },
-                                'uri': blog_post_uri
-                            },
-                            'moderation': {
-                                'sentiment': {
-                                    'positive': positive_sentiment
-                                },
-                                'recommend': positive_sentiment == True
-                            }
-                        }
-                    }).encode('utf-8'),
-                    properties=aiormq.spec.Basic.Properties(
-                        delivery_mode=1
-                    )
-                )
-    except Exception as e:
-        logger.exception(e)
-        await message.channel.basic_nack(
-            message.delivery.delivery_tag,
-            requeue=False
-        )
+def moderate_blog_post(delivery):
+    """
+    Виконується споживачем у пулі потоків (HTTP-запит та запис у Mongo блокуючі).
+    Повідомлення ack'ається лише після підтвердження публікації сповіщення.
+    """
+    body = delivery.body
+    blog_post_id = body['body']['post']['id']
+    correlation_id = body['correlationId']
+    author_id = body['body']['post']['author']['id']
+    blog_post_uri = body['body']['post']['uri']
+    annotate(post_id=blog_post_id)
+
+    with MODERATION_STAGE.labels('fetch').time(), span('moderation.fetch'):
+        post = blog_api.get(blog_post_id)
+    if post is None:
+        logger.error("Post %s not found in blog API", blog_post_id)
+        raise RejectMessage(f"Post {blog_post_id} is unavailable")
+
+    blog_text = post['text']
+
+    logger.info("Processing new message: %s" % correlation_id)
+
+    with MODERATION_STAGE.labels('sentiment').time(), span('moderation.sentiment'):
+        positive_sentiment = text_has_positive_sentiment(blog_text)
+    logger.info("Message processed: %s" % correlation_id)
+    logger.info("Text has positive statement [bool]: %s" % positive_sentiment)
+
+    if not positive_sentiment:
+        return None
+
+    with MODERATION_STAGE.labels('tagging').time(), span('moderation.tagging'):
+        tags = text_top_5_tags(blog_text)
+        vector = text_vector(blog_text, stop_words=nlp.stop_words())
+    with MODERATION_STAGE.labels('write').time(), span('moderation.write'):
+        create_recommendation({
+            "author": author_id,
+            "post_id": blog_post_id,
+            "tags": tags
+        })
+        vector_store.add(blog_post_id, vector)
+    recommendation_cache.invalidate_post(author_id, tags)
+
+    return [OutgoingMessage(
+        exchange=os.environ['EVENT_EXCHANGE'],
+        routing_key=os.environ['ROUTING_KEY_NOTIFICATION'],
+        body={
+            'correlationId': correlation_id,
+            'body': {
+                'event': 'BLOG_POST_MODERATED',
+                'post': {
+                    'id': blog_post_id,
+                    'author': {
+                        'id': author_id
+                    },
+                    'uri': blog_post_uri
+                },
+                'moderation': {
+                    'sentiment': {
+                        'positive': positive_sentiment
+                    },
+                    'recommend': positive_sentiment == True
+                }
+            }
+        },
+        persistent=False,
+    )]
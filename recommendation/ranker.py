@@ -0,0 +1,279 @@
+"""
+Гібридний ранжувальник рекомендацій: генерація кандидатів + ранжування.
+
+1. context    - інтереси, підписки, лайки, бітмапа переглянутих постів і
+                тренди користувача одним запитом до блогу (BlogApiClient.user_context).
+2. кандидати  - кілька дешевих джерел у колекції recommendations, кожне з
+                лімітом і власним бюджетом часу (max_time_ms у Mongo):
+                interests (ключові слова = інтереси), similar (найближчі
+                вектори до лайкнутих постів, vectors.py; без сховища чи
+                векторів лайкнутих постів - їхні ключові слова), following
+                (автори з підписок), trending,
+                recent (нові пости - на випадок холодного старту).
+3. filter     - без дублікатів, власних і вже переглянутих постів (бітмапа).
+4. score      - матриця ознак кандидатів множиться на вектор ваг (NumPy),
+                top-k через argpartition.
+
+Кожен етап вимірюється (Server-Timing у відповіді). Етап, що вийшов за свій
+бюджет, логується; джерела, до яких черга дійшла після вичерпання загального
+бюджету, пропускаються - відповідь збирається з того, що вже є.
+"""
+import base64
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import numpy as np
+from pymongo.errors import PyMongoError
+
+from blogcommon.metrics import Histogram
+
+logger = logging.getLogger("RECOMMENDATION SERVICE.RANKER")
+
+FEATURES = ('interest', 'similar', 'following', 'trending', 'recency')
+DEFAULT_WEIGHTS = {'interest': 1.0, 'similar': 0.8, 'following': 1.2, 'trending': 0.6, 'recency': 0.4}
+
+# Бюджети етапів, мс
+DEFAULT_BUDGETS = {
+    'context': 60, 'interests': 20, 'similar': 30, 'following': 20, 'trending': 20, 'recent': 20,
+    'filter': 5, 'score': 10,
+}
+DEFAULT_TOTAL_BUDGET = 200
+
+SOURCES = ('interests', 'similar', 'following', 'trending', 'recent')
+PROJECTION = {'_id': True, 'post_id': True, 'author': True, 'tags': True}
+TAGS_PER_POST = 5
+RECENCY_HALF_LIFE_HOURS = 72.0
+
+RANKER_STAGE = Histogram('recommendation_stage_duration_seconds', "Час етапів ранжування", ['stage'])
+
+
+def parse_weights(value, defaults=DEFAULT_WEIGHTS):
+    """'interest=1,trending=0.5' -> ваги (невказані - за замовчуванням)"""
+    weights = dict(defaults)
+    for item in filter(None, (value or '').split(',')):
+        name, _, weight = item.partition('=')
+        if name.strip() not in weights:
+            raise ValueError(f"Unknown ranking feature: {name}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class Recommendations(NamedTuple):
+    items: list
+    timer: 'StageTimer'
+    # Контекст користувача: за ним кеш вирішує, кого стосується новий пост
+    context: dict
+
+
+class SeenBitmap:
+    """Множина id переглянутих постів: біт (id % 8) байта id // 8"""
+
+    def __init__(self, data: bytes = b''):
+        self.bits = np.frombuffer(data, dtype=np.uint8)
+
+    @classmethod
+    def from_base64(cls, value):
+        return cls(base64.b64decode(value or ''))
+
+    def mask(self, post_ids: np.ndarray) -> np.ndarray:
+        """Булевий масив: чи переглянуто кожен з post_ids"""
+        post_ids = np.asarray(post_ids, dtype=np.int64)
+        byte = post_ids >> 3
+        inside = (post_ids >= 0) & (byte < len(self.bits))
+        seen = np.zeros(len(post_ids), dtype=bool)
+        seen[inside] = (self.bits[byte[inside]] >> (post_ids[inside] & 7).astype(np.uint8)) & 1 == 1
+        return seen
+
+
+class StageTimer:
+    """Час кожного етапу (мс) і перевірка бюджетів"""
+
+    def __init__(self, budgets, total_budget):
+        self.budgets = budgets
+        self.total_budget = total_budget
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.skipped = []
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def budget_ms(self, name):
+        """Бюджет етапу, але не більше, ніж лишилося від загального"""
+        return max(1, int(min(self.budgets.get(name, self.total_budget), self.total_budget - self.elapsed_ms())))
+
+    def exhausted(self):
+        return self.elapsed_ms() >= self.total_budget
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.timings[name] = elapsed
+            RANKER_STAGE.labels(name).observe(elapsed / 1000)
+            if elapsed > self.budgets.get(name, self.total_budget):
+                logger.warning("Stage %s took %.1fms (budget %sms)", name, elapsed, self.budgets.get(name))
+
+    def server_timing(self):
+        """Значення заголовка Server-Timing"""
+        parts = [f'{name};dur={elapsed:.1f}' for name, elapsed in self.timings.items()]
+        parts += [f'{name};desc="skipped"' for name in self.skipped]
+        parts.append(f'total;dur={self.elapsed_ms():.1f}')
+        return ', '.join(parts)
+
+
+class HybridRanker:
+    def __init__(self, collection, blog_api, weights=None, budgets=None, total_budget=DEFAULT_TOTAL_BUDGET,
+                 per_source=200, vectors=None):
+        self.collection = collection
+        self.blog_api = blog_api
+        self.vectors = vectors
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.weight_vector = np.array([self.weights[name] for name in FEATURES], dtype=np.float64)
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.total_budget = total_budget
+        self.per_source = per_source
+
+    @classmethod
+    def from_env(cls, collection, blog_api, vectors=None):
+        return cls(
+            collection, blog_api, vectors=vectors,
+            weights=parse_weights(os.environ.get('RECOMMENDATION_WEIGHTS')),
+            total_budget=int(os.environ.get('RECOMMENDATION_BUDGET_MS', DEFAULT_TOTAL_BUDGET)),
+            per_source=int(os.environ.get('RECOMMENDATION_PER_SOURCE', 200)),
+        )
+
+    # Етап 1: контекст
+
+    def _context(self, user_id, timer):
+        try:
+            return self.blog_api.user_context(user_id, timeout=timer.budget_ms('context') / 1000)
+        except Exception as e:
+            # Без контексту лишаються джерела trending/recent без персоналізації
+            logger.error("User context for %s is unavailable: %s", user_id, e)
+            return {}
+
+    # Етап 2: джерела кандидатів
+
+    def _find(self, query, timer, name, sort=None):
+        cursor = self.collection.find(query, PROJECTION).limit(self.per_source).max_time_ms(timer.budget_ms(name))
+        if sort:
+            cursor = cursor.sort(sort)
+        return list(cursor)
+
+    def _source_query(self, name, user_id, context, timer):
+        """Запит джерела (None - джерелу нічого шукати) та ознаки, які воно підказує"""
+        if name == 'interests' and context.get('interests'):
+            return {'tags': {'$in': context['interests']}}
+        if name == 'similar' and context.get('liked') and self.vectors is not None:
+            neighbours = self.vectors.nearest_to_posts(context['liked'], k=self.per_source)
+            if neighbours:
+                context['similar_scores'] = dict(neighbours)
+                return {'post_id': {'$in': list(context['similar_scores'])}}
+            # Лайкнуті пости без векторів (додані до появи сховища, див. vectors.py backfill) -
+            # ключові слова, як без сховища
+        if name == 'similar' and context.get('liked'):
+            keywords = Counter()
+            for doc in self._find({'post_id': {'$in': context['liked']}}, timer, name):
+                keywords.update(doc.get('tags', ()))
+            context['similar_keywords'] = keywords
+            return {'tags': {'$in': [word for word, _ in keywords.most_common(20)]}} if keywords else None
+        if name == 'following' and context.get('following'):
+            return {'author': {'$in': context['following']}}
+        if name == 'trending' and context.get('trending'):
+            return {'post_id': {'$in': context['trending']}}
+        if name == 'recent':
+            return {}
+        return None
+
+    def _candidates(self, user_id, context, timer):
+        candidates = {}
+        for name in SOURCES:
+            if timer.exhausted():
+                timer.skipped.append(name)
+                continue
+            with timer.stage(name):
+                try:
+                    query = self._source_query(name, user_id, context, timer)
+                    if query is None:
+                        continue
+                    query['author'] = query.get('author', {}) | {'$ne': user_id}
+                    for doc in self._find(query, timer, name, sort=[('_id', -1)] if name == 'recent' else None):
+                        candidates.setdefault(doc['post_id'], doc)
+                except (PyMongoError, OSError) as e:
+                    # ExecutionTimeout (max_time_ms), недоступність Mongo чи файлів векторів - джерело пропускається
+                    logger.warning("Candidate source %s failed: %s", name, e)
+        return list(candidates.values())
+
+    # Етапи 3-4: фільтр і ранжування
+
+    def _filter(self, candidates, context):
+        if not candidates:
+            return candidates
+        post_ids = np.fromiter((doc['post_id'] for doc in candidates), dtype=np.int64, count=len(candidates))
+        seen = SeenBitmap.from_base64(context.get('seen')).mask(post_ids)
+        return [doc for doc, is_seen in zip(candidates, seen) if not is_seen]
+
+    def features(self, candidates, context, now=None):
+        """Матриця ознак len(candidates) x len(FEATURES), значення в [0, 1]"""
+        now = now or datetime.now(timezone.utc)
+        interests = set(context.get('interests', ()))
+        keywords = context.get('similar_keywords') or Counter()
+        keywords_total = sum(count for _, count in keywords.most_common(TAGS_PER_POST)) or 1
+        similar_scores = context.get('similar_scores')
+        following = set(context.get('following', ()))
+        trending = {post_id: rank for rank, post_id in enumerate(context.get('trending', ()))}
+        trending_size = len(trending) or 1
+
+        matrix = np.zeros((len(candidates), len(FEATURES)), dtype=np.float64)
+        for row, doc in enumerate(candidates):
+            tags = doc.get('tags') or ()
+            rank = trending.get(doc['post_id'])
+            age_hours = (now - doc['_id'].generation_time).total_seconds() / 3600 if '_id' in doc else 0.0
+            matrix[row] = (
+                len(interests.intersection(tags)) / TAGS_PER_POST,
+                (max(similar_scores.get(doc['post_id'], 0.0), 0.0) if similar_scores is not None
+                 else sum(keywords.get(tag, 0) for tag in tags) / keywords_total),
+                doc.get('author') in following,
+                0.0 if rank is None else 1.0 - rank / trending_size,
+                max(age_hours, 0.0),
+            )
+        # Свіжість: 1 для щойно доданих, 0.5 через RECENCY_HALF_LIFE_HOURS
+        matrix[:, -1] = np.exp2(-matrix[:, -1] / RECENCY_HALF_LIFE_HOURS)
+        return np.minimum(matrix, 1.0)
+
+    def _score(self, candidates, context, k):
+        if not candidates:
+            return []
+        scores = self.features(candidates, context) @ self.weight_vector
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [
+            {'post_id': candidates[i]['post_id'], 'author': candidates[i].get('author'),
+             'tags': candidates[i].get('tags', []), 'score': round(float(scores[i]), 4)}
+            for i in top
+        ]
+
+    def recommend(self, user_id, k=20):
+        """Top-k рекомендацій, таймінги етапів і контекст користувача"""
+        timer = StageTimer(self.budgets, self.total_budget)
+        with timer.stage('context'):
+            context = self._context(user_id, timer)
+        candidates = self._candidates(user_id, context, timer)
+        with timer.stage('filter'):
+            candidates = self._filter(candidates, context)
+        with timer.stage('score'):
+            result = self._score(candidates, context, k)
+        logger.debug("Recommendations for %s: %s candidates, %s", user_id, len(candidates), timer.timings)
+        return Recommendations(result, timer, context)
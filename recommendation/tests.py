@@ -0,0 +1,350 @@
+import asyncio
+import base64
+import os
+import tempfile
+import time
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
+
+import cache
+from cache import RecommendationCache
+from ranker import FEATURES, SOURCES, HybridRanker, SeenBitmap
+from vectors import INITIAL_CAPACITY, VectorStore, backfill, normalize, text_vector
+
+NOW = datetime.now(timezone.utc)
+
+
+def matches(doc, query):
+    """Підмножина мови запитів Mongo, якою користується ранжувальник: рівність, $in, $ne"""
+    for field, condition in query.items():
+        value = doc.get(field)
+        values = value if isinstance(value, list) else [value]
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, operand in condition.items():
+            if operator == '$eq' and operand not in values:
+                return False
+            if operator == '$in' and not set(values) & set(operand):
+                return False
+            if operator == '$ne' and operand in values:
+                return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def max_time_ms(self, ms):
+        return self
+
+    def sort(self, keys):
+        for key, direction in reversed(keys):
+            self.docs.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeCollection:
+    """Колекція recommendations; failing(query) -> True - запит падає з PyMongoError"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+        self.failing = None
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        if self.failing is not None and self.failing(query):
+            raise ExecutionTimeout("operation exceeded time limit")
+        return FakeCursor([dict(doc) for doc in self.docs if matches(doc, query)])
+
+
+class FakeBlogApi:
+    def __init__(self, context, delay=0.0):
+        self.context = context
+        self.delay = delay
+
+    def user_context(self, user_id, timeout=None):
+        time.sleep(self.delay)
+        return dict(self.context)
+
+
+def post(post_id, author, tags, age_hours=0.0):
+    return {'_id': ObjectId.from_datetime(NOW - timedelta(hours=age_hours)), 'post_id': post_id,
+            'author': author, 'tags': tags}
+
+
+def seen_bitmap(post_ids):
+    bits = bytearray(max(post_ids) // 8 + 1)
+    for post_id in post_ids:
+        bits[post_id // 8] |= 1 << (post_id % 8)
+    return base64.b64encode(bytes(bits)).decode()
+
+
+class HybridRankerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.posts = [
+            post(1, author=10, tags=['django', 'python']),
+            post(2, author=20, tags=['python'], age_hours=72),
+            post(3, author=30, tags=['cooking']),
+            post(4, author=99, tags=['django']),
+            post(5, author=20, tags=['travel'], age_hours=144),
+            # Лише в джерелі recent
+            post(6, author=40, tags=['misc'], age_hours=144),
+        ]
+        self.context = {'interests': ['django'], 'following': [20], 'liked': [], 'trending': [3, 5]}
+
+    def ranker(self, context=None, delay=0.0, **kwargs):
+        self.collection = FakeCollection(self.posts)
+        return HybridRanker(self.collection, FakeBlogApi(context or self.context, delay), **kwargs)
+
+    def test_features(self):
+        ranker = self.ranker()
+        context = dict(self.context, similar_keywords=Counter({'python': 3, 'django': 1}))
+        matrix = ranker.features(self.posts[:5], context, now=NOW)
+        self.assertEqual(matrix.shape, (5, len(FEATURES)))
+        column = {name: matrix[:, i] for i, name in enumerate(FEATURES)}
+        # interest - частка тегів поста серед інтересів (з TAGS_PER_POST)
+        np.testing.assert_allclose(column['interest'], [0.2, 0, 0, 0.2, 0])
+        # similar - вага ключових слів лайкнутих постів
+        np.testing.assert_allclose(column['similar'], [1.0, 0.75, 0, 0.25, 0])
+        np.testing.assert_allclose(column['following'], [0, 1, 0, 0, 1])
+        np.testing.assert_allclose(column['trending'], [0, 0, 1, 0, 0.5])
+        # recency: період напіврозпаду 72 години
+        np.testing.assert_allclose(column['recency'], [1, 0.5, 1, 1, 0.25], rtol=1e-3)
+
+        # Зі сховищем векторів similar - косинусна подібність, від'ємна обрізається
+        scores = ranker.features(self.posts[:2], dict(self.context, similar_scores={1: 0.9, 2: -0.3}), now=NOW)
+        np.testing.assert_allclose(scores[:, FEATURES.index('similar')], [0.9, 0])
+
+    def test_filter_drops_seen_posts(self):
+        ranker = self.ranker()
+        context = {'seen': seen_bitmap([2, 4, 1000])}
+        self.assertEqual([doc['post_id'] for doc in ranker._filter(self.posts, context)], [1, 3, 5, 6])
+        self.assertEqual(ranker._filter(self.posts, {}), self.posts)
+        mask = SeenBitmap.from_base64(seen_bitmap([9])).mask(np.array([9, 8, -1, 10 ** 6]))
+        self.assertEqual(mask.tolist(), [True, False, False, False])
+
+    def test_recommend_ranks_candidates_from_all_sources(self):
+        items, timer, context = self.ranker().recommend(99, k=4)
+        # 5: following + trending, 2: following, 3: trending, 1: interest; 4 - власний пост
+        self.assertEqual([item['post_id'] for item in items], [5, 2, 3, 1])
+        self.assertEqual([item['score'] for item in items], [1.6, 1.4, 1.0, 0.6])
+        self.assertEqual(timer.skipped, [])
+        # Власні пости виключаються в кожному джерелі
+        self.assertTrue(all(query['author'].get('$ne') == 99 for query in self.collection.queries))
+
+    def test_failing_source_is_dropped(self):
+        ranker = self.ranker()
+        # Джерело recent (без умов, крім автора) падає з ExecutionTimeout
+        self.collection.failing = lambda query: query == {'author': {'$ne': 99}}
+        items, timer, _ = ranker.recommend(99, k=10)
+        # Пост 6 знаходило лише recent; кандидати інших джерел лишаються
+        self.assertEqual(sorted(item['post_id'] for item in items), [1, 2, 3, 5])
+        self.assertIn('recent', timer.timings)
+
+    def test_similar_falls_back_to_keywords_without_vectors(self):
+        class EmptyStore:
+            def nearest_to_posts(self, post_ids, k=10):
+                return []
+
+        items, _, context = self.ranker(dict(self.context, liked=[1]), vectors=EmptyStore()).recommend(99)
+        self.assertNotIn('similar_scores', context)
+        self.assertEqual(context['similar_keywords'], Counter({'django': 1, 'python': 1}))
+        # Пост 2 (python) отримує ознаку similar: 1.4 + 0.8 * 0.5
+        self.assertEqual({item['post_id']: item['score'] for item in items}[2], 1.8)
+
+    def test_sources_are_skipped_when_budget_is_exhausted(self):
+        ranker = self.ranker(delay=0.03, total_budget=10)
+        items, timer, _ = ranker.recommend(99)
+        self.assertEqual(items, [])
+        self.assertEqual(timer.skipped, list(SOURCES))
+        self.assertEqual(self.collection.queries, [])
+
+    def test_server_timing(self):
+        _, timer, _ = self.ranker(delay=0.03, total_budget=10).recommend(99)
+        parts = timer.server_timing().split(', ')
+        self.assertRegex(parts[0], r'^context;dur=\d+\.\d$')
+        self.assertEqual([p.split(';')[0] for p in parts[1:3]], ['filter', 'score'])
+        self.assertEqual(parts[3:-1], [f'{name};desc="skipped"' for name in SOURCES])
+        self.assertRegex(parts[-1], r'^total;dur=\d+\.\d$')
+
+
+
+class RecommendationCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = RecommendationCache(maxsize=2, ttl=60, clock=lambda: self.now)
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.set(1, 20, ['a'], {})
+        self.cache.set(1, 50, ['a', 'b'], {})
+        self.now = 59
+        self.assertEqual((self.cache.get(1, 20), self.cache.get(1, 50)), (['a'], ['a', 'b']))
+        self.assertIsNone(self.cache.get(1, 10))
+        self.now = 60
+        self.assertIsNone(self.cache.get(1, 20))
+        # Прострочений запис замінюється новим зі свіжим TTL, старі limit не повертаються
+        self.cache.set(1, 20, ['c'], {})
+        self.now = 100
+        self.assertEqual(self.cache.get(1, 20), ['c'])
+        self.assertIsNone(self.cache.get(1, 50))
+        self.assertEqual(self.cache.stats()['hits'], 3)
+
+    def test_least_recently_used_user_is_evicted(self):
+        self.cache.set(1, 20, ['a'], {})
+        self.cache.set(2, 20, ['b'], {})
+        self.cache.get(1, 20)
+        self.cache.set(3, 20, ['c'], {})
+        self.assertIsNone(self.cache.get(2, 20))
+        self.assertEqual((self.cache.get(1, 20), self.cache.get(3, 20)), (['a'], ['c']))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_new_post_invalidates_followers_interested_and_cold_users(self):
+        self.cache.maxsize = 10
+        self.cache.set('follower', 20, [], {'following': [7], 'interests': ['go']})
+        self.cache.set('interested', 20, [], {'following': [8], 'interests': ['python']})
+        self.cache.set('cold', 20, [], {})
+        self.cache.set('other', 20, [], {'following': [8], 'interests': ['rust']})
+        self.cache.invalidate_post(7, ['python', 'django'])
+        cached = [user for user in ('follower', 'interested', 'cold', 'other') if self.cache.get(user, 20) is not None]
+        self.assertEqual(cached, ['other'])
+        self.assertEqual(self.cache.stats()['invalidations'], 3)
+
+    def test_interaction_event_invalidates_its_user(self):
+        self.cache.set(1, 20, ['a'], {})
+        self.cache.set(2, 20, ['b'], {})
+        original, cache.recommendation_cache = cache.recommendation_cache, self.cache
+        try:
+            for body in ({'event': 'USER_INTERACTION_CREATED', 'user': {'id': 1}, 'post': {'id': 5}},
+                         {'event': 'USER_INTERACTIONS_BATCH', 'user': {'id': 3}, 'interactions': []}, {}):
+                asyncio.run(cache.invalidate_interaction(SimpleNamespace(body={'correlationId': 'x', 'body': body})))
+        finally:
+            cache.recommendation_cache = original
+        self.assertIsNone(self.cache.get(1, 20))
+        self.assertEqual(self.cache.get(2, 20), ['b'])
+
+
+class VectorStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        self.rng = np.random.default_rng(1)
+
+    def clustered(self, count, centers, noise=0.08):
+        labels = self.rng.integers(len(centers), size=count)
+        return normalize(centers[labels] + noise * self.rng.standard_normal((count, centers.shape[1])))
+
+    def test_add_replace_remove(self):
+        store = VectorStore(self.path, dim=8)
+        first, second, replaced = normalize(self.rng.standard_normal((3, 8)))
+        store.add_many([1, 2], [first, second])
+        store.add(1, replaced)
+        self.assertEqual(len(store), 2)
+        np.testing.assert_array_equal(store.vector(1), replaced)
+        self.assertEqual(store.nearest(replaced, k=1)[0][0], 1)
+
+        store.remove(2)
+        self.assertIsNone(store.vector(2))
+        self.assertIsNone(store.vector(3))
+        self.assertEqual([post_id for post_id, _ in store.nearest(second, k=10)], [1])
+        self.assertEqual(len(store), 1)
+
+    def test_capacity_grows(self):
+        store = VectorStore(self.path, dim=8, rebuild_ratio=None)
+        vectors = normalize(self.rng.standard_normal((INITIAL_CAPACITY + 500, 8)))
+        for start in range(0, len(vectors), 300):
+            store.add_many(np.arange(start, min(start + 300, len(vectors))), vectors[start:start + 300])
+        self.assertGreaterEqual(store.meta['capacity'], len(vectors))
+        self.assertEqual(len(store), len(vectors))
+        np.testing.assert_array_equal(store.vector(len(vectors) - 1), vectors[-1])
+        np.testing.assert_array_equal(store.vector(0), vectors[0])
+
+    def test_rebuild_switches_generation_and_readers_follow(self):
+        writer = VectorStore(self.path, dim=8, rebuild_ratio=None)
+        reader = VectorStore(self.path, readonly=True)
+        vectors = normalize(self.rng.standard_normal((300, 8)))
+        writer.add_many(np.arange(300), vectors[:300])
+        writer.remove(7)
+
+        # Читач бачить нові рядки і видалення після refresh (mmap тих самих файлів)
+        reader.refresh()
+        self.assertEqual(len(reader), 299)
+        np.testing.assert_array_equal(reader.vector(5), vectors[5])
+        self.assertIsNone(reader.vector(7))
+        with self.assertRaises(PermissionError):
+            reader.add(1000, vectors[0])
+
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'vectors.0.f32')))
+        writer.rebuild(nlist=4)
+        self.assertEqual((writer.meta['generation'], writer.meta['nlist']), (1, 4))
+        self.assertEqual(writer.meta['built'], 299)
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'vectors.0.f32')))
+
+        reader.refresh()
+        self.assertEqual(reader.meta['generation'], 1)
+        np.testing.assert_array_equal(reader.vector(5), vectors[5])
+        self.assertIsNone(reader.vector(7))
+        # Нові вектори після перебудови потрапляють у хвіст і знаходяться через IVF
+        writer.add(500, vectors[0])
+        reader.refresh()
+        self.assertIn(500, [post_id for post_id, _ in reader.nearest(vectors[0], k=2)])
+
+    def test_nearest_recall_against_brute_force(self):
+        centers = normalize(self.rng.standard_normal((200, 128)))
+        store = VectorStore(self.path, dim=128, rebuild_ratio=None)
+        store.add_many(np.arange(10000), self.clustered(10000, centers))
+        store.rebuild()
+        # Частина векторів - у хвості після перебудови
+        store.add_many(np.arange(10000, 10500), self.clustered(500, centers))
+
+        recall = []
+        for query in self.clustered(100, centers):
+            expected = {post_id for post_id, _ in store.brute_force(query, 10)}
+            found = {post_id for post_id, _ in store.nearest(query, 10)}
+            recall.append(len(expected & found) / 10)
+        self.assertGreaterEqual(np.mean(recall), 0.95)
+
+
+class VectorBackfillTestCase(unittest.TestCase):
+    def test_backfill_adds_missing_vectors(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = VectorStore(tmp.name, dim=16)
+        existing = text_vector('already indexed', 16)
+        store.add(1, existing)
+
+        class BlogApi:
+            calls = []
+
+            def fetch_posts(self, post_ids):
+                self.calls.append(list(post_ids))
+                # Пост 4 видалено з блогу
+                return {post_id: {'text': f'post about cooking {post_id}'} for post_id in post_ids if post_id != 4}
+
+        collection = FakeCollection([{'post_id': post_id} for post_id in (1, 2, 3, 4)])
+        self.assertEqual(backfill(store, collection, BlogApi(), batch_size=2), 2)
+        self.assertEqual(BlogApi.calls, [[2, 3], [4]])
+        np.testing.assert_array_equal(store.vector(1), existing)
+        np.testing.assert_allclose(store.vector(2), text_vector('post about cooking 2', 16))
+        self.assertIsNone(store.vector(4))
+        # Повторний запуск нічого не додає
+        self.assertEqual(backfill(store, collection, BlogApi()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
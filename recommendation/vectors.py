@@ -0,0 +1,422 @@
+"""
+Сховище векторів постів: float32-файл у пам'яті (mmap) з IVF-індексом.
+
+Вектор поста - хешований мішок слів (feature hashing): слово потрапляє у
+вимір crc32(word) % dim зі знаком з наступного біта, частоти log1p, вектор
+L2-нормований, тож скалярний добуток = косинусна подібність.
+
+Файли в каталозі VECTOR_STORE_PATH (поколінням g відповідає свій набір):
+  meta.json           - dim, generation, count, built, capacity, nlist;
+  vectors.<g>.f32     - рядки (capacity x dim), спільні для всіх процесів через mmap;
+  ids.<g>.i64         - post_id рядка (-1 - видалений/замінений рядок);
+  lists.<g>.i32       - номер списку IVF (найближчого центроїда) рядка;
+  centroids.<g>.npy   - центроїди (nlist x dim);
+  offsets.<g>.npy     - межі списків: рядки [0, built) впорядковані за списками,
+                        список i займає [offsets[i], offsets[i + 1]).
+
+Пошук: nprobe найближчих центроїдів, скалярні добутки з їхніми суцільними
+зрізами плюс рядки "хвоста" [built, count) з тих самих списків. Нові вектори
+додаються в хвіст з номером найближчого центроїда; коли хвіст перевищує
+rebuild_ratio (REBUILD_RATIO) від побудованої частини, індекс перебудовується (k-means)
+у нове покоління, а meta.json перемикається атомарно. Процеси-читачі
+помічають зміну meta.json і перевідкривають файли; старі файли видаляються,
+відкриті mmap на них лишаються дійсними до перевідкриття.
+
+Запис - під файловим блокуванням (кілька воркерів-споживачів).
+
+    python vectors.py stats
+    python vectors.py rebuild --nlist 1024
+    python vectors.py backfill     # вектори постів, рекомендованих до появи сховища
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: лише один процес-записувач
+    fcntl = None
+
+logger = logging.getLogger("RECOMMENDATION SERVICE.VECTORS")
+
+DIM = int(os.environ.get('VECTOR_DIM', 128))
+NPROBE = int(os.environ.get('VECTOR_NPROBE', 4))
+REBUILD_RATIO = 0.2
+REBUILD_MIN_ROWS = 10000
+INITIAL_CAPACITY = 1024
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+CHUNK = 65536
+# Точність mtime файлової системи може бути грубою (тик таймера):
+# свіжозмінений meta.json перечитується, навіть якщо stat не змінився
+MTIME_GRANULARITY_NS = 2 * 10 ** 9
+
+TOKEN_RE = re.compile(r'[^\W\d_]{3,}')
+
+
+def text_vector(text, dim=DIM, stop_words=()):
+    """Хешований вектор тексту (float32, L2-нормований; нульовий для порожнього тексту)"""
+    vector = np.zeros(dim, dtype=np.float32)
+    counts = Counter(word for word in TOKEN_RE.findall(text.lower()) if word not in stop_words)
+    for word, count in counts.items():
+        hashed = zlib.crc32(word.encode())
+        vector[hashed % dim] += (1.0 if hashed & 0x80000000 else -1.0) * math.log1p(count)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores, k):
+    """Індекси k найбільших значень за спаданням"""
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """Сферичний k-means: центроїди (nlist x dim), нормовані"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        # Порожні списки отримують випадкові точки, щоб не втрачати центроїди
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign(vectors, centroids):
+    """Номер найближчого центроїда для кожного вектора (пакетами, щоб обмежити пам'ять)"""
+    result = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), CHUNK):
+        result[start:start + CHUNK] = np.argmax(vectors[start:start + CHUNK] @ centroids.T, axis=1)
+    return result
+
+
+class VectorStore:
+    def __init__(self, path, dim=DIM, readonly=False, rebuild_ratio=REBUILD_RATIO):
+        self.path = path
+        self.dim = dim
+        self.readonly = readonly
+        # None - без автоматичної перебудови (масове завантаження, потім rebuild())
+        self.rebuild_ratio = rebuild_ratio
+        self._lock = threading.RLock()
+        self._meta_key = None
+        self.meta = None
+        if not readonly:
+            os.makedirs(path, exist_ok=True)
+            with self._write_lock():
+                if not os.path.exists(self._file('meta.json')):
+                    self._create()
+        self.refresh()
+
+    @classmethod
+    def from_env(cls, readonly=False):
+        return cls(os.environ.get('VECTOR_STORE_PATH', os.path.join('data', 'vectors')), readonly=readonly)
+
+    def _file(self, name, generation=None):
+        if generation is not None:
+            stem, ext = name.split('.')
+            name = f'{stem}.{generation}.{ext}'
+        return os.path.join(self.path, name)
+
+    # Файли і стан
+
+    def _create(self):
+        meta = {'dim': self.dim, 'generation': 0, 'count': 0, 'built': 0, 'capacity': INITIAL_CAPACITY, 'nlist': 0}
+        self._allocate(meta)
+        self._write_meta(meta)
+
+    def _allocate(self, meta, generation=None):
+        generation = meta['generation'] if generation is None else generation
+        for name, dtype, width in (('vectors.f32', np.float32, meta['dim']), ('ids.i64', np.int64, 1),
+                                   ('lists.i32', np.int32, 1)):
+            with open(self._file(name, generation), 'ab') as f:
+                f.truncate(meta['capacity'] * width * np.dtype(dtype).itemsize)
+
+    def _write_meta(self, meta):
+        tmp = self._file('meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file('meta.json'))
+
+    def _map(self, name, dtype, shape):
+        mode = 'r' if self.readonly else 'r+'
+        return np.memmap(self._file(name, self.meta['generation']), dtype=dtype, mode=mode, shape=shape)
+
+    def refresh(self):
+        """Підхоплює записи інших процесів: нові рядки, розширення чи нове покоління"""
+        stat = os.stat(self._file('meta.json'))
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._meta_key and time.time_ns() - stat.st_mtime_ns > MTIME_GRANULARITY_NS:
+            return
+        with self._lock:
+            with open(self._file('meta.json')) as f:
+                meta = json.load(f)
+            previous, self.meta, self._meta_key = self.meta, meta, key
+            if meta == previous:
+                return
+            self.dim = meta['dim']
+            reopen = (previous is None or previous['generation'] != meta['generation']
+                      or previous['capacity'] != meta['capacity'])
+            if reopen:
+                capacity = meta['capacity']
+                self.vectors = self._map('vectors.f32', np.float32, (capacity, self.dim))
+                self.ids = self._map('ids.i64', np.int64, (capacity,))
+                self.lists = self._map('lists.i32', np.int32, (capacity,))
+                if meta['nlist']:
+                    self.centroids = np.load(self._file('centroids.npy', meta['generation']), mmap_mode='r')
+                    self.offsets = np.load(self._file('offsets.npy', meta['generation']))
+                else:
+                    self.centroids = self.offsets = None
+            if reopen and (previous is None or previous['generation'] != meta['generation']):
+                self.row_of = np.full(0, -1, dtype=np.int64)
+                self._index_rows(0, meta['count'])
+            else:
+                self._index_rows(previous['count'], meta['count'])
+
+    def _index_rows(self, start, stop):
+        """post_id -> рядок для рядків [start, stop)"""
+        ids = np.asarray(self.ids[start:stop])
+        live = ids >= 0
+        if live.any() and ids[live].max() >= len(self.row_of):
+            grown = np.full(max(int(ids[live].max()) + 1, 2 * len(self.row_of)), -1, dtype=np.int64)
+            grown[:len(self.row_of)] = self.row_of
+            self.row_of = grown
+        self.row_of[ids[live]] = np.arange(start, stop)[live]
+
+    @contextmanager
+    def _write_lock(self):
+        if self.readonly:
+            raise PermissionError("Vector store is opened read-only")
+        with self._lock, open(self._file('.lock'), 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return int((np.asarray(self.ids[:self.meta['count']]) >= 0).sum())
+
+    # Запис
+
+    def add(self, post_id, vector):
+        self.add_many([post_id], [vector])
+
+    def add_many(self, post_ids, vectors):
+        """Додає (або замінює) вектори постів; старі рядки тих самих постів позначаються -1"""
+        post_ids = np.asarray(post_ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(post_ids), -1)
+        with self._write_lock():
+            self.refresh()
+            meta = dict(self.meta)
+            self._drop(post_ids)
+            start, stop = meta['count'], meta['count'] + len(post_ids)
+            if stop > meta['capacity']:
+                meta['capacity'] = max(stop, 2 * meta['capacity'])
+                self._allocate(meta)
+                self._write_meta(dict(self.meta, capacity=meta['capacity']))
+                self.refresh()
+            self.vectors[start:stop] = vectors
+            self.lists[start:stop] = assign(vectors, self.centroids) if meta['nlist'] else 0
+            self.ids[start:stop] = post_ids
+            meta['count'] = stop
+            self._write_meta(meta)
+            self.refresh()
+            tail = meta['count'] - meta['built']
+            if self.rebuild_ratio is not None and tail >= max(REBUILD_MIN_ROWS, self.rebuild_ratio * meta['built']):
+                self._rebuild()
+
+    def remove(self, post_id):
+        with self._write_lock():
+            self.refresh()
+            self._drop(np.asarray([post_id], dtype=np.int64))
+            self._write_meta(self.meta)
+
+    def _drop(self, post_ids):
+        known = post_ids[post_ids < len(self.row_of)]
+        rows = self.row_of[known]
+        rows = rows[rows >= 0]
+        self.ids[rows] = -1
+        self.row_of[known] = -1
+
+    def rebuild(self, nlist=None):
+        with self._write_lock():
+            self.refresh()
+            self._rebuild(nlist)
+
+    def _rebuild(self, nlist=None):
+        """Нове покоління: живі рядки впорядковані за списками IVF, хвіст порожній"""
+        count = self.meta['count']
+        live = np.flatnonzero(np.asarray(self.ids[:count]) >= 0)
+        if not len(live):
+            return
+        nlist = min(nlist or max(1, int(math.sqrt(len(live)))), len(live))
+        logger.info("Rebuilding vector index: %s vectors, %s lists", len(live), nlist)
+
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, min(len(live), nlist * KMEANS_SAMPLE_PER_LIST), replace=False))
+        centroids = kmeans(np.asarray(self.vectors[sample]), nlist)
+        lists = np.concatenate([assign(np.asarray(self.vectors[live[start:start + CHUNK]]), centroids)
+                                for start in range(0, len(live), CHUNK)])
+        order = np.argsort(lists, kind='stable')
+
+        generation = self.meta['generation'] + 1
+        meta = {'dim': self.dim, 'generation': generation, 'count': len(live), 'built': len(live),
+                'capacity': max(INITIAL_CAPACITY, int(len(live) * (1 + (self.rebuild_ratio or 0))) + 1), 'nlist': nlist}
+        self._allocate(meta)
+        vectors = np.memmap(self._file('vectors.f32', generation), np.float32, 'r+', shape=(meta['capacity'], self.dim))
+        ids = np.memmap(self._file('ids.i64', generation), np.int64, 'r+', shape=(meta['capacity'],))
+        for start in range(0, len(order), CHUNK):
+            rows = live[order[start:start + CHUNK]]
+            vectors[start:start + len(rows)] = self.vectors[rows]
+            ids[start:start + len(rows)] = self.ids[rows]
+        vectors.flush()
+        ids.flush()
+        lists_file = np.memmap(self._file('lists.i32', generation), np.int32, 'r+', shape=(meta['capacity'],))
+        lists_file[:len(order)] = lists[order]
+        lists_file.flush()
+        np.save(self._file('centroids.npy', generation), centroids.astype(np.float32))
+        np.save(self._file('offsets.npy', generation),
+                np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=nlist))]).astype(np.int64))
+        del vectors, ids, lists_file
+
+        previous = self.meta['generation']
+        self._write_meta(meta)
+        self.refresh()
+        for name in ('vectors.f32', 'ids.i64', 'lists.i32', 'centroids.npy', 'offsets.npy'):
+            try:
+                os.remove(self._file(name, previous))
+            except FileNotFoundError:
+                pass
+
+    # Пошук
+
+    def vector(self, post_id):
+        """Вектор поста або None"""
+        self.refresh()
+        row = self.row_of[post_id] if 0 <= post_id < len(self.row_of) else -1
+        # Рядок міг бути видалений іншим процесом
+        if row < 0 or self.ids[row] != post_id:
+            return None
+        return np.array(self.vectors[row])
+
+    def nearest(self, vector, k=10, nprobe=NPROBE, exclude=()):
+        """k найближчих постів [(post_id, подібність)] за IVF (nprobe списків + хвіст)"""
+        self.refresh()
+        query = np.asarray(vector, dtype=np.float32)
+        meta, vectors, ids = self.meta, self.vectors, self.ids
+        if not meta['nlist']:
+            return self._top(np.asarray(vectors[:meta['count']]) @ query, np.arange(meta['count']), k, exclude)
+
+        probes = top_k(self.centroids @ query, nprobe)
+        rows = [np.arange(self.offsets[i], self.offsets[i + 1]) for i in probes]
+        scores = [vectors[self.offsets[i]:self.offsets[i + 1]] @ query for i in probes]
+        if meta['count'] > meta['built']:
+            tail = np.flatnonzero(np.isin(self.lists[meta['built']:meta['count']], probes)) + meta['built']
+            rows.append(tail)
+            scores.append(vectors[tail] @ query)
+        return self._top(np.concatenate(scores), np.concatenate(rows), k, exclude)
+
+    def brute_force(self, vector, k=10, exclude=()):
+        """Точний k-NN повним перебором - еталон для оцінки recall"""
+        self.refresh()
+        count = self.meta['count']
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, CHUNK):
+            scores[start:start + CHUNK] = self.vectors[start:min(start + CHUNK, count)] @ vector
+        return self._top(scores, np.arange(count), k, exclude)
+
+    def _top(self, scores, rows, k, exclude):
+        post_ids = np.asarray(self.ids[rows])
+        scores = np.where(post_ids >= 0, scores, -np.inf)
+        if len(exclude):
+            scores[np.isin(post_ids, list(exclude))] = -np.inf
+        top = top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return [(int(post_ids[i]), float(scores[i])) for i in top]
+
+    def nearest_to_posts(self, post_ids, k=10, nprobe=NPROBE):
+        """Пости, найближчі до середнього вектора post_ids (самі post_ids виключаються)"""
+        vectors = [vector for vector in map(self.vector, post_ids) if vector is not None]
+        if not vectors:
+            return []
+        return self.nearest(normalize(np.mean(vectors, axis=0)), k, nprobe, exclude=post_ids)
+
+
+def backfill(store, collection, blog_api, stop_words=(), batch_size=200):
+    """
+    Вектори для постів колекції recommendations, яких немає у сховищі (рекомендовані
+    до його появи): тексти пакетами з API блогу, як у модерації. Повертає кількість доданих
+    """
+    added = 0
+    missing = []
+
+    def flush():
+        posts = blog_api.fetch_posts(missing)
+        found = [post_id for post_id in missing if post_id in posts]
+        if found:
+            store.add_many(found, [text_vector(posts[post_id]['text'], store.dim, stop_words) for post_id in found])
+        skipped = len(missing) - len(found)
+        if skipped:
+            logger.warning("Backfill: %s posts are no longer in the blog", skipped)
+        missing.clear()
+        return len(found)
+
+    for doc in collection.find({}, {'_id': False, 'post_id': True}):
+        if store.vector(doc['post_id']) is None:
+            missing.append(doc['post_id'])
+            if len(missing) >= batch_size:
+                added += flush()
+    if missing:
+        added += flush()
+    return added
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=('stats', 'rebuild', 'backfill'))
+    parser.add_argument('--nlist', type=int)
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    store = VectorStore.from_env(readonly=args.command == 'stats')
+    if args.command == 'rebuild':
+        store.rebuild(args.nlist)
+    elif args.command == 'backfill':
+        from blogcommon import nlp
+        from blogcommon.blogapi import BlogApiClient
+        from db import recommendation_db
+
+        # Масове завантаження без перебудов по дорозі; індекс будується один раз у кінці
+        store.rebuild_ratio = None
+        added = backfill(store, recommendation_db['recommendations'], BlogApiClient(), nlp.stop_words(),
+                         args.batch_size)
+        logger.info("Backfilled %s vectors", added)
+        if added:
+            store.rebuild(args.nlist)
+    print(json.dumps(dict(store.meta, live=len(store))))
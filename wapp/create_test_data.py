@@ -11,7 +11,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wapp.settings')
 django.setup()
 
 from django.contrib.auth.models import User
-from webap.models import Category, Tag, BlogPost, PostComment, UserProfile, UserInteraction
+from webap.models import Category, Tag, BlogPost, PostComment, UserProfile, UserInteraction, ViewEvent
 
 def create_test_data():
     print("Створення тестових даних...")
@@ -302,16 +302,12 @@ Hooks роблять код більш читабельним та дозвол
                         interaction_type='like'
                     )
                     # Перегляди
-                    UserInteraction.objects.get_or_create(
-                        user=user,
-                        post=post,
-                        interaction_type='view'
-                    )
+                    ViewEvent.objects.create(user=user, post=post)
         
         # Оновимо лічильники
         for post in created_posts:
             likes_count = UserInteraction.objects.filter(post=post, interaction_type='like').count()
-            views_count = UserInteraction.objects.filter(post=post, interaction_type='view').count()
+            views_count = ViewEvent.objects.filter(post=post).count()
             post.likes_count = likes_count
             post.views_count = views_count + 10  # Додаємо деякі базові перегляди
             post.save()
@@ -1,27 +1,5 @@
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
+from wapp.jwt_keys import generate_keys
 
-private_key = rsa.generate_private_key(
-    public_exponent=65537,
-    key_size=2048
-)
-
-private_pem = private_key.private_bytes(
-    encoding=serialization.Encoding.PEM,
-    format=serialization.PrivateFormat.TraditionalOpenSSL,
-    encryption_algorithm=serialization.NoEncryption()
-)
-
-public_key = private_key.public_key()
-public_pem = public_key.public_bytes(
-    encoding=serialization.Encoding.PEM,
-    format=serialization.PublicFormat.SubjectPublicKeyInfo
-)
-
-with open("private.key", "wb") as f:
-    f.write(private_pem)
-
-with open("public.key", "wb") as f:
-    f.write(public_pem)
+generate_keys("private.key", "public.key")
 
 print("Ключі згенеровано!")
@@ -0,0 +1,128 @@
+"""
+Бюджети запитів до бази і часу для окремих view.
+
+Бюджет оголошується декоратором на view-функції або методі дії ViewSet'а:
+
+    @query_budget(queries=5, total_ms=200)
+    def list(self, request, *args, **kwargs):
+        ...
+
+BudgetMiddleware (останній у MIDDLEWARE, найближче до view) бере з
+лічильника wapp.metrics кількість і час SQL, виконаних під час view, і
+вимірює час рендерингу відповіді (серіалізація в JSON/HTML - від
+process_template_response до повернення відповіді). Перевищення пишуться в
+лог і в метрику django_budget_violations_total{route,budget}.
+
+У тестах (QUERY_BUDGET_STRICT) перевищення кількості запитів кидає
+BudgetExceeded і тест падає - так N+1 у серіалізаторах видно до продакшену.
+Часові бюджети лише логуються: вони залежать від машини.
+"""
+import logging
+import time
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from blogcommon.metrics import Counter
+from wapp.metrics import request_queries
+
+logger = logging.getLogger(__name__)
+
+BUDGET_VIOLATIONS = Counter('django_budget_violations_total', "Перевищення бюджетів view",
+                            ['route', 'budget'])
+
+
+class BudgetExceeded(AssertionError):
+    """Перевищено бюджет кількості SQL-запитів у суворому (тестовому) режимі"""
+
+
+@dataclass(frozen=True)
+class Budget:
+    queries: Optional[int] = None
+    db_ms: Optional[float] = None
+    serialize_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+
+    def violations(self, measured: dict) -> dict:
+        """{назва: (виміряно, бюджет)} для перевищених лімітів"""
+        exceeded = {}
+        for field in fields(self):
+            limit = getattr(self, field.name)
+            if limit is not None and measured[field.name] > limit:
+                exceeded[field.name] = (measured[field.name], limit)
+        return exceeded
+
+
+def query_budget(**limits):
+    """Оголошує бюджет view: queries, db_ms, serialize_ms, total_ms"""
+    budget = Budget(**limits)
+
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+def budget_for(view_func, method: str) -> Optional[Budget]:
+    """Бюджет обробника: функції, методу APIView або дії ViewSet'а"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, 'query_budget', None)
+    actions = getattr(view_func, 'actions', None)
+    name = actions.get(method.lower()) if actions else method.lower()
+    return getattr(getattr(cls, name, None), 'query_budget', None) if name else None
+
+
+class BudgetMiddleware:
+    def __init__(self, get_response):
+        middleware = list(settings.MIDDLEWARE)
+        if 'wapp.budgets.BudgetMiddleware' in middleware and 'wapp.metrics.MetricsMiddleware' \
+                not in middleware[:middleware.index('wapp.budgets.BudgetMiddleware')]:
+            raise ImproperlyConfigured("BudgetMiddleware needs wapp.metrics.MetricsMiddleware before it")
+        self.get_response = get_response
+        self.strict = settings.QUERY_BUDGET_STRICT
+        self._budgets = {}
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        key = (view_func, request.method)
+        budget = self._budgets.get(key, False)
+        if budget is False:
+            budget = self._budgets[key] = budget_for(view_func, request.method)
+        request._query_budget = budget
+
+    def process_template_response(self, request, response):
+        # Далі Django лише рендерить відповідь
+        request._render_started = time.perf_counter()
+        return response
+
+    def __call__(self, request):
+        queries = request_queries()
+        count, duration = (queries.count, queries.duration) if queries is not None else (0, 0.0)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        finished = time.perf_counter()
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is None or queries is None:
+            return response
+        render_started = getattr(request, '_render_started', finished)
+        violations = budget.violations({
+            'queries': queries.count - count,
+            'db_ms': (queries.duration - duration) * 1000,
+            'serialize_ms': (finished - render_started) * 1000,
+            'total_ms': (finished - started) * 1000,
+        })
+        if violations:
+            self.report(request, violations)
+        return response
+
+    def report(self, request, violations):
+        route = request.resolver_match.view_name
+        details = ', '.join(f"{name} {measured:.6g} > {limit:g}" for name, (measured, limit) in violations.items())
+        for name in violations:
+            BUDGET_VIOLATIONS.labels(route, name).inc()
+        logger.warning("Budget exceeded for %s %s (%s): %s", request.method, request.path, route, details)
+        if self.strict and 'queries' in violations:
+            raise BudgetExceeded(f"{request.method} {request.path} ({route}): {details}")
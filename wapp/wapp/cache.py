@@ -0,0 +1,38 @@
+"""
+Налаштування кешу, спільного для всіх воркерів gunicorn/uvicorn.
+
+    CACHE_URL=redis://redis:6379/1  - Redis (або сумісний сервер)
+    CACHE_BACKEND=file              - файловий кеш у CACHE_DIR (за замовчуванням)
+    CACHE_BACKEND=locmem            - кеш у пам'яті процесу (лише для розробки)
+"""
+import os
+import tempfile
+
+
+def cache_config(env) -> dict:
+    """CACHES для settings.py за змінними оточення"""
+    url = env.get('CACHE_URL', '')
+    timeout = int(env.get('CACHE_TIMEOUT', 300))
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        config = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+        }
+    else:
+        backend = env.get('CACHE_BACKEND', 'file')
+        if backend == 'file':
+            config = {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': env.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'wapp-cache')),
+                'OPTIONS': {'MAX_ENTRIES': int(env.get('CACHE_MAX_ENTRIES', 10000))},
+            }
+        elif backend == 'locmem':
+            config = {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'unique-snowflake',
+            }
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+    config['TIMEOUT'] = timeout
+    config['KEY_PREFIX'] = env.get('CACHE_KEY_PREFIX', 'wapp')
+    return {'default': config}
@@ -0,0 +1,137 @@
+"""
+Налаштування бази даних і маршрутизація читань на репліки.
+
+Профіль обирається змінною DB_ENGINE:
+    sqlite      - файл db.sqlite3 (за замовчуванням, як раніше)
+    sqlite-wal  - SQLite у WAL-режимі з налаштованими pragma для локальних тестів
+    postgres    - PostgreSQL з постійними з'єднаннями або пулом (DB_POOL=true)
+
+Репліки для Postgres задаються через DB_REPLICA_HOSTS=host1,host2:5433.
+ReplicaRouter відправляє на них лише читання, позначені use_replica()
+(дії list/search/popular та аналітика); запис і решта читань йдуть у default.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+REPLICA_PREFIX = 'replica_'
+
+# WAL дозволяє читачам працювати паралельно з записом лічильника переглядів;
+# synchronous=NORMAL безпечний у WAL і прибирає fsync на кожен коміт
+SQLITE_WAL_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA temp_store=MEMORY;'
+    'PRAGMA cache_size=-20000;'
+    'PRAGMA mmap_size=134217728;'
+)
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def _flag(env, name, default='false'):
+    return env.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def _postgres(env, host, port):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('POSTGRES_DB', 'blog'),
+        'USER': env.get('POSTGRES_USER', 'blog'),
+        'PASSWORD': env.get('POSTGRES_PASSWORD', ''),
+        'HOST': host,
+        'PORT': port,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if _flag(env, 'DB_POOL'):
+        # Пул psycopg 3 всередині процесу; несумісний з CONN_MAX_AGE > 0
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': int(env.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(env.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(env.get('DB_POOL_TIMEOUT', 10)),
+        }
+    else:
+        config['CONN_MAX_AGE'] = int(env.get('DB_CONN_MAX_AGE', 60))
+    return config
+
+
+def database_config(env, base_dir) -> dict:
+    """DATABASES для settings.py за змінними оточення"""
+    engine = env.get('DB_ENGINE', 'sqlite')
+    if engine == 'postgres':
+        databases = {
+            'default': _postgres(env, env.get('POSTGRES_HOST', 'localhost'), env.get('POSTGRES_PORT', '5432')),
+        }
+        replicas = [host.strip() for host in env.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+        for number, replica in enumerate(replicas, start=1):
+            host, _, port = replica.partition(':')
+            config = _postgres(env, host, port or env.get('POSTGRES_PORT', '5432'))
+            # У тестах репліка - це та сама тестова база
+            config['TEST'] = {'MIRROR': 'default'}
+            databases[f'{REPLICA_PREFIX}{number}'] = config
+        return databases
+
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env.get('DB_NAME', base_dir / 'db.sqlite3'),
+    }
+    if engine == 'sqlite-wal':
+        config['OPTIONS'] = {
+            'init_command': SQLITE_WAL_PRAGMAS,
+            # Запис одразу бере RESERVED-блокування замість упгрейду посеред транзакції
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        }
+    elif engine != 'sqlite':
+        raise ValueError(f"Unknown DB_ENGINE: {engine}")
+    return {'default': config}
+
+
+@contextmanager
+def use_replica():
+    """Читання всередині блоку (або декорованої функції) йдуть на репліку"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def __init__(self):
+        from django.conf import settings
+        self.replicas = [alias for alias in settings.DATABASES if alias.startswith(REPLICA_PREFIX)]
+
+    def db_for_read(self, model, **hints):
+        if self.replicas and _replica_reads.get():
+            return random.choice(self.replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Репліки містять ті самі дані, що й default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaReadMixin:
+    """Дії viewset'а з replica_actions виконуються з use_replica()"""
+    replica_actions = ('list',)
+
+    def initial(self, request, *args, **kwargs):
+        if getattr(self, 'action', None) in self.replica_actions:
+            self._replica_token = _replica_reads.set(True)
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
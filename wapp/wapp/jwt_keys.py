@@ -0,0 +1,61 @@
+"""
+RSA-ключі JWT (SIMPLE_JWT, RS256) читаються з файлів при першому токені, а
+не під час імпорту settings - management-команди, тести й воркери, що не
+працюють з JWT, файлів не відкривають і ключів не генерують.
+
+simplejwt бере SIGNING_KEY/VERIFYING_KEY як settings.SIMPLE_JWT[...], лише
+коли створює TokenBackend (перший виданий чи перевірений токен). Для
+відсутніх у словнику ключів JwtSettings.__missing__ читає файл і зберігає
+значення в самому словнику. Якщо файлів немає, а generate увімкнено
+(JWT_GENERATE_KEYS, за замовчуванням при DEBUG), пара генерується.
+"""
+import logging
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+def generate_keys(private_key_path, public_key_path, key_size=2048):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    with open(private_key_path, 'wb') as f:
+        f.write(private_pem)
+    with open(public_key_path, 'wb') as f:
+        f.write(public_pem)
+    logger.warning("JWT keys generated: %s, %s", private_key_path, public_key_path)
+
+
+class JwtSettings(dict):
+    """SIMPLE_JWT, у якому SIGNING_KEY і VERIFYING_KEY читаються з файлів при першому зверненні"""
+
+    def __init__(self, settings, private_key_path, public_key_path, generate=False):
+        super().__init__(settings)
+        self.key_files = {'SIGNING_KEY': str(private_key_path), 'VERIFYING_KEY': str(public_key_path)}
+        self.generate = generate
+
+    def __missing__(self, name):
+        path = self.key_files.get(name)
+        if path is None:
+            raise KeyError(name)
+        if not all(os.path.exists(key_file) for key_file in self.key_files.values()):
+            if not self.generate:
+                raise ImproperlyConfigured(
+                    f"JWT key file {path} not found: run generate_keys.py or set JWT_GENERATE_KEYS=true"
+                )
+            generate_keys(self.key_files['SIGNING_KEY'], self.key_files['VERIFYING_KEY'])
+        with open(path, encoding='ascii') as f:
+            value = self[name] = f.read()
+        return value
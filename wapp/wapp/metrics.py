@@ -0,0 +1,86 @@
+"""
+Метрики Django у форматі Prometheus (blogcommon.metrics), ендпоінт /metrics.
+
+MetricsMiddleware записує для кожного запиту час обробки і кількість
+SQL-запитів (усіх підключень, включно з репліками) з міткою view_name
+маршруту - кількість рядів не росте з кількістю постів чи користувачів.
+Запити рахує обгортка, встановлена один раз на кожне підключення, у лічильник
+поточного запиту (ContextVar), тож на запит не припадає ні обходу
+підключень, ні встановлення обгорток. Кількість і час запитів доступні
+іншим middleware через request_queries() (бюджети, wapp/budgets.py).
+Метрики локальні для процесу: кожен воркер gunicorn/uvicorn збирається окремо.
+"""
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+from blogcommon.metrics import CONTENT_TYPE, HTTP_REQUEST_DURATION, Histogram, render
+
+DB_QUERIES = Histogram('django_db_queries', "SQL-запити на один HTTP-запит", ['route'],
+                       buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+
+_request_queries: ContextVar = ContextVar('request_queries', default=None)
+
+
+class QueryCounter:
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # секунди в execute усіх запитів
+
+
+def request_queries():
+    """Лічильник SQL поточного HTTP-запиту або None поза MetricsMiddleware"""
+    return _request_queries.get()
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.count += 1
+        counter.duration += time.perf_counter() - started
+
+
+def install_query_counter(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+connection_created.connect(install_query_counter, dispatch_uid='wapp.metrics.install_query_counter')
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Підключення, відкриті до завантаження middleware (сигнал для них уже був)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = match.view_name if match is not None else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(request.method, route, response.status_code).observe(elapsed)
+        DB_QUERIES.labels(route).observe(queries.count)
+        return response
+
+
+def metrics_view(request):
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
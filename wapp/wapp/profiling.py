@@ -0,0 +1,236 @@
+"""
+Профілювання запитів у продакшені вибірково, замість Silk на кожен запит.
+
+PROFILING_MODE (settings):
+  - silk   - SilkyMiddleware записує кожен запит, його SQL і тіла в основну
+             базу (розробка);
+  - sample - SamplingProfilerMiddleware: частка PROFILING['SAMPLE_RATE'] запитів
+             і, якщо задано SLOW_MS, усі запити, повільніші за поріг;
+  - off    - без профілювання.
+
+Для профільованого запиту фоновий потік раз на INTERVAL_MS знімає стек
+потоку, що його обробляє (sys._current_frames), а обгортка підключень
+записує SQL з тривалістю. Результат у форматі collapsed stacks (flamegraph.pl,
+speedscope) разом з SQL ставиться в чергу і дописується окремим потоком
+у PROFILING['DIR']/profiles-YYYY-MM-DD.jsonl - не в базу застосунку.
+Непрофільований запит коштує один random() (у режимі SLOW_MS - ще
+реєстрацію потоку й запис SQL у список, бо повільність відома лише в кінці).
+
+    python manage.py profiles --limit 20
+    python manage.py profiles --show <id> --stacks > request.folded
+"""
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Більше запитів одного HTTP-запиту не зберігається (лише їхня кількість)
+MAX_QUERIES = 500
+
+_captured: ContextVar = ContextVar('profiled_queries', default=None)
+
+
+class _QueryCapture:
+    __slots__ = ('queries', 'count')
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+
+
+def record_queries(execute, sql, params, many, context):
+    capture = _captured.get()
+    if capture is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        capture.count += 1
+        if len(capture.queries) < MAX_QUERIES:
+            capture.queries.append((sql, time.perf_counter() - started))
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+def collapse(frame) -> str:
+    """Стек від кореня до поточного кадру: 'file.py:func;file.py:func'"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_qualname}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Фоновий потік, що знімає стеки зареєстрованих потоків. Коли
+    профільованих запитів немає, потік чекає на подію і не прокидається.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id) -> Counter:
+        stacks = Counter()
+        with self._lock:
+            self._active[thread_id] = stacks
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return stacks
+
+    def stop(self, thread_id):
+        # Під блокуванням: після повернення потік вибірки вже не змінює stacks
+        with self._lock:
+            self._active.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            if not self._active:
+                self._wake.clear()
+                if not self._active:
+                    self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+
+
+class ProfileWriter:
+    """Черга записів і потік, що дописує їх у файл дня; при переповненні записи відкидаються"""
+
+    def __init__(self, directory: str, max_pending: int = 1000):
+        self.directory = directory
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: dict):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='profile-writer', daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def path(self, day: str) -> str:
+        return os.path.join(self.directory, f'profiles-{day}.jsonl')
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                self.write(record)
+            except OSError as e:
+                logger.warning("Failed to write profile %s: %s", record['id'], e)
+            finally:
+                self._queue.task_done()
+
+    def write(self, record: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(record['time'][:10]), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def join(self):
+        """Чекає, доки всі поставлені записи будуть записані"""
+        self._queue.join()
+
+
+def read_profiles(directory: str):
+    """Записи профілів з усіх файлів каталогу, у порядку запису"""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('profiles-') and name.endswith('.jsonl'):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class SamplingProfilerMiddleware:
+    def __init__(self, get_response, config=None):
+        self.get_response = get_response
+        config = config or settings.PROFILING
+        self.rate = config['SAMPLE_RATE']
+        self.slow = config['SLOW_MS'] / 1000 if config['SLOW_MS'] else None
+        self.sampler = StackSampler(config['INTERVAL_MS'] / 1000)
+        self.writer = ProfileWriter(config['DIR'])
+        connection_created.connect(install_query_recorder, dispatch_uid='wapp.profiling.install_query_recorder')
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        sampled = self.rate > 0 and random.random() < self.rate
+        if not sampled and self.slow is None:
+            return self.get_response(request)
+
+        capture = _QueryCapture()
+        token = _captured.set(capture)
+        thread_id = threading.get_ident()
+        stacks = self.sampler.start(thread_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.sampler.stop(thread_id)
+            _captured.reset(token)
+        elapsed = time.perf_counter() - started
+
+        if sampled or elapsed >= self.slow:
+            match = request.resolver_match
+            self.writer.submit({
+                'id': uuid.uuid4().hex[:12],
+                'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                'reason': 'sampled' if sampled else 'slow',
+                'method': request.method,
+                'path': request.path,
+                'route': match.view_name if match is not None else None,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 3),
+                'query_count': capture.count,
+                'queries': [{'sql': sql, 'duration_ms': round(duration * 1000, 3)}
+                            for sql, duration in capture.queries],
+                'stacks': dict(stacks),
+            })
+        return response
+
+
+def view_profile(name):
+    """@silk_profile лише в режимі silk; в інших режимах view не обгортається"""
+    if settings.PROFILING_MODE == 'silk':
+        from silk.profiling.profiler import silk_profile
+        return silk_profile(name=name)
+    return lambda view: view
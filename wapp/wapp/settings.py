@@ -13,44 +13,17 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
+import sys
+from wapp.cache import cache_config
+from wapp.db import database_config
+from wapp.jwt_keys import JwtSettings
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Auto-generate JWT keys if they don't exist
-def ensure_jwt_keys():
-    private_key_path = os.path.join(BASE_DIR, 'private.key')
-    public_key_path = os.path.join(BASE_DIR, 'public.key')
-    
-    if not os.path.exists(private_key_path) or not os.path.exists(public_key_path):
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048
-        )
-        
-        private_pem = private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.TraditionalOpenSSL,
-            encryption_algorithm=serialization.NoEncryption()
-        )
-        
-        public_key = private_key.public_key()
-        public_pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-        
-        with open(private_key_path, "wb") as f:
-            f.write(private_pem)
-        
-        with open(public_key_path, "wb") as f:
-            f.write(public_pem)
-        
-        print("JWT ключі автоматично згенеровано!")
-
-ensure_jwt_keys()
-
-
+# Спільна бібліотека сервісів (blogcommon) лежить у корені репозиторію;
+# в образі Docker вона скопійована поруч з manage.py
+REPO_DIR = os.path.dirname(BASE_DIR)
+if os.path.isdir(os.path.join(REPO_DIR, 'blogcommon')) and REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -64,6 +37,7 @@ SECRET_KEY = 'django-insecure-q&r)0fg67p0opkugo^)%*jah@+d*jjknsaxwwgf6=+66pl(k+%
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'django', '*']
 
@@ -79,34 +53,75 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'webap',
     'rest_framework',
-    'drf_spectacular',
     'rest_framework_simplejwt',
     'knox',
-    'silk',
 ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication'
     ],
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     
     }
-SIMPLE_JWT = {
-    'ALGORITHM': 'RS256',
-    'SIGNING_KEY': open(os.path.join(BASE_DIR, 'private.key'), 'r').read(),
-    'VERIFYING_KEY': open(os.path.join(BASE_DIR, 'public.key'), 'r').read(),
-    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
-}
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
-}
+# Застосунки лише для розробки: OpenAPI-схема і Swagger UI (/api/schema/, /api/docs/).
+# Silk додається лише в PROFILING_MODE=silk (нижче). Без них воркер і тести імпортують і мігрують менше
+DEV_APPS = os.environ.get('DEV_APPS', str(DEBUG and not TESTING)).lower() == 'true'
+if DEV_APPS:
+    INSTALLED_APPS.append('drf_spectacular')
+    REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'
+# Ключі RS256 читаються з файлів при першому токені, а не тут (wapp/jwt_keys.py);
+# відсутні файли генеруються лише з JWT_GENERATE_KEYS (за замовчуванням при DEBUG)
+SIMPLE_JWT = JwtSettings(
+    {
+        'ALGORITHM': 'RS256',
+        'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
+        'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    },
+    private_key_path=os.environ.get('JWT_PRIVATE_KEY_PATH', os.path.join(BASE_DIR, 'private.key')),
+    public_key_path=os.environ.get('JWT_PUBLIC_KEY_PATH', os.path.join(BASE_DIR, 'public.key')),
+    generate=os.environ.get('JWT_GENERATE_KEYS', str(DEBUG)).lower() == 'true',
+)
+
+# Токен для внутрішніх сервісів (воркери модерації), див. webap.permissions.HasServiceToken
+INTERNAL_SERVICE_TOKEN = os.environ.get('INTERNAL_SERVICE_TOKEN', '')
+
+# Спільний для всіх воркерів кеш (файловий або Redis), див. wapp/cache.py
+CACHES = cache_config(os.environ)
+# Як часто воркер звіряє версію каталогів категорій/тегів у кеші, секунди (webap/catalog.py)
+CATALOG_CHECK_INTERVAL = float(os.environ.get('CATALOG_CHECK_INTERVAL', 1.0))
+# Фрагменти шаблонів blog.html/read_post.html (ключі містять версію поста, тож TTL лише обмежує обсяг)
+FRAGMENT_CACHE_TIMEOUT = 600
+BLOG_INDEX_PAGE_SIZE = 10
+# Скільки останніх коментарів вкладається в пост; повний список - /api/posts/{id}/comments/
+POST_LATEST_COMMENTS = 3
+# list/search/popular постів збираються з .values() замість вкладених серіалізаторів (webap/fast_serializers.py)
+FAST_READ_SERIALIZERS = os.environ.get('FAST_READ_SERIALIZERS', 'True').lower() == 'true'
+# Стрічка підписок /api/feed/ (webap/feed.py): довжина збереженої стрічки, поріг
+# підписників, вище якого пости автора не розсилаються, а читаються при запиті
+FEED_TIMELINE_SIZE = int(os.environ.get('FEED_TIMELINE_SIZE', 500))
+FEED_FANOUT_LIMIT = int(os.environ.get('FEED_FANOUT_LIMIT', 1000))
+FEED_PAGE_SIZE = 20
+# Трендові пости (webap/trending.py): період напіврозпаду рахунку, ваги подій,
+# довжина попередньо обчислених top-N списків і як часто вони оновлюються
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))
+TRENDING_WEIGHTS = {'view': 1, 'like': 3, 'save': 4, 'share': 5, 'comment': 4}
+TRENDING_TOP_N = 100
+TRENDING_REFRESH_INTERVAL = 60
+# Журнал переглядів (webap/viewlog.py): сирі події, старші за стільки днів,
+# manage.py compact_views стискає в підсумки користувач/пост
+VIEW_LOG_RETENTION_DAYS = int(os.environ.get('VIEW_LOG_RETENTION_DAYS', 30))
+# Події взаємодій у RabbitMQ для інвалідації кешу рекомендацій (webap/events.py).
+# Як у blogcommon.messaging: AMQP_URL або AMQP_USER/AMQP_PASS/AMQP_HOST; без брокера (і в тестах) - вимкнено
+AMQP_URL = '' if TESTING else os.environ.get('AMQP_URL') or (
+    f"amqp://{os.environ.get('AMQP_USER', 'guest')}:{os.environ.get('AMQP_PASS', 'guest')}@{os.environ['AMQP_HOST']}/"
+    if os.environ.get('AMQP_HOST') else ''
+)
+AMQP_RETRY_INTERVAL = float(os.environ.get('AMQP_RETRY_INTERVAL', 30))
+EVENT_EXCHANGE = os.environ.get('EVENT_EXCHANGE', 'blog.events')
+ROUTING_KEY_INTERACTION = os.environ.get('ROUTING_KEY_INTERACTION', 'blog.event.interaction')
 
 MIDDLEWARE = [
+    # Першим: час запиту включає всі інші middleware
+    'wapp.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -114,9 +129,32 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'silk.middleware.SilkyMiddleware',
 ]
 
+# Профілювання (wapp/profiling.py): silk - кожен запит у Silk (розробка),
+# sample - вибіркові стеки й SQL в окремі файли, off - вимкнено (тести: Silk додає EXPLAIN до кожного SQL)
+PROFILING_MODE = os.environ.get('PROFILING_MODE', 'off' if TESTING else 'silk' if DEBUG else 'sample')
+PROFILING = {
+    # Частка запитів, що профілюються
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01)),
+    # Запити, повільніші за поріг, профілюються завжди; 0 - лише вибірка
+    'SLOW_MS': float(os.environ.get('PROFILING_SLOW_MS', 0)),
+    # Період зняття стеків
+    'INTERVAL_MS': float(os.environ.get('PROFILING_INTERVAL_MS', 5)),
+    'DIR': os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles')),
+}
+if PROFILING_MODE == 'silk':
+    INSTALLED_APPS.append('silk')
+    MIDDLEWARE.append('silk.middleware.SilkyMiddleware')
+elif PROFILING_MODE == 'sample':
+    # Одразу після метрик: профіль охоплює всі інші middleware
+    MIDDLEWARE.insert(1, 'wapp.profiling.SamplingProfilerMiddleware')
+
+# Бюджети view (@query_budget, wapp/budgets.py); у тестах перевищення кількості SQL - помилка.
+# Останнім: рахує SQL і час лише самого view та рендерингу
+MIDDLEWARE.append('wapp.budgets.BudgetMiddleware')
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', str(TESTING)).lower() == 'true'
+
 ROOT_URLCONF = 'wapp.urls'
 
 TEMPLATES = [
@@ -140,12 +178,9 @@ WSGI_APPLICATION = 'wapp.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Профіль (sqlite, sqlite-wal, postgres) і репліки задаються змінними оточення, див. wapp/db.py
+DATABASES = database_config(os.environ, BASE_DIR)
+DATABASE_ROUTERS = ['wapp.db.ReplicaRouter']
 
 
 
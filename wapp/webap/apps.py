@@ -1,3 +1,5 @@
+import os
+
 from django.apps import AppConfig
 
 
@@ -5,8 +7,7 @@ class WebapConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webap'
 
-class BlogConfig(AppConfig):
-    name = 'blog'
-
     def ready(self):
-        import blog.signals 
\ No newline at end of file
+        from . import signals  # noqa: F401
+        from blogcommon import tracing
+        tracing.configure(service=os.environ.get('TRACE_SERVICE', 'django'))
@@ -0,0 +1,221 @@
+"""
+Кеш окремих об'єктів (пости, профілі, HTML-сторінки) поверх спільного
+бекенду Django.
+
+Ключ містить версію об'єкта і версію всього виду, тому інвалідація - це
+інкремент версії, який одразу бачать усі воркери; старі записи просто
+доживають свій TTL. Від лавини перерахунків захищають:
+  - ймовірнісне раннє оновлення (XFetch): запис оновлюється трохи раніше
+    закінчення TTL, тим раніше, чим довше він обчислюється;
+  - single-flight: при промаху обчислює один процес (cache.add як блокування),
+    решта чекають на результат.
+Статистика попадань/промахів накопичується в процесі й періодично
+додається до лічильників у кеші (python manage.py cache_stats).
+"""
+import atexit
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+STATS_EVENTS = ('hit', 'miss', 'early_refresh', 'lock_wait', 'invalidate')
+STATS_FLUSH_EVERY = 100
+STATS_FLUSH_INTERVAL = 10.0
+
+_registry = {}
+
+
+def initial_version():
+    # Якщо ключ версії витіснено з кешу, нова версія все одно більша за
+    # будь-яку попередню, і старі записи не повернуться
+    return int(time.time() * 1000)
+
+
+def bump_version(cache, key):
+    """Інкремент лічильника версії у спільному кеші"""
+    cache.add(key, initial_version(), None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial_version(), None)
+
+
+class CacheStats:
+    """Лічильники подій у процесі; скидаються в кеш пакетами"""
+
+    def __init__(self, cache_alias='default'):
+        self.cache_alias = cache_alias
+        self._counts = Counter()
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, event):
+        return f'cachestats:{kind}:{event}'
+
+    def record(self, kind, event):
+        with self._lock:
+            self._counts[(kind, event)] += 1
+            self._pending += 1
+            due = (self._pending >= STATS_FLUSH_EVERY
+                   or time.monotonic() - self._flushed_at >= STATS_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+        cache = caches[self.cache_alias]
+        for (kind, event), count in counts.items():
+            key = self.key(kind, event)
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, None)
+
+    def snapshot(self, kinds):
+        """{kind: {event: count}} з кешу разом із ще не скинутими лічильниками"""
+        self.flush()
+        cache = caches[self.cache_alias]
+        keys = {self.key(kind, event): (kind, event) for kind in kinds for event in STATS_EVENTS}
+        values = cache.get_many(keys)
+        result = {kind: dict.fromkeys(STATS_EVENTS, 0) for kind in kinds}
+        for key, (kind, event) in keys.items():
+            result[kind][event] = values.get(key, 0)
+        return result
+
+    def reset(self, kinds):
+        with self._lock:
+            self._counts.clear()
+            self._pending = 0
+        caches[self.cache_alias].delete_many(
+            [self.key(kind, event) for kind in kinds for event in STATS_EVENTS]
+        )
+
+
+stats = CacheStats()
+
+
+@atexit.register
+def _flush_stats_at_exit():
+    try:
+        stats.flush()
+    except Exception as e:
+        logger.warning("Failed to flush cache stats: %s", e)
+
+
+class ObjectCache:
+    """
+    posts = ObjectCache('post')
+    data = posts.get_or_set(post_id, lambda: serialize(post_id))
+    posts.invalidate(post_id)       # один об'єкт
+    posts.invalidate_all()          # усі об'єкти виду
+    """
+
+    def __init__(self, kind, timeout=300, beta=1.0, lock_timeout=5.0, cache_alias='default'):
+        self.kind = kind
+        self.timeout = timeout
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.cache_alias = cache_alias
+        _registry[kind] = self
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _version_key(self, obj_id=None):
+        return f'ver:{self.kind}' if obj_id is None else f'ver:{self.kind}:{obj_id}'
+
+    def _versions(self, obj_id):
+        keys = [self._version_key(), self._version_key(obj_id)]
+        versions = self.cache.get_many(keys)
+        missing = {key: initial_version() for key in keys if key not in versions}
+        for key, version in missing.items():
+            # add, а не set: інший воркер міг щойно створити версію
+            if not self.cache.add(key, version, None):
+                version = self.cache.get(key, version)
+            versions[key] = version
+        return versions[keys[0]], versions[keys[1]]
+
+    def version(self, obj_id):
+        """Поточна версія об'єкта; змінюється при будь-якій інвалідації"""
+        kind_version, obj_version = self._versions(obj_id)
+        return f'{kind_version}.{obj_version}'
+
+    def key(self, obj_id):
+        return f'obj:{self.kind}:{obj_id}:{self.version(obj_id)}'
+
+    def _bump(self, key):
+        bump_version(self.cache, key)
+        stats.record(self.kind, 'invalidate')
+
+    def invalidate(self, obj_id):
+        self._bump(self._version_key(obj_id))
+
+    def invalidate_all(self):
+        self._bump(self._version_key())
+
+    def _compute(self, key, loader):
+        started = time.monotonic()
+        value = loader()
+        delta = time.monotonic() - started
+        self.cache.set(key, (value, delta, time.time() + self.timeout), self.timeout)
+        return value
+
+    def _should_refresh_early(self, delta, expires_at):
+        # XFetch: -log(U) має експоненційний розподіл, тож шанс раннього
+        # оновлення різко зростає в останні delta * beta секунд перед expires_at
+        return time.time() - delta * self.beta * math.log(1.0 - random.random()) >= expires_at
+
+    def get_or_set(self, obj_id, loader):
+        key = self.key(obj_id)
+        lock_key = f'lock:{key}'
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, delta, expires_at = entry
+            if self._should_refresh_early(delta, expires_at) and self.cache.add(lock_key, 1, self.lock_timeout):
+                stats.record(self.kind, 'early_refresh')
+                try:
+                    return self._compute(key, loader)
+                finally:
+                    self.cache.delete(lock_key)
+            stats.record(self.kind, 'hit')
+            return value
+
+        stats.record(self.kind, 'miss')
+        if self.cache.add(lock_key, 1, self.lock_timeout):
+            try:
+                return self._compute(key, loader)
+            finally:
+                self.cache.delete(lock_key)
+
+        # Значення вже обчислює інший запит - чекаємо, але не довше lock_timeout
+        stats.record(self.kind, 'lock_wait')
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry[0]
+        return self._compute(key, loader)
+
+
+def registered_kinds():
+    return sorted(_registry)
+
+
+post_cache = ObjectCache('post')
+profile_cache = ObjectCache('profile')
+# Готові HTML-сторінки для анонімних користувачів ('index:<page>', 'post:<id>')
+page_cache = ObjectCache('page', timeout=60)
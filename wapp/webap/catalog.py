@@ -0,0 +1,103 @@
+"""
+Каталоги категорій і тегів у пам'яті процесу.
+
+Таблиці маленькі й змінюються рідко, тому кожен воркер тримає готову
+серіалізовану копію разом з ETag. Актуальність перевіряється за номером
+версії у спільному кеші (не частіше ніж раз на CATALOG_CHECK_INTERVAL
+секунд); сигнали інкрементують версію, і всі воркери перезавантажують
+каталог при наступному зверненні.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .cache import bump_version, initial_version
+from .models import Category, Tag
+from .serializers import CategorySerializer, TagSerializer
+
+
+def strong_etag(data) -> str:
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return '"%s"' % hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class CatalogEntry(NamedTuple):
+    version: int
+    data: List[dict]
+    etag: str
+    # key_field -> (елемент, ETag елемента)
+    items: Dict[str, tuple]
+
+
+class Catalog:
+    def __init__(self, name: str, loader: Callable[[], List[dict]], key_field: Optional[str] = None,
+                 cache_alias: str = 'default'):
+        self.name = name
+        self.loader = loader
+        self.key_field = key_field
+        self.cache_alias = cache_alias
+        self._entry: Optional[CatalogEntry] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    @property
+    def version_key(self):
+        return f'catalog:{self.name}:version'
+
+    def _shared_version(self) -> int:
+        cache = caches[self.cache_alias]
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, initial_version(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self) -> CatalogEntry:
+        interval = getattr(settings, 'CATALOG_CHECK_INTERVAL', 1.0)
+        entry = self._entry
+        if entry is not None and time.monotonic() - self._checked_at < interval:
+            return entry
+        with self._lock:
+            version = self._shared_version()
+            self._checked_at = time.monotonic()
+            if self._entry is None or self._entry.version != version:
+                self._entry = self._load(version)
+            return self._entry
+
+    def _load(self, version: int) -> CatalogEntry:
+        self.loads += 1
+        data = [dict(item) for item in self.loader()]
+        items = {}
+        if self.key_field:
+            items = {str(item[self.key_field]): (item, strong_etag(item)) for item in data}
+        return CatalogEntry(version, data, strong_etag(data), items)
+
+    def invalidate(self):
+        bump_version(caches[self.cache_alias], self.version_key)
+        with self._lock:
+            self._entry = None
+
+
+def _load_categories():
+    return CategorySerializer(Category.objects.all(), many=True).data
+
+
+def _load_tags():
+    return TagSerializer(Tag.objects.all(), many=True).data
+
+
+def _load_popular_tags():
+    # posts_count підтримується сигналами (webap.signals), перерахунку немає
+    return TagSerializer(Tag.objects.order_by('-posts_count', 'name')[:20], many=True).data
+
+
+category_catalog = Catalog('categories', _load_categories, key_field='slug')
+tag_catalog = Catalog('tags', _load_tags, key_field='slug')
+popular_tag_catalog = Catalog('popular_tags', _load_popular_tags)
@@ -0,0 +1,134 @@
+"""
+Події взаємодій користувачів у RabbitMQ.
+
+Лайки, збереження (сигнали UserInteraction) і пакети /api/interactions/batch/
+публікуються в EVENT_EXCHANGE з ключем ROUTING_KEY_INTERACTION (черга
+INTERACTION_QUEUE, див. blogcommon.topology); сервіс рекомендацій за ними
+скидає закешовану видачу користувача:
+
+    {'correlationId': ..., 'body': {'event': 'USER_INTERACTION_CREATED',
+                                    'user': {'id': 1}, 'post': {'id': 2}, 'interaction': {'type': 'like'}}}
+    {'correlationId': ..., 'body': {'event': 'USER_INTERACTIONS_BATCH',
+                                    'user': {'id': 1}, 'interactions': [{'post': {'id': 2}, 'type': 'view'}]}}
+
+Подія відправляється після коміту транзакції (відкочена взаємодія не
+публікується) і без підтвердження брокера: це лише інвалідація кешу, пропущену
+подію покриє його TTL. Тому недоступний брокер не ламає запит - помилка
+логується, а нове підключення пробується не раніше ніж через AMQP_RETRY_INTERVAL.
+
+Конект pika (BlockingConnection) не потокобезпечний, тож у кожного потоку свій.
+Без AMQP_URL (тести, запуск без брокера) події не публікуються.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+
+from blogcommon import tracing
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_CREATED = 'USER_INTERACTION_CREATED'
+INTERACTION_DELETED = 'USER_INTERACTION_DELETED'
+INTERACTIONS_BATCH = 'USER_INTERACTIONS_BATCH'
+
+
+class EventPublisher:
+    def __init__(self, url, exchange, retry_interval=30.0, timeout=2.0):
+        self.url = url
+        self.exchange = exchange
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _channel(self):
+        channel = getattr(self._local, 'channel', None)
+        if channel is not None and channel.is_open:
+            return channel
+        if time.monotonic() < getattr(self._local, 'retry_at', 0.0):
+            return None
+        # pika потрібна лише процесам, що справді публікують
+        import pika
+
+        parameters = pika.URLParameters(self.url)
+        parameters.socket_timeout = parameters.blocked_connection_timeout = self.timeout
+        parameters.connection_attempts = 1
+        try:
+            self._local.channel = pika.BlockingConnection(parameters).channel()
+        except Exception:
+            logger.warning("RabbitMQ is unavailable, interaction events are dropped for %ss",
+                           self.retry_interval, exc_info=True)
+            self._local.channel = None
+            self._local.retry_at = time.monotonic() + self.retry_interval
+        return self._local.channel
+
+    def _drop(self):
+        channel, self._local.channel = getattr(self._local, 'channel', None), None
+        try:
+            if channel is not None:
+                channel.connection.close()
+        except Exception:
+            pass
+
+    def publish(self, routing_key, body, headers=None):
+        """True, якщо повідомлення передане брокеру"""
+        import pika
+
+        properties = pika.BasicProperties(content_type='application/json', delivery_mode=1, headers=headers)
+        # Простояний конект брокер міг закрити (heartbeat) - одна повторна спроба з новим
+        for attempt in range(2):
+            channel = self._channel()
+            if channel is None:
+                return False
+            try:
+                channel.basic_publish(self.exchange, routing_key, json.dumps(body).encode('utf-8'), properties)
+                return True
+            except Exception:
+                self._drop()
+                if attempt:
+                    logger.warning("Interaction event to %s was not published", routing_key, exc_info=True)
+        return False
+
+
+@lru_cache(maxsize=None)
+def publisher():
+    """Спільний для процесу EventPublisher або None, якщо AMQP_URL не задано"""
+    if not settings.AMQP_URL:
+        return None
+    return EventPublisher(settings.AMQP_URL, settings.EVENT_EXCHANGE,
+                          retry_interval=settings.AMQP_RETRY_INTERVAL)
+
+
+def interaction_event(event, user_id, **fields):
+    return {'correlationId': str(uuid.uuid4()), 'body': {'event': event, 'user': {'id': user_id}, **fields}}
+
+
+def publish_on_commit(body):
+    """Публікує подію взаємодії після коміту поточної транзакції (поза транзакцією - одразу)"""
+    target = publisher()
+    if target is None:
+        return
+    # Заголовки беруться зараз: після коміту span запиту вже може бути закритий
+    headers = tracing.inject({}) or None
+    transaction.on_commit(lambda: target.publish(settings.ROUTING_KEY_INTERACTION, body, headers))
+
+
+def interaction_changed(interaction, event):
+    publish_on_commit(interaction_event(
+        event, interaction.user_id,
+        post={'id': interaction.post_id}, interaction={'type': interaction.interaction_type},
+    ))
+
+
+def interactions_recorded(user_id, items):
+    """Одна подія на пакет: сервісу рекомендацій досить знати користувача"""
+    if items:
+        publish_on_commit(interaction_event(
+            INTERACTIONS_BATCH, user_id,
+            interactions=[{'post': {'id': post_id}, 'type': kind} for post_id, kind in items],
+        ))
@@ -0,0 +1,136 @@
+"""
+Швидкий шлях серіалізації постів для list/popular/search.
+
+Замість дерева ModelSerializer'ів (BlogPostSerializer -> PostCommentSerializer
+-> UserSerializer ...) відповідь збирається з кортежів .values_list() за
+наперед обчисленими індексами полів. Схема відповіді та сама, що й у
+BlogPostListSerializer (див. test_fast_path_matches_serializers).
+
+Запити на сторінку постів: id у потрібному порядку, рядки постів з автором,
+m2m тегів, останні коментарі з авторами, позначки користувача. Категорії й
+теги беруться з каталогів у пам'яті (webap.catalog).
+"""
+import base64
+
+from .catalog import category_catalog, tag_catalog
+from .models import BlogPost, UserInteraction
+from .serializers import latest_comments
+
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined')
+
+POST_COLUMNS = (
+    'id', 'title', 'text_stats__excerpt', 'category_id', 'comments_count', 'last_modified', 'created_at',
+    'post_picture', 'views_count', 'likes_count', 'reading_time',
+) + tuple(f'author__{field}' for field in USER_FIELDS)
+
+COMMENT_COLUMNS = (
+    'id', 'post_id', 'text', 'last_modified', 'likes_count',
+) + tuple(f'author__{field}' for field in USER_FIELDS)
+
+# Індекси колонок у кортежах values_list
+P = {name: index for index, name in enumerate(POST_COLUMNS)}
+C = {name: index for index, name in enumerate(COMMENT_COLUMNS)}
+POST_AUTHOR = P['author__id']
+COMMENT_AUTHOR = C['author__id']
+
+
+def format_datetime(value):
+    """Як serializers.DateTimeField для UTC: ISO 8601 з 'Z'"""
+    if value is None:
+        return None
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _user(row, start):
+    return {
+        'id': row[start],
+        'username': row[start + 1],
+        'email': row[start + 2],
+        'first_name': row[start + 3],
+        'last_name': row[start + 4],
+        'date_joined': format_datetime(row[start + 5]),
+    }
+
+
+def _latest_comments(post_ids):
+    comments = {}
+    rows = latest_comments().filter(post_id__in=post_ids).order_by('post_id', 'position').values_list(*COMMENT_COLUMNS)
+    for row in rows:
+        comments.setdefault(row[C['post_id']], []).append(row)
+    return comments
+
+
+def _post_tags(post_ids):
+    tags_by_id = {item['id']: (position, item) for position, item in enumerate(tag_catalog.get().data)}
+    tags = {}
+    for post_id, tag_id in BlogPost.tags.through.objects.filter(blogpost_id__in=post_ids).values_list(
+            'blogpost_id', 'tag_id'):
+        if tag_id in tags_by_id:
+            tags.setdefault(post_id, []).append(tags_by_id[tag_id])
+    # Порядок як у Tag.Meta.ordering (каталог уже відсортований за назвою)
+    return {post_id: [item for _, item in sorted(items, key=lambda pair: pair[0])] for post_id, items in tags.items()}
+
+
+def _user_flags(user, post_ids):
+    if user is None or not user.is_authenticated:
+        return {}
+    flags = {}
+    for post_id, interaction_type in UserInteraction.objects.filter(
+            user=user, post_id__in=post_ids, interaction_type__in=('like', 'save')
+    ).values_list('post_id', 'interaction_type'):
+        flags.setdefault(post_id, set()).add(interaction_type)
+    return flags
+
+
+def serialize_posts(post_ids, user=None):
+    """Пости з post_ids (у цьому ж порядку) у форматі BlogPostListSerializer(many=True).data"""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return []
+    rows = {row[0]: row for row in BlogPost.objects.filter(id__in=post_ids).order_by().values_list(*POST_COLUMNS)}
+    categories = {item['id']: item for item in category_catalog.get().data}
+    tags = _post_tags(post_ids)
+    comments = _latest_comments(post_ids)
+    flags = _user_flags(user, post_ids)
+
+    result = []
+    for post_id in post_ids:
+        row = rows.get(post_id)
+        if row is None:
+            # id з попередньо обчисленого списку (тренди, стрічка), пост уже видалено
+            continue
+        post_flags = flags.get(post_id, ())
+        is_liked = 'like' in post_flags
+        picture = row[P['post_picture']]
+        result.append({
+            'id': post_id,
+            'author': _user(row, POST_AUTHOR),
+            'title': row[P['title']],
+            'excerpt': row[P['text_stats__excerpt']],
+            'category': categories.get(row[P['category_id']]),
+            'tags': tags.get(post_id, []),
+            'comments': [
+                {
+                    'id': comment[C['id']],
+                    'author': _user(comment, COMMENT_AUTHOR),
+                    'post': post_id,
+                    'text': comment[C['text']],
+                    'last_modified': format_datetime(comment[C['last_modified']]),
+                    'likes_count': comment[C['likes_count']],
+                    # Як у PostCommentSerializer: лайк поста поточним користувачем
+                    'is_liked': is_liked,
+                }
+                for comment in comments.get(post_id, ())
+            ],
+            'comments_count': row[P['comments_count']],
+            'last_modified': format_datetime(row[P['last_modified']]),
+            'created_at': format_datetime(row[P['created_at']]),
+            'base64_image': base64.b64encode(picture).decode('utf-8') if picture else None,
+            'views_count': row[P['views_count']],
+            'likes_count': row[P['likes_count']],
+            'reading_time': row[P['reading_time']],
+            'is_liked': is_liked,
+            'is_saved': 'save' in post_flags,
+        })
+    return result
@@ -0,0 +1,146 @@
+"""
+Стрічка "пости тих, на кого я підписаний".
+
+Fan-out-on-write: новий пост одразу записується в таблицю TimelineEntry
+кожного підписника, і читання стрічки - це вибірка за індексом
+(owner, post) без JOIN по всіх постах. Стрічка обмежена FEED_TIMELINE_SIZE
+останніми записами (зайве обрізається пакетами).
+
+Fan-out-on-read: пости авторів з понад FEED_FANOUT_LIMIT підписниками не
+розсилаються (один пост - тисячі вставок), а домішуються при читанні.
+Так само при читанні добираються старі пости, яких у стрічці вже (або ще)
+немає: обрізані записи й пости, створені до підписки чи до цієї схеми.
+
+Множина таких авторів кешується (CELEBRITIES_TIMEOUT) і скидається, коли
+зміна підписок переводить автора через поріг.
+
+Курсор сторінок - id поста (id зростають разом з created_at).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import BlogPost, TimelineEntry, UserProfile
+
+FANOUT_BATCH_SIZE = 500
+CELEBRITIES_TIMEOUT = 300
+
+
+def follower_ids(author_id):
+    return UserProfile.objects.filter(follows=author_id).values_list('user_id', flat=True)
+
+
+def _followers_counts(author_ids=None):
+    follows = UserProfile.follows.through.objects.all()
+    if author_ids is not None:
+        follows = follows.filter(user_id__in=author_ids)
+    return follows.values('user_id').annotate(followers=Count('id'))
+
+
+def _celebrities_key():
+    return f'feed:celebrities:{settings.FEED_FANOUT_LIMIT}'
+
+
+def celebrity_ids():
+    """Автори, чиї пости не розсилаються, а читаються при запиті стрічки"""
+    celebrities = cache.get(_celebrities_key())
+    if celebrities is None:
+        celebrities = frozenset(_followers_counts().filter(followers__gt=settings.FEED_FANOUT_LIMIT)
+                                .values_list('user_id', flat=True))
+        cache.set(_celebrities_key(), celebrities, CELEBRITIES_TIMEOUT)
+    return celebrities
+
+
+def followers_changed(author_ids):
+    """Після зміни підписок: скидає кеш знаменитостей, якщо хтось із авторів перетнув поріг"""
+    celebrities = celebrity_ids()
+    counts = dict(_followers_counts(author_ids).values_list('user_id', 'followers'))
+    if any((counts.get(author_id, 0) > settings.FEED_FANOUT_LIMIT) != (author_id in celebrities)
+           for author_id in author_ids):
+        cache.delete(_celebrities_key())
+
+
+def trim_timelines(owner_ids):
+    """Обрізає стрічки власників до FEED_TIMELINE_SIZE останніх записів"""
+    size = settings.FEED_TIMELINE_SIZE
+    # Обрізається із запасом у 10%, щоб не рахувати вікно після кожного поста
+    overflowing = list(TimelineEntry.objects.filter(owner_id__in=owner_ids).values('owner_id')
+                       .annotate(entries=Count('id')).filter(entries__gt=size + size // 10)
+                       .values_list('owner_id', flat=True))
+    if not overflowing:
+        return 0
+    stale = list(TimelineEntry.objects.filter(owner_id__in=overflowing).annotate(
+        position=Window(RowNumber(), partition_by=F('owner_id'), order_by=F('post_id').desc())
+    ).filter(position__gt=size).values_list('id', flat=True))
+    return TimelineEntry.objects.filter(id__in=stale).delete()[0]
+
+
+def _insert(owner_post_pairs):
+    entries = [TimelineEntry(owner_id=owner_id, post_id=post_id) for owner_id, post_id in owner_post_pairs]
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post_id, author_id):
+    """Розсилає новий пост у стрічки підписників; повертає кількість стрічок (0 - fan-out-on-read)"""
+    if author_id in celebrity_ids():
+        return 0
+    delivered = 0
+    owner_ids = []
+    for owner_id in follower_ids(author_id).iterator(chunk_size=FANOUT_BATCH_SIZE):
+        owner_ids.append(owner_id)
+        if len(owner_ids) == FANOUT_BATCH_SIZE:
+            delivered += _deliver(post_id, owner_ids)
+            owner_ids = []
+    if owner_ids:
+        delivered += _deliver(post_id, owner_ids)
+    return delivered
+
+
+def _deliver(post_id, owner_ids):
+    _insert((owner_id, post_id) for owner_id in owner_ids)
+    trim_timelines(owner_ids)
+    return len(owner_ids)
+
+
+def follow(owner_id, author_ids):
+    """Нові підписки: останні пости авторів (крім знаменитостей) додаються в стрічку"""
+    author_ids = set(author_ids) - celebrity_ids()
+    if not author_ids:
+        return
+    size = settings.FEED_TIMELINE_SIZE
+    post_ids = BlogPost.objects.filter(author_id__in=author_ids).order_by('-id').values_list('id', flat=True)[:size]
+    _insert((owner_id, post_id) for post_id in post_ids)
+    trim_timelines([owner_id])
+
+
+def unfollow(owner_id, author_ids):
+    TimelineEntry.objects.filter(owner_id=owner_id, post__author_id__in=author_ids).delete()
+
+
+def _recent_post_ids(user_id, before, limit, author_ids=None):
+    """Fan-out-on-read: останні пости авторів, на яких підписаний user_id, напряму з BlogPost"""
+    posts = BlogPost.objects.filter(author__followers__user_id=user_id)
+    if author_ids is not None:
+        posts = posts.filter(author_id__in=author_ids)
+    if before:
+        posts = posts.filter(id__lt=before)
+    return posts.order_by('-id').values_list('id', flat=True)[:limit]
+
+
+def feed_post_ids(user_id, before=None, limit=None):
+    """id постів сторінки стрічки (нові першими), старіші за курсор before"""
+    limit = limit or settings.FEED_PAGE_SIZE
+    entries = TimelineEntry.objects.filter(owner_id=user_id)
+    if before:
+        entries = entries.filter(post_id__lt=before)
+    timeline = list(entries.order_by('-post_id').values_list('post_id', flat=True)[:limit])
+    post_ids = set(timeline)
+
+    celebrities = celebrity_ids()
+    if celebrities:
+        post_ids.update(_recent_post_ids(user_id, before, limit, celebrities))
+    if len(timeline) < limit:
+        # Стрічка закінчилась (обрізана або ще не заповнена) - старіші пости при читанні
+        post_ids.update(_recent_post_ids(user_id, timeline[-1] if timeline else before, limit))
+    return sorted(post_ids, reverse=True)[:limit]
@@ -0,0 +1,102 @@
+"""
+Пакетний запис взаємодій (POST /api/interactions/batch/).
+
+Пакет записується фіксованою кількістю запитів незалежно від розміру:
+  1. перегляди - один INSERT у журнал ViewEvent (webap.viewlog);
+  2. реакції - SELECT наявних пар (post, interaction_type) користувача і один
+     bulk_create(ignore_conflicts=True): нові вставляються, наявні лишаються
+     як є. Їхній timestamp не зсувається, бо внесок реакції в trending
+     записаний з ним, і видалення (untrend_deleted_interaction) віднімає
+     його з тим самим часом;
+  3. один UPDATE лічильників усіх постів пакета: CASE за групами постів
+     з однаковим приростом.
+
+Лічильники рахуються так само, як в одиночних шляхах: кожен перегляд
+збільшує views_count і рахунок trending (як retrieve), реакції - лише
+нові (як like та сигнал trend_new_interaction). bulk_create не надсилає
+post_save, тож trending і подія взаємодій для сервісу рекомендацій
+(webap.events, одна на пакет) оновлюються тут, а не сигналами.
+"""
+import math
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from . import trending
+from .events import interactions_recorded
+from .models import BlogPost, UserInteraction
+from .viewlog import record_views
+
+
+def batch_score(weight, timestamp):
+    """log2 сумарної ваги подій, що сталися в момент timestamp"""
+    return math.log2(weight) + (timestamp - trending.EPOCH) / trending.half_life()
+
+
+def counter_updates(views, likes, weights, timestamp):
+    """
+    Поля для одного UPDATE: {post_id: приріст} -> CASE. Пости з однаковим
+    приростом об'єднуються в одну гілку WHEN id IN (...), тож кількість
+    параметрів запиту росте з кількістю різних приростів, а не постів.
+    """
+    def case(field, increments, expression):
+        groups = defaultdict(list)
+        for post_id, amount in increments.items():
+            groups[amount].append(post_id)
+        return Case(*(When(id__in=ids, then=expression(amount)) for amount, ids in groups.items()),
+                    default=F(field), output_field=BlogPost._meta.get_field(field))
+
+    fields = {}
+    if views:
+        fields['views_count'] = case('views_count', views, lambda n: F('views_count') + Value(n))
+    if likes:
+        fields['likes_count'] = case('likes_count', likes, lambda n: F('likes_count') + Value(n))
+    if weights:
+        fields['trending_score'] = case('trending_score', weights,
+                                        lambda w: trending.add_expression(batch_score(w, timestamp)))
+    return fields
+
+
+def record_batch(user, items):
+    """
+    Записує пакет {'post': id, 'interaction_type': тип} від user.
+    Повертає кількість нових взаємодій (кожен перегляд - нова подія журналу).
+    """
+    # Повтори реакцій у пакеті зливаються в один рядок, перегляди - окремі події журналу
+    events = Counter((item['post'], item['interaction_type']) for item in items)
+    reactions = [key for key in events if key[1] != 'view']
+    now = time.time()
+
+    with transaction.atomic():
+        record_views(user, [item['post'] for item in items if item['interaction_type'] == 'view'])
+        existing = set()
+        if reactions:
+            existing = set(UserInteraction.objects.filter(
+                user=user, post_id__in={post_id for post_id, _ in reactions},
+                interaction_type__in={kind for _, kind in reactions},
+            ).values_list('post_id', 'interaction_type'))
+            UserInteraction.objects.bulk_create(
+                [UserInteraction(user=user, post_id=post_id, interaction_type=kind) for post_id, kind in reactions],
+                ignore_conflicts=True,
+            )
+
+        views, likes, weights = Counter(), Counter(), Counter()
+        for (post_id, kind), count in events.items():
+            if kind == 'view':
+                views[post_id] += count
+            elif (post_id, kind) in existing:
+                continue
+            elif kind == 'like':
+                likes[post_id] += 1
+            weight = settings.TRENDING_WEIGHTS.get(kind)
+            if weight:
+                weights[post_id] += weight * (count if kind == 'view' else 1)
+
+        fields = counter_updates(views, likes, weights, now)
+        if fields:
+            BlogPost.objects.filter(id__in=views.keys() | likes.keys() | weights.keys()).update(**fields)
+        interactions_recorded(user.pk, list(events))
+    return sum(views.values()) + sum(1 for key in reactions if key not in existing)
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from webap.cache import registered_kinds, stats
+
+
+class Command(BaseCommand):
+    help = "Статистика попадань/промахів кешу об'єктів (сумарно для всіх воркерів)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="обнулити лічильники")
+
+    def handle(self, *args, **options):
+        kinds = registered_kinds()
+        if options['reset']:
+            stats.reset(kinds)
+            self.stdout.write(self.style.SUCCESS("Лічильники кешу обнулено"))
+            return
+
+        self.stdout.write(f"Backend: {settings.CACHES['default']['BACKEND']}")
+        self.stdout.write(f"{'kind':<10} {'hits':>8} {'misses':>8} {'hit %':>7} "
+                          f"{'early':>7} {'waits':>7} {'invalid.':>9}")
+        for kind, counts in stats.snapshot(kinds).items():
+            lookups = counts['hit'] + counts['miss'] + counts['early_refresh']
+            ratio = (counts['hit'] + counts['early_refresh']) / lookups * 100 if lookups else 0
+            self.stdout.write(f"{kind:<10} {counts['hit']:>8} {counts['miss']:>8} {ratio:>6.1f}% "
+                              f"{counts['early_refresh']:>7} {counts['lock_wait']:>7} {counts['invalidate']:>9}")
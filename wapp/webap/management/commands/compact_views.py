@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from webap.viewlog import compact, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Стиснення старих сирих переглядів (ViewEvent) у підсумки користувач/пост (ViewAggregate)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.VIEW_LOG_RETENTION_DAYS,
+                            help="стискати події, старші за стільки днів")
+        parser.add_argument('--batch-size', type=int, default=200, help="користувачів за одну транзакцію")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        events, pairs = compact(retention_cutoff(options['older_than_days']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Стиснено {events} переглядів у {pairs} підсумків за {time.monotonic() - started:.1f}s"
+        ))
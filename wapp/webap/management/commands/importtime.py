@@ -0,0 +1,68 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Те, що робить воркер до першого запиту: settings, застосунки, WSGI-застосунок, urlconf
+BOOT_SCRIPT = """
+import django
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+"""
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """Рядки `-X importtime` -> [(модуль, self мкс, cumulative мкс, глибина)]"""
+    rows = []
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def by_package(rows):
+    totals = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = "Звіт -X importtime для старту воркера Django (settings, застосунки, WSGI, urlconf)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25, help="скільки рядків показати")
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative')
+        parser.add_argument('--packages', action='store_true', help="сумувати self-час за пакетами верхнього рівня")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'wapp.settings'))
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT], cwd=settings.BASE_DIR,
+                                env=env, capture_output=True, text=True)
+        rows = parse_importtime(result.stderr)
+        if result.returncode:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError(errors[-1] if errors else f"boot failed with code {result.returncode}")
+
+        # Сумарний час - cumulative модулів верхнього рівня (глибина 0)
+        total = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+        self.stdout.write(f"{len(rows)} модулів, імпорт {total / 1000:.0f} ms")
+        if options['packages']:
+            self.stdout.write(f"{'self, ms':>10}  пакет")
+            for package, self_us in by_package(rows)[:options['limit']]:
+                self.stdout.write(f"{self_us / 1000:10.1f}  {package}")
+            return
+        column = 1 if options['sort'] == 'self' else 2
+        self.stdout.write(f"{'self, ms':>10} {'cumul, ms':>10}  модуль")
+        for name, self_us, cumulative_us, _ in sorted(rows, key=lambda row: row[column], reverse=True)[:options['limit']]:
+            self.stdout.write(f"{self_us / 1000:10.1f} {cumulative_us / 1000:10.1f}  {name}")
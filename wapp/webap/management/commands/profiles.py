@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from wapp.profiling import read_profiles
+
+
+class Command(BaseCommand):
+    help = "Профілі запитів, записані SamplingProfilerMiddleware (PROFILING_MODE=sample)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help="скільки найповільніших запитів показати")
+        parser.add_argument('--route', help="лише запити цього маршруту (view_name)")
+        parser.add_argument('--show', metavar='ID', help="SQL і найчастіші стеки одного профілю")
+        parser.add_argument('--stacks', action='store_true',
+                            help="з --show: усі стеки у форматі collapsed (flamegraph.pl, speedscope)")
+
+    def handle(self, *args, **options):
+        profiles = read_profiles(settings.PROFILING['DIR'])
+        if options['show']:
+            profile = next((p for p in profiles if p['id'] == options['show']), None)
+            if profile is None:
+                raise CommandError(f"Profile {options['show']} not found")
+            self.show(profile, options['stacks'])
+            return
+
+        if options['route']:
+            profiles = (p for p in profiles if p['route'] == options['route'])
+        slowest = sorted(profiles, key=lambda p: p['duration_ms'], reverse=True)[:options['limit']]
+        self.stdout.write(f"{'id':<12} {'time':<23} {'reason':<7} {'ms':>9} {'sql':>5} {'status':>6}  route")
+        for p in slowest:
+            self.stdout.write(f"{p['id']:<12} {p['time'][:23]:<23} {p['reason']:<7} {p['duration_ms']:>9.1f} "
+                              f"{p['query_count']:>5} {p['status']:>6}  {p['route'] or p['path']}")
+
+    def show(self, profile, all_stacks):
+        stacks = sorted(profile['stacks'].items(), key=lambda item: item[1], reverse=True)
+        if all_stacks:
+            for stack, count in stacks:
+                self.stdout.write(f"{stack} {count}")
+            return
+        self.stdout.write(f"{profile['method']} {profile['path']} -> {profile['status']}, "
+                          f"{profile['duration_ms']:.1f} ms, {profile['query_count']} SQL")
+        for query in profile['queries']:
+            self.stdout.write(f"  {query['duration_ms']:>8.2f} ms  {query['sql']}")
+        samples = sum(count for _, count in stacks)
+        for stack, count in stacks[:10]:
+            # Лише кінець стека: найглибші кадри показують, де саме витрачено час
+            self.stdout.write(f"  {count / samples * 100:5.1f}%  ...;{';'.join(stack.split(';')[-4:])}")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from webap.cache import page_cache, post_cache
+from webap.models import BlogPost, PostTextStats
+from webap.textstats import backfill_text_stats
+
+
+class Command(BaseCommand):
+    help = "Перерахунок статистики текстів постів (час читання, уривок, мова, ключові слова)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="постів за один запит")
+        parser.add_argument('--force', action='store_true', help="перерахувати всі пости, а не лише застарілі")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        updated = backfill_text_stats(BlogPost, PostTextStats, options['batch_size'], options['force'])
+        if updated:
+            # bulk_update не викликає сигналів, тож кеші скидаються тут
+            post_cache.invalidate_all()
+            page_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Оновлено статистику {updated} постів за {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from webap.models import BlogPost, PostComment, UserInteraction, ViewAggregate, ViewEvent
+from webap.trending import rebuild_scores, top_cache
+
+
+class Command(BaseCommand):
+    help = "Перерахунок трендових рахунків постів (після зміни TRENDING_HALF_LIFE_HOURS чи ваг)"
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        posts = rebuild_scores(BlogPost, UserInteraction, PostComment,
+                               view_event_model=ViewEvent, view_aggregate_model=ViewAggregate)
+        top_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Перераховано рахунки {posts} постів за {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+def count_tag_posts(apps, schema_editor):
+    Tag = apps.get_model("webap", "Tag")
+    for tag in Tag.objects.annotate(total=models.Count("blogpost")).only("id"):
+        Tag.objects.filter(id=tag.id).update(posts_count=tag.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webap", "0004_add_comment_likes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="posts_count",
+            field=models.PositiveIntegerField(
+                db_index=True, default=0, editable=False, verbose_name="Кількість постів"
+            ),
+        ),
+        migrations.RunPython(count_tag_posts, migrations.RunPython.noop),
+    ]
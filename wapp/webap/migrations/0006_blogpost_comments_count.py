@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+def count_post_comments(apps, schema_editor):
+    BlogPost = apps.get_model("webap", "BlogPost")
+    for post in BlogPost.objects.annotate(total=models.Count("postcomment")).filter(total__gt=0).only("id"):
+        BlogPost.objects.filter(id=post.id).update(comments_count=post.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webap", "0005_tag_posts_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="comments_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Кількість коментарів"
+            ),
+        ),
+        migrations.RunPython(count_post_comments, migrations.RunPython.noop),
+    ]
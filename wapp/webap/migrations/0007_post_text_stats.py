@@ -0,0 +1,49 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from webap.textstats import backfill_text_stats
+
+
+def compute_text_stats(apps, schema_editor):
+    backfill_text_stats(apps.get_model("webap", "BlogPost"), apps.get_model("webap", "PostTextStats"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webap", "0006_blogpost_comments_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostTextStats",
+            fields=[
+                (
+                    "post",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="text_stats",
+                        serialize=False,
+                        to="webap.blogpost",
+                    ),
+                ),
+                ("text_hash", models.CharField(max_length=40, verbose_name="Хеш тексту")),
+                ("word_count", models.PositiveIntegerField(default=0, verbose_name="Кількість слів")),
+                ("excerpt", models.TextField(blank=True, verbose_name="Уривок")),
+                ("language", models.CharField(blank=True, db_index=True, max_length=8, verbose_name="Мова")),
+                ("keywords", models.JSONField(blank=True, default=list, verbose_name="Ключові слова")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Статистика тексту",
+                "verbose_name_plural": "Статистика текстів",
+            },
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="text_hash",
+            field=models.CharField(blank=True, editable=False, max_length=40, verbose_name="Хеш тексту"),
+        ),
+        migrations.RunPython(compute_text_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_timelines(apps, schema_editor):
+    UserProfile = apps.get_model("webap", "UserProfile")
+    BlogPost = apps.get_model("webap", "BlogPost")
+    TimelineEntry = apps.get_model("webap", "TimelineEntry")
+    Follow = UserProfile.follows.through
+    celebrities = set(
+        Follow.objects.values("user_id").annotate(followers=models.Count("id"))
+        .filter(followers__gt=settings.FEED_FANOUT_LIMIT).values_list("user_id", flat=True)
+    )
+    for profile in UserProfile.objects.only("id", "user_id"):
+        authors = set(Follow.objects.filter(userprofile_id=profile.id).values_list("user_id", flat=True)) - celebrities
+        if not authors:
+            continue
+        post_ids = BlogPost.objects.filter(author_id__in=authors).order_by("-id").values_list("id", flat=True)
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=profile.user_id, post_id=post_id)
+             for post_id in post_ids[:settings.FEED_TIMELINE_SIZE]],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webap", "0007_post_text_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="webap.blogpost"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Запис стрічки",
+                "verbose_name_plural": "Записи стрічок",
+                "unique_together": {("owner", "post")},
+            },
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
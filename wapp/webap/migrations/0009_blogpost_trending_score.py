@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+from webap.trending import rebuild_scores
+
+
+def compute_trending_scores(apps, schema_editor):
+    rebuild_scores(
+        apps.get_model("webap", "BlogPost"),
+        apps.get_model("webap", "UserInteraction"),
+        apps.get_model("webap", "PostComment"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webap", "0008_timeline_entry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="trending_score",
+            field=models.FloatField(
+                db_index=True, default=0.0, editable=False, verbose_name="Трендовий рахунок"
+            ),
+        ),
+        migrations.RunPython(compute_trending_scores, migrations.RunPython.noop),
+    ]
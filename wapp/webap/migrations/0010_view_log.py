@@ -0,0 +1,93 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_views(apps, schema_editor):
+    # Перегляди з UserInteraction стають підсумками: по одному перегляду на пару користувач/пост
+    UserInteraction = apps.get_model("webap", "UserInteraction")
+    ViewAggregate = apps.get_model("webap", "ViewAggregate")
+    views = UserInteraction.objects.filter(interaction_type="view")
+    rows = []
+    for user_id, post_id, moment in views.values_list("user_id", "post_id", "timestamp").iterator():
+        rows.append(ViewAggregate(user_id=user_id, post_id=post_id, views=1,
+                                  first_viewed_at=moment, last_viewed_at=moment))
+        if len(rows) == 500:
+            ViewAggregate.objects.bulk_create(rows)
+            rows = []
+    ViewAggregate.objects.bulk_create(rows)
+    views.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webap", "0009_blogpost_trending_score"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ViewEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "viewed_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now, verbose_name="Час перегляду"
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="webap.blogpost"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Перегляд",
+                "verbose_name_plural": "Перегляди",
+                "indexes": [models.Index(fields=["user", "viewed_at"], name="webap_view_user_time")],
+            },
+        ),
+        migrations.CreateModel(
+            name="ViewAggregate",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("views", models.PositiveIntegerField(default=0, verbose_name="Перегляди")),
+                ("first_viewed_at", models.DateTimeField(verbose_name="Перший перегляд")),
+                ("last_viewed_at", models.DateTimeField(verbose_name="Останній перегляд")),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="webap.blogpost"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Зведені перегляди",
+                "verbose_name_plural": "Зведені перегляди",
+                "unique_together": {("user", "post")},
+            },
+        ),
+        migrations.RunPython(move_views, migrations.RunPython.noop),
+    ]
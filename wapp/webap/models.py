@@ -1,8 +1,11 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 import re
 
+from .textstats import compute_text_stats, stats_fields, text_hash
+
 User = get_user_model()
 
 class Category(models.Model):
@@ -25,6 +28,8 @@ class Tag(models.Model):
     slug = models.SlugField('URL слаг', max_length=50, unique=True)
     color = models.CharField('Колір тегу', max_length=7, default='#6c757d')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Денормалізована кількість постів з тегом, оновлюється сигналами (webap.signals)
+    posts_count = models.PositiveIntegerField('Кількість постів', default=0, db_index=True, editable=False)
     
     class Meta:
         verbose_name = 'Тег'
@@ -49,6 +54,12 @@ class BlogPost(models.Model):
     views_count = models.PositiveIntegerField('Кількість переглядів', default=0)
     likes_count = models.PositiveIntegerField('Кількість лайків', default=0)
     reading_time = models.PositiveIntegerField('Час читання (хв)', default=0)
+    # sha1 тексту, для якого пораховані reading_time і PostTextStats
+    text_hash = models.CharField('Хеш тексту', max_length=40, blank=True, editable=False)
+    # log2 рахунку зі згасанням у часі (webap.trending), оновлюється сигналами
+    trending_score = models.FloatField('Трендовий рахунок', default=0.0, db_index=True, editable=False)
+    # Денормалізована кількість коментарів, оновлюється сигналами (webap.signals)
+    comments_count = models.PositiveIntegerField('Кількість коментарів', default=0, editable=False)
     
     class Meta:
         verbose_name = 'Блог пост'
@@ -56,11 +67,20 @@ class BlogPost(models.Model):
         ordering = ['-created_at']
     
     def save(self, *args, **kwargs):
-        # Автоматичний розрахунок часу читання (200 слів за хвилину)
-        if self.text:
-            word_count = len(self.text.split())
-            self.reading_time = max(1, word_count // 200)
+        # Статистика тексту (час читання, уривок, мова, ключові слова) лише при
+        # зміні тексту; save(update_fields=[...]) без 'text' текст не чіпає
+        update_fields = kwargs.get('update_fields')
+        stats = None
+        if update_fields is None or 'text' in update_fields:
+            if text_hash(self.text) != self.text_hash:
+                stats = compute_text_stats(self.text)
+                self.text_hash = stats.text_hash
+                self.reading_time = stats.reading_time
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'text_hash', 'reading_time'}
         super().save(*args, **kwargs)
+        if stats is not None:
+            PostTextStats.objects.update_or_create(post_id=self.pk, defaults=stats_fields(stats))
     
     def get_absolute_url(self):
         return reverse('display_post', kwargs={'post_id': self.pk})
@@ -68,7 +88,26 @@ class BlogPost(models.Model):
     def __str__(self):
         return self.title
 
+class PostTextStats(models.Model):
+    """Попередньо обчислені характеристики тексту поста (webap.textstats)"""
+    post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, primary_key=True, related_name='text_stats')
+    text_hash = models.CharField('Хеш тексту', max_length=40)
+    word_count = models.PositiveIntegerField('Кількість слів', default=0)
+    excerpt = models.TextField('Уривок', blank=True)
+    language = models.CharField('Мова', max_length=8, blank=True, db_index=True)
+    keywords = models.JSONField('Ключові слова', default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Статистика тексту'
+        verbose_name_plural = 'Статистика текстів'
+
+    def __str__(self):
+        return f'Статистика тексту {self.post_id}'
+
 class UserInteraction(models.Model):
+    # 'view' приймається API, але перегляди пишуться в журнал ViewEvent (webap.viewlog),
+    # тож тут лишаються реакції - невелика таблиця для is_liked/is_saved
     INTERACTION_TYPES = [
         ('like', 'Лайк'),
         ('dislike', 'Дизлайк'),
@@ -90,6 +129,38 @@ class UserInteraction(models.Model):
     def __str__(self):
         return f'{self.user.username} - {self.get_interaction_type_display()} - {self.post.title}'
 
+class ViewEvent(models.Model):
+    """Сирий перегляд поста: журнал лише для дописування, старі дні стискаються у ViewAggregate"""
+    # Індекс user покриває складений (user, viewed_at)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='+')
+    viewed_at = models.DateTimeField('Час перегляду', default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Перегляд'
+        verbose_name_plural = 'Перегляди'
+        indexes = [models.Index(fields=['user', 'viewed_at'], name='webap_view_user_time')]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.post_id} @ {self.viewed_at:%Y-%m-%d %H:%M}'
+
+class ViewAggregate(models.Model):
+    """Стиснені перегляди поста користувачем (webap.viewlog.compact)"""
+    # Індекс user покриває унікальний (user, post)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='+')
+    views = models.PositiveIntegerField('Перегляди', default=0)
+    first_viewed_at = models.DateTimeField('Перший перегляд')
+    last_viewed_at = models.DateTimeField('Останній перегляд')
+
+    class Meta:
+        verbose_name = 'Зведені перегляди'
+        verbose_name_plural = 'Зведені перегляди'
+        unique_together = ['user', 'post']
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.post_id}: {self.views}'
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField('Біографія', max_length=500, blank=True)
@@ -105,6 +176,20 @@ class UserProfile(models.Model):
     def __str__(self):
         return f'Профіль {self.user.username}'
 
+class TimelineEntry(models.Model):
+    """Пост у стрічці підписника (fan-out-on-write, webap.feed)"""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name = 'Запис стрічки'
+        verbose_name_plural = 'Записи стрічок'
+        # Індекс (owner, post) обслуговує і читання стрічки, і унікальність
+        unique_together = ['owner', 'post']
+
+    def __str__(self):
+        return f'{self.owner_id} <- {self.post_id}'
+
 class PostComment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE)
@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from rest_framework import permissions
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -11,3 +14,14 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
         # Редагувати/видаляти може лише власник
         return obj.author == request.user
+
+
+class HasServiceToken(permissions.BasePermission):
+    """
+    Доступ для внутрішніх сервісів (модерація, рекомендації) за заголовком
+    X-Service-Token. Якщо INTERNAL_SERVICE_TOKEN не задано - доступ закрито.
+    """
+    def has_permission(self, request, view):
+        expected = getattr(settings, 'INTERNAL_SERVICE_TOKEN', '')
+        provided = request.headers.get('X-Service-Token', '')
+        return bool(expected) and hmac.compare_digest(provided, expected)
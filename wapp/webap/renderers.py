@@ -0,0 +1,22 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson необов'язковий - тоді звичайний json
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson (у кілька разів швидше за stdlib json).
+    Для ?indent / Accept: ...; indent=N і без orjson - стандартна поведінка DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # default= обробляє типи, яких orjson не знає (lazy-рядки, Decimal тощо)
+        return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS)
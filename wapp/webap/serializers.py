@@ -1,6 +1,11 @@
 import base64
+from django.conf import settings
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from rest_framework import serializers
-from .models import BlogPost, PostComment, User, Category, Tag, UserInteraction, UserProfile
+from .models import (
+    BlogPost, PostComment, PostTextStats, User, Category, Tag, UserInteraction, UserProfile, ViewEvent
+)
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -64,6 +69,10 @@ class UserInteractionSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
+        if validated_data['interaction_type'] == 'view':
+            # Перегляди - події журналу (webap.viewlog), рядка UserInteraction не буде
+            event = ViewEvent.objects.create(user=validated_data['user'], post=validated_data['post'])
+            return UserInteraction(timestamp=event.viewed_at, **validated_data)
         # Видаляємо попередню взаємодію того ж типу, якщо є
         UserInteraction.objects.filter(
             user=validated_data['user'],
@@ -72,6 +81,23 @@ class UserInteractionSerializer(serializers.ModelSerializer):
         ).delete()
         return super().create(validated_data)
 
+class InteractionBatchListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # Наявність постів перевіряється одним запитом на весь пакет, а не PrimaryKeyRelatedField на кожен
+        post_ids = {item['post'] for item in attrs}
+        missing = post_ids - set(BlogPost.objects.filter(id__in=post_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Unknown posts: {', '.join(map(str, sorted(missing)))}")
+        return attrs
+
+class InteractionBatchItemSerializer(serializers.Serializer):
+    """Елемент пакета взаємодій (webap.interactions.record_batch)"""
+    post = serializers.IntegerField(min_value=1)
+    interaction_type = serializers.ChoiceField(choices=UserInteraction.INTERACTION_TYPES)
+
+    class Meta:
+        list_serializer_class = InteractionBatchListSerializer
+
 class PostCommentSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     is_liked = serializers.SerializerMethodField()
@@ -82,11 +108,14 @@ class PostCommentSerializer(serializers.ModelSerializer):
         extra_kwargs = {'author': {'read_only': True}}
     
     def get_is_liked(self, obj):
+        # Лайк поста поточним користувачем; сторінка коментарів передає лайки в контексті (user_post_flags)
+        if 'liked_post_ids' in self.context:
+            return obj.post_id in self.context['liked_post_ids']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return UserInteraction.objects.filter(
                 user=request.user,
-                post_id=obj.post.id,
+                post_id=obj.post_id,
                 interaction_type='like'
             ).exists()
         return False
@@ -95,15 +124,39 @@ class PostCommentSerializer(serializers.ModelSerializer):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
+def user_post_flags(user, post_ids) -> dict:
+    """Лайки і збереження користувача серед post_ids одним запитом - контекст серіалізаторів"""
+    flags = {'liked_post_ids': set(), 'saved_post_ids': set()}
+    if user is not None and user.is_authenticated:
+        for post_id, interaction_type in UserInteraction.objects.filter(
+                user=user, post_id__in=set(post_ids), interaction_type__in=('like', 'save')
+        ).values_list('post_id', 'interaction_type'):
+            flags['liked_post_ids' if interaction_type == 'like' else 'saved_post_ids'].add(post_id)
+    return flags
+
+def latest_comments(limit=None):
+    """Останні limit коментарів кожного поста: ROW_NUMBER() OVER (PARTITION BY post_id)"""
+    limit = limit or settings.POST_LATEST_COMMENTS
+    return PostComment.objects.annotate(
+        position=Window(RowNumber(), partition_by=F('post_id'), order_by=[F('last_modified').desc(), F('id').desc()])
+    ).filter(position__lte=limit)
+
+def latest_comments_prefetch(limit=None):
+    """Prefetch останніх коментарів у атрибут latest_comments одним запитом на сторінку постів"""
+    return Prefetch('postcomment_set', queryset=latest_comments(limit).select_related('author'),
+                    to_attr='latest_comments')
+
 class BlogPostSerializer(serializers.ModelSerializer):
-    # Включаємо коментарі; використовуємо поле 'postcomment_set' за замовчуванням
-    comments = PostCommentSerializer(required=False, many=True, source="postcomment_set", read_only=True)
+    # Лише останні POST_LATEST_COMMENTS коментарів; решта - /api/posts/{id}/comments/
+    comments = serializers.SerializerMethodField()
     category = CategorySerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     
     # Додаємо поле для отримання зображення у форматі base64
     base64_image = serializers.SerializerMethodField()
+    # Уривок з PostTextStats (webap.textstats)
+    excerpt = serializers.SerializerMethodField()
     
     # Взаємодії користувача з постом
     is_liked = serializers.SerializerMethodField()
@@ -116,18 +169,37 @@ class BlogPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = BlogPost
         fields = [
-            'id', 'author', 'title', 'text', 'category', 'category_id', 'tags', 'tag_ids',
-            'comments', 'last_modified', 'created_at', 'base64_image', 'views_count', 
+            'id', 'author', 'title', 'text', 'excerpt', 'category', 'category_id', 'tags', 'tag_ids',
+            'comments', 'comments_count', 'last_modified', 'created_at', 'base64_image', 'views_count', 
             'likes_count', 'reading_time', 'is_liked', 'is_saved'
         ]
         extra_kwargs = {'author': {'read_only': True}}
 
+    def get_comments(self, obj):
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            # Queryset без latest_comments_prefetch()
+            comments = obj.postcomment_set.select_related('author').order_by('-last_modified', '-id')[
+                :settings.POST_LATEST_COMMENTS
+            ]
+        return PostCommentSerializer(comments, many=True, context=self.context).data
+
+    def get_excerpt(self, obj):
+        try:
+            return obj.text_stats.excerpt
+        except PostTextStats.DoesNotExist:
+            # Пост створено повз BlogPost.save (bulk_create) - див. textstats_backfill
+            return None
+
     def get_base64_image(self, obj):
         if obj.post_picture:
             return base64.b64encode(obj.post_picture).decode('utf-8')
         return None
     
     def get_is_liked(self, obj):
+        # Списки постів передають лайки/збереження сторінки в контексті (user_post_flags)
+        if 'liked_post_ids' in self.context:
+            return obj.id in self.context['liked_post_ids']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return UserInteraction.objects.filter(
@@ -138,6 +210,8 @@ class BlogPostSerializer(serializers.ModelSerializer):
         return False
     
     def get_is_saved(self, obj):
+        if 'saved_post_ids' in self.context:
+            return obj.id in self.context['saved_post_ids']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return UserInteraction.objects.filter(
@@ -186,3 +260,9 @@ class BlogPostSerializer(serializers.ModelSerializer):
             instance.tags.set(tags)
         
         return instance
+
+class BlogPostListSerializer(BlogPostSerializer):
+    """Пост у списках: уривок замість повного тексту (повний - у /api/posts/{id}/)"""
+
+    class Meta(BlogPostSerializer.Meta):
+        fields = [field for field in BlogPostSerializer.Meta.fields if field != 'text']
@@ -1,8 +1,185 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from django.core.cache import cache
-from .models import BlogPost
+from django.utils import timezone
+from . import events, feed, trending
+from .cache import page_cache, post_cache, profile_cache
+from .catalog import category_catalog, popular_tag_catalog, tag_catalog
+from .models import BlogPost, Category, PostComment, Tag, UserInteraction, UserProfile
+
+
+def adjust_tag_posts_count(tag_ids, delta):
+    """Інкрементально оновлює Tag.posts_count замість COUNT по всіх постах"""
+    if not tag_ids or not delta:
+        return
+    Tag.objects.filter(id__in=tag_ids).update(posts_count=Greatest(F('posts_count') + delta, 0))
+    popular_tag_catalog.invalidate()
 
 @receiver([post_save, post_delete], sender=BlogPost)
 def clear_blogpost_cache(sender, instance, **kwargs):
-    cache.delete('all_posts')
+    post_cache.invalidate(instance.pk)
+    # Змінюється склад сторінок головної
+    page_cache.invalidate_all()
+
+@receiver(post_delete, sender=BlogPost)
+def drop_from_trending(sender, instance, **kwargs):
+    trending.top_cache.invalidate_all()
+
+@receiver(post_save, sender=BlogPost)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out_post(instance.pk, instance.author_id)
+
+@receiver(pre_delete, sender=BlogPost)
+def release_blogpost_tags(sender, instance, **kwargs):
+    # Рядки m2m видаляються каскадно без m2m_changed
+    adjust_tag_posts_count(list(instance.tags.values_list('id', flat=True)), -1)
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def clear_blogpost_tags_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # remove отримує pk_set як є, навіть неіснуючі зв'язки, а після clear
+        # зв'язків вже не видно - запам'ятовуємо, що справді буде видалено
+        links = instance.blogpost_set.all() if reverse else instance.tags.all()
+        if action == 'pre_remove':
+            links = links.filter(id__in=pk_set)
+        instance._removed_link_ids = list(links.values_list('id', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+
+    if action == 'post_add':
+        # pk_set містить лише нові зв'язки
+        changed, delta = list(pk_set), 1
+    else:
+        changed, delta = getattr(instance, '_removed_link_ids', []), -1
+    if reverse:
+        # instance - тег, changed - пости
+        adjust_tag_posts_count([instance.pk] if changed else [], delta * len(changed))
+        post_ids = changed
+    else:
+        adjust_tag_posts_count(changed, delta)
+        post_ids = [instance.pk] if changed else []
+    if post_ids:
+        # last_modified входить у ключі фрагментного кешу шаблонів
+        BlogPost.objects.filter(id__in=post_ids).update(last_modified=timezone.now())
+        for post_id in post_ids:
+            post_cache.invalidate(post_id)
+        page_cache.invalidate_all()
+
+@receiver(post_save, sender=PostComment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        BlogPost.objects.filter(id=instance.post_id).update(comments_count=F('comments_count') + 1)
+
+@receiver(post_delete, sender=PostComment)
+def count_deleted_comment(sender, instance, **kwargs):
+    BlogPost.objects.filter(id=instance.post_id).update(comments_count=Greatest(F('comments_count') - 1, 0))
+
+@receiver(post_save, sender=UserInteraction)
+def trend_new_interaction(sender, instance, created, **kwargs):
+    # Перегляди рахуються разом з views_count (у т.ч. анонімні), тут - лише реакції
+    if created and instance.interaction_type != 'view':
+        trending.record(BlogPost.objects.filter(id=instance.post_id), instance.interaction_type,
+                        instance.timestamp.timestamp())
+
+@receiver(post_delete, sender=UserInteraction)
+def untrend_deleted_interaction(sender, instance, **kwargs):
+    if instance.interaction_type != 'view':
+        trending.record(BlogPost.objects.filter(id=instance.post_id), instance.interaction_type,
+                        instance.timestamp.timestamp(), remove=True)
+
+@receiver(post_save, sender=UserInteraction)
+def publish_new_interaction(sender, instance, created, **kwargs):
+    # Сервіс рекомендацій скидає закешовану видачу користувача
+    if created:
+        events.interaction_changed(instance, events.INTERACTION_CREATED)
+
+@receiver(post_delete, sender=UserInteraction)
+def publish_deleted_interaction(sender, instance, **kwargs):
+    events.interaction_changed(instance, events.INTERACTION_DELETED)
+
+@receiver(post_save, sender=PostComment)
+def trend_new_comment(sender, instance, created, **kwargs):
+    if created:
+        trending.record(BlogPost.objects.filter(id=instance.post_id), 'comment', instance.last_modified.timestamp())
+
+@receiver(post_delete, sender=PostComment)
+def untrend_deleted_comment(sender, instance, **kwargs):
+    trending.record(BlogPost.objects.filter(id=instance.post_id), 'comment', instance.last_modified.timestamp(),
+                    remove=True)
+
+@receiver([post_save, post_delete], sender=PostComment)
+def clear_comment_cache(sender, instance, **kwargs):
+    post_cache.invalidate(instance.post_id)
+    page_cache.invalidate(f'post:{instance.post_id}')
+
+@receiver([post_save, post_delete], sender=Category)
+def clear_category_cache(sender, instance, **kwargs):
+    # Пости містять вкладену категорію
+    category_catalog.invalidate()
+    post_cache.invalidate_all()
+    page_cache.invalidate_all()
+
+@receiver([post_save, post_delete], sender=Tag)
+def clear_tag_cache(sender, instance, **kwargs):
+    tag_catalog.invalidate()
+    popular_tag_catalog.invalidate()
+    post_cache.invalidate_all()
+    page_cache.invalidate_all()
+    profile_cache.invalidate_all()
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def clear_profile_cache(sender, instance, **kwargs):
+    profile_cache.invalidate(instance.pk)
+
+@receiver(m2m_changed, sender=UserProfile.interests.through)
+def clear_profile_interests_cache(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        profile_cache.invalidate_all()
+    else:
+        profile_cache.invalidate(instance.pk)
+
+@receiver(m2m_changed, sender=UserProfile.follows.through)
+def clear_follow_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """Підписка змінює following_count одного профілю і followers_count іншого"""
+    if not action.startswith('post_'):
+        return
+    if action == 'post_clear':
+        profile_cache.invalidate_all()
+        return
+    if reverse:
+        # instance - користувач, pk_set - профілі підписників
+        profile_ids = set(pk_set) | set(UserProfile.objects.filter(user=instance).values_list('id', flat=True))
+    else:
+        profile_ids = {instance.pk} | set(UserProfile.objects.filter(user_id__in=pk_set).values_list('id', flat=True))
+    for profile_id in profile_ids:
+        profile_cache.invalidate(profile_id)
+
+@receiver(m2m_changed, sender=UserProfile.follows.through)
+def update_follow_timelines(sender, instance, action, reverse, pk_set, **kwargs):
+    """Стрічка підписника отримує пости нового автора і втрачає пости відписаного"""
+    if action == 'pre_clear':
+        # Після clear не видно, хто був у підписках
+        instance._cleared_follow_ids = (
+            list(instance.followers.values_list('id', flat=True)) if reverse
+            else list(instance.follows.values_list('id', flat=True))
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    changed = instance._cleared_follow_ids if action == 'post_clear' else pk_set
+    if not changed:
+        return
+    update = feed.follow if action == 'post_add' else feed.unfollow
+    if reverse:
+        # instance - автор, changed - профілі підписників
+        feed.followers_changed([instance.pk])
+        for owner_id in UserProfile.objects.filter(id__in=changed).values_list('user_id', flat=True):
+            update(owner_id, [instance.pk])
+    else:
+        feed.followers_changed(changed)
+        update(instance.user_id, changed)
@@ -0,0 +1,17 @@
+import base64
+
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def image_base64(post):
+    """
+    Зображення поста в base64 для data: URI. Викликається лише всередині
+    кешованого фрагмента, тож post_picture (відкладене поле) читається з бази
+    тільки при промаху кешу.
+    """
+    if not post.post_picture:
+        return ''
+    return base64.b64encode(post.post_picture).decode('utf-8')
@@ -0,0 +1,121 @@
+"""
+Попередньо обчислені характеристики тексту поста.
+
+Кількість слів, час читання, уривок для списків, мова і ключові слова
+рахуються лише тоді, коли змінюється хеш тексту (BlogPost.text_hash), і
+зберігаються в PostTextStats для списків, пошуку та рекомендацій.
+Функції тут чисті (без ORM), тому їх використовують і модель, і міграція,
+і команда textstats_backfill.
+"""
+import hashlib
+import re
+from collections import Counter
+from typing import List, NamedTuple
+
+from django.utils.text import Truncator
+
+WORDS_PER_MINUTE = 200
+EXCERPT_WORDS = 30
+KEYWORDS_LIMIT = 10
+
+_WORD_RE = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*", re.UNICODE)
+
+STOPWORDS = {
+    'en': frozenset("""
+        a about after all also an and any are as at be because been but by can could did do does
+        for from had has have he her his how i if in into is it its just me more most my no not
+        of on one only or other our out over she so some than that the their them then there
+        these they this to up us was we were what when which who will with would you your
+    """.split()),
+    'uk': frozenset("""
+        а або але без би був була були було в вже від він вона вони воно все всі втім де для до
+        же з за и із їх й коли ми мене мені на над не немає ні но о об однак по при про та так
+        також там те тим то того тож тому ти у усе усі це цей ця ці чи що щоб як який яка які я
+    """.split()),
+}
+
+
+class TextStats(NamedTuple):
+    text_hash: str
+    word_count: int
+    reading_time: int
+    excerpt: str
+    language: str
+    keywords: List[str]
+
+
+def text_hash(text) -> str:
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+def reading_time(word_count: int) -> int:
+    # 200 слів за хвилину, не менше хвилини (як і раніше у BlogPost.save)
+    return max(1, word_count // WORDS_PER_MINUTE)
+
+
+def detect_language(words) -> str:
+    """Мова за часткою стоп-слів ('' - якщо визначити не вдалося)"""
+    scores = {language: sum(1 for word in words if word in stopwords)
+              for language, stopwords in STOPWORDS.items()}
+    language, score = max(scores.items(), key=lambda item: item[1])
+    return language if score else ''
+
+
+def keywords(words, language, limit=KEYWORDS_LIMIT) -> List[str]:
+    stopwords = STOPWORDS.get(language, frozenset())
+    counts = Counter(word for word in words if len(word) > 2 and word not in stopwords)
+    # При однаковій частоті - алфавітний порядок, щоб результат був стабільним
+    return [word for word, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]]
+
+
+def compute_text_stats(text) -> TextStats:
+    text = text or ''
+    word_count = len(text.split())
+    words = [word.lower() for word in _WORD_RE.findall(text)]
+    language = detect_language(words)
+    return TextStats(
+        text_hash=text_hash(text),
+        word_count=word_count,
+        reading_time=reading_time(word_count),
+        excerpt=Truncator(' '.join(text.split())).words(EXCERPT_WORDS),
+        language=language,
+        keywords=keywords(words, language),
+    )
+
+
+STATS_FIELDS = ('text_hash', 'word_count', 'excerpt', 'language', 'keywords')
+
+
+def stats_fields(stats: TextStats) -> dict:
+    """Поля PostTextStats з TextStats"""
+    return {field: getattr(stats, field) for field in STATS_FIELDS}
+
+
+def backfill_text_stats(post_model, stats_model, batch_size=500, force=False):
+    """
+    Перераховує статистику постів, у яких текст змінився повз BlogPost.save
+    (queryset.update, bulk_create, старі дані) або статистики ще немає.
+    Моделі передаються параметрами, щоб працювало й з історичними моделями
+    міграцій. Повертає кількість оновлених постів.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = list(post_model.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk', 'text', 'text_hash', 'text_stats__text_hash')[:batch_size])
+        if not rows:
+            return updated
+        last_id = rows[-1][0]
+        posts, stats = [], []
+        for post_id, text, post_hash, stats_hash in rows:
+            digest = text_hash(text)
+            if not force and digest == post_hash == stats_hash:
+                continue
+            result = compute_text_stats(text)
+            posts.append(post_model(pk=post_id, text_hash=result.text_hash, reading_time=result.reading_time))
+            stats.append(stats_model(post_id=post_id, **stats_fields(result)))
+        if posts:
+            post_model.objects.bulk_update(posts, ['text_hash', 'reading_time'])
+            stats_model.objects.bulk_create(stats, update_conflicts=True, unique_fields=['post'],
+                                            update_fields=[*STATS_FIELDS, 'updated_at'])
+            updated += len(posts)
@@ -0,0 +1,135 @@
+"""
+Трендові пости: рейтинг зі згасанням у часі замість усього часу order_by.
+
+Кожна подія (перегляд, лайк, збереження, поширення, коментар) з вагою w у
+момент t додає w * 2^((t - EPOCH) / H) до рахунку поста (forward decay, H -
+період напіврозпаду TRENDING_HALF_LIFE_HOURS). Ділення всіх рахунків на
+спільний множник 2^((now - EPOCH) / H) не змінює порядку, тож збережене
+значення можна сортувати за індексом без перерахунку. Щоб не переповнити
+float, BlogPost.trending_score зберігає log2 цієї суми, а подія додається
+атомарним UPDATE: max(a, b) + log2(1 + 2^(min(a, b) - max(a, b))).
+Видалення лайка/коментаря віднімає його внесок з тим самим часом.
+
+Top-N (загалом, за категорією, за тегом) попередньо обчислюється і лежить у
+спільному кеші (ObjectCache з XFetch і single-flight), запит віддає його за O(N).
+Зміна TRENDING_HALF_LIFE_HOURS чи ваг вимагає перерахунку: trending_rebuild.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least, Log, Power
+
+from .cache import ObjectCache
+from .models import BlogPost
+
+# Точка відліку forward decay (2024-01-01T00:00:00Z)
+EPOCH = 1704067200.0
+# Нижня межа рахунку: пост без подій
+EMPTY_SCORE = 0.0
+
+top_cache = ObjectCache('trending', timeout=getattr(settings, 'TRENDING_REFRESH_INTERVAL', 60))
+
+
+def half_life():
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600
+
+
+def event_score(kind, timestamp=None):
+    """log2 внеску події kind у момент timestamp (None - подія не враховується)"""
+    weight = settings.TRENDING_WEIGHTS.get(kind)
+    if not weight:
+        return None
+    if timestamp is None:
+        timestamp = time.time()
+    return math.log2(weight) + (timestamp - EPOCH) / half_life()
+
+
+def decayed(score, now=None):
+    """Поточне значення рахунку у звичайній шкалі (зважені події з урахуванням згасання)"""
+    if score <= EMPTY_SCORE:
+        return 0.0
+    now = time.time() if now is None else now
+    return 2 ** (score - (now - EPOCH) / half_life())
+
+
+def add_expression(score):
+    """UPDATE-вираз: log2(2^trending_score + 2^score)"""
+    current, event = F('trending_score'), Value(score)
+    high, low = Greatest(current, event), Least(current, event)
+    return high + Log(Value(2.0), Value(1.0) + Power(Value(2.0), low - high))
+
+
+def subtract_expression(score):
+    """UPDATE-вираз: log2(2^trending_score - 2^score), не нижче EMPTY_SCORE"""
+    current = F('trending_score')
+    remainder = Greatest(Value(1.0) - Power(Value(2.0), Value(score) - current), Value(1e-12))
+    return Greatest(current + Log(Value(2.0), remainder), Value(EMPTY_SCORE))
+
+
+def updates(kind, timestamp=None, remove=False):
+    """Поля для queryset.update(), щоб подія потрапила в той самий UPDATE, що й лічильники"""
+    score = event_score(kind, timestamp)
+    if score is None:
+        return {}
+    return {'trending_score': subtract_expression(score) if remove else add_expression(score)}
+
+
+def record(queryset, kind, timestamp=None, remove=False):
+    """Додає (remove=True - віднімає) подію до рахунку постів queryset"""
+    fields = updates(kind, timestamp, remove)
+    return queryset.update(**fields) if fields else 0
+
+
+def log_add(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def rebuild_scores(post_model, interaction_model, comment_model, batch_size=500,
+                   view_event_model=None, view_aggregate_model=None):
+    """
+    Перераховує рахунки всіх постів з часових міток взаємодій і коментарів.
+    Анонімні перегляди не мають записів, тож після перерахунку не враховуються.
+    Стиснені перегляди (ViewAggregate) рахуються в момент останнього перегляду.
+    """
+    scores = {}
+
+    def add(post_id, kind, moment, count=1):
+        score = event_score(kind, moment.timestamp())
+        if score is not None:
+            scores[post_id] = log_add(scores.get(post_id, EMPTY_SCORE), score + math.log2(count))
+
+    for post_id, kind, moment in interaction_model.objects.values_list(
+            'post_id', 'interaction_type', 'timestamp').iterator():
+        add(post_id, kind, moment)
+    for post_id, moment in comment_model.objects.values_list('post_id', 'last_modified').iterator():
+        add(post_id, 'comment', moment)
+    if view_event_model is not None:
+        for post_id, moment in view_event_model.objects.values_list('post_id', 'viewed_at').iterator():
+            add(post_id, 'view', moment)
+    if view_aggregate_model is not None:
+        for post_id, moment, views in view_aggregate_model.objects.values_list(
+                'post_id', 'last_viewed_at', 'views').iterator():
+            add(post_id, 'view', moment, views)
+
+    post_model.objects.update(trending_score=EMPTY_SCORE)
+    post_model.objects.bulk_update(
+        [post_model(id=post_id, trending_score=score) for post_id, score in scores.items()],
+        ['trending_score'], batch_size=batch_size,
+    )
+    return len(scores)
+
+
+def top_post_ids(category=None, tag=None):
+    """Попередньо обчислений top-N id постів: загалом, у категорії чи з тегом (slug)"""
+    def load():
+        posts = BlogPost.objects.all()
+        if category:
+            posts = posts.filter(category__slug=category)
+        if tag:
+            posts = posts.filter(tags__slug=tag)
+        return list(posts.order_by('-trending_score', '-id').values_list('id', flat=True)[:settings.TRENDING_TOP_N])
+
+    return top_cache.get_or_set(f'category:{category or ""}:tag:{tag or ""}', load)
@@ -1,7 +1,7 @@
+from django.apps import apps
 from django.urls import include, path
 from rest_framework import routers
 from knox import views as knox_views
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from . import views
 from knox.views import LoginView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -23,13 +23,24 @@ urlpatterns = [
     path('post/<int:post_id>/comment/', views.comment_post, name='comment_post'),
     path("api/", include(router.urls), name="api"),
     path('api/search/', views.SearchView.as_view(), name='search'),
+    path('api/feed/', views.FeedView.as_view(), name='feed'),
     path('api/analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('api/internal/posts/', views.InternalPostBatchView.as_view(), name='internal_posts'),
+    path('api/internal/users/<int:user_id>/context/', views.InternalUserContextView.as_view(),
+         name='internal_user_context'),
     path('api/login/', views.LoginView.as_view(), name='knox_login'),
     path('api/logout/', knox_views.LogoutView.as_view(), name='knox_logout'),
     path('api/logoutall/', knox_views.LogoutAllView.as_view(), name='knox_logoutall'),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('silk/', include('silk.urls', namespace='silk')),
      path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
+
+# Застосунки розробки (DEV_APPS, PROFILING_MODE=silk) імпортуються лише тоді, коли встановлені
+if apps.is_installed('drf_spectacular'):
+    from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+    urlpatterns += [
+        path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+        path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    ]
+if apps.is_installed('silk'):
+    urlpatterns.append(path('silk/', include('silk.urls', namespace='silk')))
@@ -0,0 +1,83 @@
+"""
+Журнал переглядів постів.
+
+Кожен перегляд автентифікованого користувача - рядок ViewEvent, лише
+INSERT без перевірки унікальності. Такі події в рази переважають реакції,
+тому вони не зберігаються в UserInteraction: там лишаються лайки, збереження
+тощо, і is_liked/is_saved читають невелику таблицю.
+
+Сирі події, старші за VIEW_LOG_RETENTION_DAYS, manage.py compact_views
+стискає в ViewAggregate (користувач, пост, кількість, перший і останній
+перегляд): пачками користувачів, кожна - окрема транзакція з одним GROUP BY,
+одним upsert підсумків і одним DELETE, тож стиснення можна перервати й
+повторити. Межа before відсікає свіжі дні, які ще читаються сирими.
+
+    python manage.py compact_views --older-than-days 30
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from .models import ViewAggregate, ViewEvent
+
+
+def record_views(user, post_ids):
+    """Дописує перегляди постів post_ids (повтори - окремі події) одним INSERT"""
+    ViewEvent.objects.bulk_create([ViewEvent(user=user, post_id=post_id) for post_id in post_ids])
+
+
+def viewed_post_ids(user_id):
+    """id постів, переглянутих користувачем: зі стиснених і ще сирих подій, одним запитом"""
+    return ViewAggregate.objects.filter(user_id=user_id).values_list('post_id', flat=True).union(
+        ViewEvent.objects.filter(user_id=user_id).values_list('post_id', flat=True)
+    )
+
+
+def merge_groups(user_ids, groups):
+    """Додає підсумки {user_id, post_id, views, first, last} до наявних ViewAggregate користувачів user_ids"""
+    existing = {
+        (aggregate.user_id, aggregate.post_id): aggregate
+        for aggregate in ViewAggregate.objects.filter(user_id__in=user_ids)
+    }
+    rows = []
+    for group in groups:
+        aggregate = existing.get((group['user_id'], group['post_id']))
+        rows.append(ViewAggregate(
+            user_id=group['user_id'], post_id=group['post_id'],
+            views=group['views'] + (aggregate.views if aggregate else 0),
+            first_viewed_at=min(group['first'], aggregate.first_viewed_at) if aggregate else group['first'],
+            last_viewed_at=max(group['last'], aggregate.last_viewed_at) if aggregate else group['last'],
+        ))
+    ViewAggregate.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['user', 'post'],
+        update_fields=['views', 'first_viewed_at', 'last_viewed_at'],
+    )
+
+
+def compact(before, batch_size=200):
+    """
+    Стискає сирі перегляди до моменту before у ViewAggregate.
+    Повертає (кількість стиснених подій, кількість пар користувач/пост).
+    batch_size - користувачів на транзакцію.
+    """
+    user_ids = sorted(ViewEvent.objects.filter(viewed_at__lt=before).order_by()
+                      .values_list('user_id', flat=True).distinct())
+    events = pairs = 0
+    for offset in range(0, len(user_ids), batch_size):
+        chunk = user_ids[offset:offset + batch_size]
+        with transaction.atomic():
+            raw = ViewEvent.objects.filter(user_id__in=chunk, viewed_at__lt=before)
+            groups = list(raw.values('user_id', 'post_id').annotate(
+                views=Count('id'), first=Min('viewed_at'), last=Max('viewed_at'),
+            ).order_by())
+            merge_groups(chunk, groups)
+            # Без сигналів і залежних моделей - один DELETE за індексом (user, viewed_at)
+            events += raw.delete()[0]
+            pairs += len(groups)
+    return events, pairs
+
+
+def retention_cutoff(days):
+    return timezone.now() - timedelta(days=days)
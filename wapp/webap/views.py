@@ -1,28 +1,45 @@
-import base64
 from django.shortcuts import get_object_or_404, render
-from django.http import HttpResponseRedirect, JsonResponse
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.urls import reverse
+from django.utils.http import parse_etags
 from django.contrib.auth import authenticate, login, get_user_model
-from django.core.cache import cache
 from django.db.models import Q, F, Count
 from rest_framework import permissions, viewsets, status
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from silk.profiling.profiler import silk_profile
+import base64
 import os
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.views import APIView
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from knox.models import AuthToken
+from wapp.db import ReplicaReadMixin, use_replica
+from wapp.budgets import query_budget
+from wapp.profiling import view_profile
+from blogcommon.tracing import annotate, span
 
+from .cache import page_cache, post_cache, profile_cache
+from .catalog import category_catalog, popular_tag_catalog, tag_catalog
 from .models import BlogPost, PostComment, Category, Tag, UserInteraction, UserProfile
 from .serializers import (
-    BlogPostSerializer, PostCommentSerializer, UserSerializer, 
-    CategorySerializer, TagSerializer, UserInteractionSerializer, UserProfileSerializer
+    latest_comments_prefetch, user_post_flags, BlogPostListSerializer, BlogPostSerializer, PostCommentSerializer,
+    UserSerializer, CategorySerializer, TagSerializer, UserInteractionSerializer, UserProfileSerializer,
+    InteractionBatchItemSerializer
 )
+from .fast_serializers import serialize_posts
+from .feed import feed_post_ids
+from .interactions import record_batch
+from .viewlog import record_views, viewed_post_ids
+from . import trending
+from .renderers import FastJSONRenderer
 from .forms import BlogPostCreateForm, BlogPostCommentForm
-from .permissions import IsOwnerOrReadOnly
+from .permissions import IsOwnerOrReadOnly, HasServiceToken
 
 User = get_user_model()
 
@@ -44,30 +61,80 @@ class LoginView(APIView):
         token = AuthToken.objects.create(user)[1]
         return Response({"token": token})
 
+class CachedRetrieveMixin:
+    """
+    retrieve з кешу об'єктів (webap.cache), інвалідація - сигналами.
+    Серіалізатор не повинен залежати від поточного користувача.
+    """
+    object_cache = None
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        data = self.object_cache.get_or_set(lookup, lambda: self.get_serializer(self.get_object()).data)
+        return Response(data)
+
+def conditional_response(request, data, etag):
+    """Відповідь зі strong ETag; 304 без тіла, якщо клієнт має актуальну копію"""
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+class CatalogViewMixin:
+    """list/retrieve з каталогу в пам'яті процесу (webap.catalog)"""
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        entry = self.catalog.get()
+        return conditional_response(request, entry.data, entry.etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        item = self.catalog.get().items.get(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if item is None:
+            raise Http404
+        return conditional_response(request, *item)
+
+def post_list_data(post_ids, request):
+    """Пости з post_ids у цьому ж порядку у форматі списку (BlogPostListSerializer)"""
+    if settings.FAST_READ_SERIALIZERS:
+        return serialize_posts(post_ids, request.user)
+    posts = BlogPost.objects.select_related('author', 'category', 'text_stats').prefetch_related(
+        'tags', latest_comments_prefetch()).in_bulk(post_ids)
+    return BlogPostListSerializer([posts[post_id] for post_id in post_ids if post_id in posts], many=True,
+                                  context={'request': request}).data
+
+class CommentPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
 # ViewSets для основних моделей
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, CatalogViewMixin, viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    catalog = category_catalog
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ReplicaReadMixin, CatalogViewMixin, viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    catalog = tag_catalog
+    replica_actions = ('list', 'popular')
     
     @action(detail=False, methods=['get'])
     def popular(self, request):
-        """Отримати популярні теги"""
-        popular_tags = Tag.objects.annotate(
-            posts_count=Count('blogpost')
-        ).order_by('-posts_count')[:20]
-        
-        serializer = self.get_serializer(popular_tags, many=True)
-        return Response(serializer.data)
+        """Отримати популярні теги (за Tag.posts_count, що оновлюється сигналами)"""
+        entry = popular_tag_catalog.get()
+        return conditional_response(request, entry.data, entry.etag)
 
 class UserViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
@@ -75,42 +142,93 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
 
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication, SessionAuthentication]
     serializer_class = BlogPostSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     permission_classes = [IsOwnerOrReadOnly]  # Лише автор може редагувати/видаляти
+    # Лише читання без лічильників; retrieve пише views_count і читає з default
+    replica_actions = ('list', 'search', 'popular', 'comments')
+    # У списках - уривок замість повного тексту
+    list_actions = ('list', 'search', 'popular', 'saved')
 
     def get_queryset(self):
-        posts = cache.get('all_posts')
-        if not posts:
-            posts = BlogPost.objects.all().select_related('author', 'category').prefetch_related('tags', 'postcomment_set')
-            cache.set('all_posts', posts, timeout=300)  # Кешуємо на 5 хвилин
-        return posts
+        return BlogPost.objects.all().select_related('author', 'category', 'text_stats').prefetch_related(
+            'tags', latest_comments_prefetch()
+        )
+
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return BlogPostListSerializer
+        return super().get_serializer_class()
 
-    @silk_profile(name="blog_post_list")
+    def posts_response(self, queryset):
+        """
+        Відповідь зі списком постів для list/search/popular/saved: при FAST_READ_SERIALIZERS
+        збирається з .values() (webap.fast_serializers), інакше - BlogPostSerializer
+        з лайками/збереженнями сторінки в контексті.
+        """
+        if not settings.FAST_READ_SERIALIZERS:
+            page = self.paginate_queryset(queryset)
+            posts = list(queryset if page is None else page)
+            context = dict(self.get_serializer_context(),
+                           **user_post_flags(self.request.user, [post.id for post in posts]))
+            data = self.get_serializer(posts, many=True, context=context).data
+            if page is not None:
+                return self.get_paginated_response(data)
+            return Response(data)
+
+        post_ids = queryset.prefetch_related(None).values_list('id', flat=True)
+        page = self.paginate_queryset(post_ids)
+        data = serialize_posts(post_ids if page is None else page, self.request.user)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def perform_create(self, serializer):
+        # Кореневий span обробки поста; воркери пов'язують свої span'и з ним за post_id
+        with span('post.create'):
+            post = serializer.save()
+            annotate(post_id=post.pk)
+
+    # Бюджети SQL: найдовший шлях (холодні каталоги категорій/тегів,
+    # промах кешу) + запит користувача (JWT/сесія); не залежать від кількості постів
+    @query_budget(queries=8, total_ms=250)
+    @view_profile("blog_post_list")
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        return self.posts_response(self.filter_queryset(self.get_queryset()))
     
+    @query_budget(queries=7, total_ms=250)
     def retrieve(self, request, *args, **kwargs):
         """Збільшуємо лічильник переглядів при отриманні поста"""
-        instance = self.get_object()
-        
-        # Збільшуємо кількість переглядів
-        BlogPost.objects.filter(id=instance.id).update(views_count=F('views_count') + 1)
-        
-        # Записуємо взаємодію користувача
+        post_id = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+        # Збільшуємо кількість переглядів; 0 оновлених рядків - поста немає
+        if not str(post_id).isdigit() or not BlogPost.objects.filter(id=post_id).update(
+                views_count=F('views_count') + 1, **trending.updates('view')):
+            raise Http404
+
+        # Записуємо перегляд у журнал (webap.viewlog): один INSERT без перевірки повтору
         if request.user.is_authenticated:
-            UserInteraction.objects.get_or_create(
-                user=request.user,
-                post=instance,
-                interaction_type='view'
-            )
-        
-        # Оновлюємо instance для відображення нової кількості переглядів
-        instance.refresh_from_db()
-        
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+            record_views(request.user, [post_id])
+
+        # Спільна для всіх частина відповіді кешується без контексту користувача;
+        # лічильники та позначки користувача накладаються поверх
+        data = dict(post_cache.get_or_set(
+            post_id, lambda: BlogPostSerializer(self.get_object(), context={}).data
+        ))
+        data.update(BlogPost.objects.filter(id=post_id).values('views_count', 'likes_count').get())
+
+        flags = set()
+        if request.user.is_authenticated:
+            flags = set(UserInteraction.objects.filter(
+                user=request.user, post_id=post_id, interaction_type__in=('like', 'save')
+            ).values_list('interaction_type', flat=True))
+        data['is_liked'] = 'like' in flags
+        data['is_saved'] = 'save' in flags
+        # PostCommentSerializer.is_liked теж означає лайк поста поточним користувачем
+        data['comments'] = [dict(comment, is_liked=data['is_liked']) for comment in data['comments']]
+        return Response(data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
@@ -155,12 +273,14 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         
         return Response({'saved': saved})
     
+    @query_budget(queries=8, total_ms=250)
     @action(detail=False, methods=['get'])
     def search(self, request):
         """Пошук постів"""
         query = request.GET.get('q', '')
         category_slug = request.GET.get('category', '')
         tag_slugs = request.GET.get('tags', '').split(',') if request.GET.get('tags') else []
+        language = request.GET.get('lang', '')
         
         queryset = self.get_queryset()
         
@@ -174,6 +294,10 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         
         if tag_slugs and tag_slugs[0]:
             queryset = queryset.filter(tags__slug__in=tag_slugs).distinct()
+
+        if language:
+            # Мова визначена заздалегідь (PostTextStats.language)
+            queryset = queryset.filter(text_stats__language=language)
         
         # Сортування
         sort_by = request.GET.get('sort', 'created_at')
@@ -186,36 +310,44 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         else:
             queryset = queryset.order_by('-created_at')
         
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.posts_response(queryset)
     
+    @query_budget(queries=8, total_ms=250)
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def saved(self, request):
         """Отримати збережені пости користувача"""
-        saved_posts = BlogPost.objects.filter(
+        saved_posts = self.get_queryset().filter(
             userinteraction__user=request.user,
             userinteraction__interaction_type='save'
         ).distinct()
-        
-        page = self.paginate_queryset(saved_posts)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = self.get_serializer(saved_posts, many=True)
-        return Response(serializer.data)
+        return self.posts_response(saved_posts)
     
+    # Пост, кількість, сторінка, лайки користувача + запит користувача - для будь-якого page_size
+    @query_budget(queries=5)
+    @action(detail=True, methods=['get'], pagination_class=CommentPagination)
+    def comments(self, request, pk=None):
+        """Усі коментарі поста, посторінково (?page=, ?page_size=), нові першими"""
+        if not BlogPost.objects.filter(pk=pk).exists():
+            raise Http404
+        comments = PostComment.objects.filter(post_id=pk).select_related('author').order_by('-last_modified', '-id')
+        page = self.paginate_queryset(comments)
+        context = dict(self.get_serializer_context(), **user_post_flags(request.user, [pk]))
+        serializer = PostCommentSerializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
+
+    @query_budget(queries=8, total_ms=250)
     @action(detail=False, methods=['get'])
     def popular(self, request):
-        """Популярні пости"""
-        popular_posts = self.get_queryset().order_by('-views_count', '-likes_count')[:10]
-        serializer = self.get_serializer(popular_posts, many=True)
-        return Response(serializer.data)
+        """
+        Трендові пости (рахунок зі згасанням у часі, webap.trending):
+        ?category=<slug>, ?tag=<slug>, ?limit= (10, не більше TRENDING_TOP_N)
+        """
+        try:
+            limit = min(int(request.GET.get('limit', 10)), settings.TRENDING_TOP_N)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        post_ids = trending.top_post_ids(request.GET.get('category'), request.GET.get('tag'))[:max(limit, 0)]
+        return Response(post_list_data(post_ids, request))
 
 class CommentViewSet(viewsets.ModelViewSet):
     """ViewSet для управління коментарями"""
@@ -238,14 +370,31 @@ class UserInteractionViewSet(viewsets.ModelViewSet):
     serializer_class = UserInteractionSerializer
     permission_classes = [IsAuthenticated]
     
+    # На SQLite bulk_create до 249 рядків (999 параметрів / 4 поля) - один INSERT
+    max_batch_size = 200
+
     def get_queryset(self):
         return UserInteraction.objects.filter(user=self.request.user)
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    @query_budget(queries=7)
+    def batch(self, request):
+        """
+        Пакет взаємодій одним запитом (перегляди при прокручуванні тощо):
+        [{"post": 1, "interaction_type": "view"}, ...]
+        """
+        serializer = InteractionBatchItemSerializer(data=request.data, many=True, max_length=self.max_batch_size)
+        serializer.is_valid(raise_exception=True)
+        created = record_batch(request.user, serializer.validated_data)
+        return Response({'received': len(serializer.validated_data), 'created': created},
+                        status=status.HTTP_201_CREATED)
+
+class UserProfileViewSet(CachedRetrieveMixin, viewsets.ModelViewSet):
     """ViewSet для управління профілями користувачів"""
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
+    object_cache = profile_cache
     
     def get_queryset(self):
         if self.action == 'list':
@@ -258,6 +407,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
 # API для аналітики
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica()
 def user_analytics(request):
     """Аналітика для користувача"""
     user = request.user
@@ -269,7 +419,7 @@ def user_analytics(request):
         'total_likes': sum(post.likes_count for post in user_posts),
         'total_comments': PostComment.objects.filter(post__author=user).count(),
         'top_posts': BlogPostSerializer(
-            user_posts.order_by('-views_count')[:5], 
+            user_posts.prefetch_related(latest_comments_prefetch()).order_by('-views_count')[:5], 
             many=True,
             context={'request': request}
         ).data,
@@ -296,24 +446,117 @@ class SearchView(APIView):
             Q(title__icontains=query) | 
             Q(text__icontains=query) |
             Q(tags__name__icontains=query)
-        ).distinct()[:20]
+        ).distinct().prefetch_related(latest_comments_prefetch())[:20]
         
         serializer = BlogPostSerializer(posts, many=True)
         return Response({'results': serializer.data})
 
+class InternalPostBatchView(APIView):
+    """
+    Внутрішній API для воркерів модерації: id, text та author для пакета постів
+    одним запитом, без лічильників переглядів і вкладених серіалізаторів.
+    GET /api/internal/posts/?ids=1,2,3
+    """
+    authentication_classes = []
+    permission_classes = [HasServiceToken]
+    max_batch_size = 100
+
+    def get(self, request):
+        try:
+            ids = [int(post_id) for post_id in request.GET.get('ids', '').split(',') if post_id]
+        except ValueError:
+            return Response({'error': 'ids must be a comma-separated list of integers'}, status=400)
+        if len(ids) > self.max_batch_size:
+            return Response({'error': f'At most {self.max_batch_size} ids per request'}, status=400)
+
+        posts = BlogPost.objects.filter(id__in=ids).order_by().values('id', 'text', 'author_id')
+        return Response({
+            'posts': [
+                {'id': post['id'], 'text': post['text'], 'author': post['author_id']}
+                for post in posts
+            ]
+        })
+
+def id_bitmap(ids):
+    """Компактна множина id: біт (id % 8) байта id // 8 (порядок бітів little, як np.unpackbits)"""
+    ids = list(ids)
+    bits = bytearray(max(ids) // 8 + 1 if ids else 0)
+    for value in ids:
+        bits[value >> 3] |= 1 << (value & 7)
+    return bytes(bits)
+
+class InternalUserContextView(APIView):
+    """
+    Внутрішній API для сервісу рекомендацій: усе, що потрібно для генерації
+    кандидатів і ранжування, одним запитом.
+    GET /api/internal/users/<id>/context/
+    """
+    authentication_classes = []
+    permission_classes = [HasServiceToken]
+    liked_limit = 100
+    trending_limit = 50
+
+    @use_replica()
+    def get(self, request, user_id):
+        interactions = UserInteraction.objects.filter(user_id=user_id)
+        liked = interactions.filter(interaction_type__in=('like', 'save', 'share')).order_by('-timestamp')
+        return Response({
+            'user': user_id,
+            # Ключові слова постів у сервісі рекомендацій - слова в нижньому регістрі
+            'interests': [name.lower() for name in
+                          Tag.objects.filter(userprofile__user_id=user_id).values_list('name', flat=True)],
+            'following': list(UserProfile.follows.through.objects.filter(userprofile__user_id=user_id)
+                              .values_list('user_id', flat=True)),
+            'liked': list(dict.fromkeys(liked.values_list('post_id', flat=True)[:self.liked_limit])),
+            # Усі пости, з якими користувач уже взаємодіяв (включно з переглядами і дизлайками)
+            'seen': base64.b64encode(id_bitmap(
+                set(interactions.values_list('post_id', flat=True)) | set(viewed_post_ids(user_id))
+            )).decode('ascii'),
+            'trending': trending.top_post_ids()[:self.trending_limit],
+        })
+
+class FeedView(APIView):
+    """
+    Стрічка постів авторів, на яких підписаний користувач (webap.feed), нові першими.
+    GET /api/feed/?before=<id поста>&page_size=20 - курсор next веде на старіші пости.
+    """
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    permission_classes = [IsAuthenticated]
+    max_page_size = 100
+
+    # Стрічка, знаменитості, дочитування з постів + серіалізація сторінки
+    @query_budget(queries=9)
+    def get(self, request):
+        try:
+            before = int(request.GET['before']) if request.GET.get('before') else None
+            limit = min(int(request.GET.get('page_size', settings.FEED_PAGE_SIZE)), self.max_page_size)
+        except ValueError:
+            return Response({'error': 'before and page_size must be integers'}, status=400)
+        if limit < 1:
+            return Response({'error': 'page_size must be positive'}, status=400)
+
+        post_ids = feed_post_ids(request.user.id, before, limit)
+        results = post_list_data(post_ids, request)
+
+        next_url = None
+        if len(post_ids) == limit:
+            next_url = replace_query_param(request.build_absolute_uri(), 'before', post_ids[-1])
+        return Response({'next': next_url, 'results': results})
+
 class AnalyticsView(APIView):
     """API для отримання аналітики"""
     permission_classes = [IsAuthenticated]
     
+    @use_replica()
     def get(self, request):
         # Загальна статистика
         total_posts = BlogPost.objects.count()
         total_users = User.objects.count()
         total_interactions = UserInteraction.objects.count()
         
-        # Популярні пости
-        popular_posts = BlogPost.objects.order_by('-views_count')[:5]
-        popular_serializer = BlogPostSerializer(popular_posts, many=True)
+        # Трендові пости
+        popular_posts = post_list_data(trending.top_post_ids()[:5], request)
         
         # Користувацька аналітика
         user_posts = BlogPost.objects.filter(author=request.user).count()
@@ -325,7 +568,7 @@ class AnalyticsView(APIView):
                 'total_users': total_users,
                 'total_interactions': total_interactions,
             },
-            'popular_posts': popular_serializer.data,
+            'popular_posts': popular_posts,
             'user_stats': {
                 'posts_count': user_posts,
                 'interactions_count': user_interactions,
@@ -333,22 +576,56 @@ class AnalyticsView(APIView):
         })
 
 # Веб-сторінкові функції (традиційний Django)
+def _fragment_context():
+    """Параметри ключів фрагментного кешу шаблонів"""
+    return {
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        # Зміна будь-якої категорії/тегу інвалідує фрагменти з їхніми назвами і кольорами
+        'catalog_version': f'{category_catalog.get().version}.{tag_catalog.get().version}',
+    }
+
+def _render_for_anonymous_cached(request, page_key, render_page):
+    """
+    Анонімним користувачам - готовий HTML з page_cache (спільний для всіх),
+    іншим - рендер з фрагментним кешем і персональним заголовком.
+    """
+    if request.user.is_authenticated:
+        return render_page()
+    return HttpResponse(page_cache.get_or_set(page_key, lambda: render_page().content.decode('utf-8')))
+
+def _post_page_context(post, form):
+    return {
+        "post": post,
+        # Лінивий queryset: виконується лише при промаху кешу фрагмента коментарів
+        "comments": PostComment.objects.filter(post=post).select_related('author'),
+        "comments_version": post_cache.version(post.id),
+        "form": form,
+        **_fragment_context(),
+    }
+
 def index_view(request):
     if request.user.is_anonymous:  # Автоматична авторизація адміністратора за потреби
         user = authenticate(request, username=os.environ.get('BLOG_USER', 'admin'), password=os.environ.get('BLOG_PASS', 'admin123'))
         if user:
             login(request, user)
 
-    all_posts = BlogPost.objects.select_related('author', 'category').prefetch_related('tags').all()
-    categories = Category.objects.all()
-    
-    for b_post in all_posts:
-        b_post.base64_image = base64.b64encode(b_post.post_picture).decode('utf-8') if b_post.post_picture else None
+    try:
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page_number = 1
+
+    def render_page():
+        # post_picture читається лише при промаху кешу фрагмента зображення
+        # На головній - готовий уривок з PostTextStats, повний текст не читається
+        all_posts = BlogPost.objects.select_related('author', 'category', 'text_stats').prefetch_related(
+            'tags').defer('post_picture', 'text')
+        return render(request, 'blog.html', {
+            'blog_posts': Paginator(all_posts, settings.BLOG_INDEX_PAGE_SIZE).get_page(page_number),
+            'categories': category_catalog.get().data,
+            **_fragment_context(),
+        })
 
-    return render(request, 'blog.html', {
-        'blog_posts': all_posts,
-        'categories': categories
-    })
+    return _render_for_anonymous_cached(request, f'index:{page_number}', render_page)
 
 def create_post(request):
     if request.method == 'POST':
@@ -360,31 +637,28 @@ def create_post(request):
                 author=request.user,
                 post_picture=request.FILES['post_picture'].read() if 'post_picture' in request.FILES else None
             )
-            b_post.save()
+            with span('post.create'):
+                b_post.save()
+                annotate(post_id=b_post.pk)
             return HttpResponseRedirect(reverse("index"))
     else:
         form = BlogPostCreateForm()
     return render(request, 'create_post.html', {'form': form, 'title': 'Створення нового допису'})
 
+@query_budget(queries=6)
 def display_post(request, post_id):
-    post = get_object_or_404(BlogPost, pk=post_id)
-    
-    # Збільшуємо кількість переглядів
-    BlogPost.objects.filter(id=post_id).update(views_count=F('views_count') + 1)
-    post.refresh_from_db()
-    
-    post.base64_image = base64.b64encode(post.post_picture).decode('utf-8') if post.post_picture else None
-    comments = PostComment.objects.filter(post=post).select_related('author')
-    form = BlogPostCommentForm()
-    
-    return render(request, "read_post.html", {
-        "post": post, 
-        "comments": comments, 
-        "form": form
-    })
+    # Збільшуємо кількість переглядів (у тому числі для сторінок з кешу)
+    if not BlogPost.objects.filter(id=post_id).update(views_count=F('views_count') + 1, **trending.updates('view')):
+        raise Http404
+
+    def render_page():
+        post = get_object_or_404(BlogPost.objects.select_related('author', 'category').defer('post_picture'), pk=post_id)
+        return render(request, "read_post.html", _post_page_context(post, BlogPostCommentForm()))
+
+    return _render_for_anonymous_cached(request, f'post:{post_id}', render_page)
 
 def comment_post(request, post_id):
-    post = get_object_or_404(BlogPost, pk=post_id)
+    post = get_object_or_404(BlogPost.objects.select_related('author', 'category').defer('post_picture'), pk=post_id)
     
     if request.method == 'POST':
         form = BlogPostCommentForm(request.POST)
@@ -397,12 +671,4 @@ def comment_post(request, post_id):
             comment.save()
             return HttpResponseRedirect(reverse('display_post', args=[post_id]))
     
-    post.base64_image = base64.b64encode(post.post_picture).decode('utf-8') if post.post_picture else None
-    comments = PostComment.objects.filter(post=post).select_related('author')
-    form = BlogPostCommentForm()
-    
-    return render(request, "read_post.html", {
-        "post": post, 
-        "comments": comments, 
-        "form": form
-    })
+    return render(request, "read_post.html", _post_page_context(post, BlogPostCommentForm()))